@@ -0,0 +1,221 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+from solana.exceptions import SolanaRpcException
+from solana.rpc.async_api import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the per-endpoint latency moving average.
+LATENCY_EWMA_ALPHA = 0.2
+# How long an endpoint sits out after a 429 without Retry-After, or after its first 5xx/transport error.
+BASE_COOLDOWN_SECONDS = 1.0
+MAX_COOLDOWN_SECONDS = 60.0
+# Separates an endpoint's own rate limit from its URL in "url|requests_per_second" specs.
+RATE_LIMIT_SEPARATOR = "|"
+
+EndpointSpec = Union[str, Tuple[str, Optional[float]]]
+
+
+class NoHealthyEndpointError(Exception):
+    """Raised when every endpoint in the pool failed the request"""
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    server_errors: int = 0
+    latency_ms: Optional[float] = None
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    last_error: Optional[str] = None
+
+
+@dataclass
+class RpcEndpoint:
+    url: str
+    requests_per_second: Optional[float] = None
+    timeout: float = 10.0
+    stats: EndpointStats = field(default_factory=EndpointStats)
+
+    def __post_init__(self):
+        self.client = AsyncClient(self.url, timeout=self.timeout)
+        self.tokens = self.requests_per_second or 0.0
+        self.refilled_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.stats.cooldown_until
+
+    def refill(self, now: float) -> None:
+        if self.requests_per_second:
+            elapsed = now - self.refilled_at
+            self.tokens = min(self.requests_per_second, self.tokens + elapsed * self.requests_per_second)
+        self.refilled_at = now
+
+    def has_capacity(self, now: float) -> bool:
+        if not self.requests_per_second:
+            return True
+        self.refill(now)
+        return self.tokens >= 1
+
+    async def acquire(self) -> None:
+        """Wait for a token from this endpoint's rate budget"""
+        if not self.requests_per_second:
+            return
+        async with self.lock:
+            while True:
+                self.refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.requests_per_second)
+
+    def record_success(self, elapsed_ms: float) -> None:
+        self.stats.requests += 1
+        self.stats.consecutive_failures = 0
+        if self.stats.latency_ms is None:
+            self.stats.latency_ms = elapsed_ms
+        else:
+            self.stats.latency_ms += LATENCY_EWMA_ALPHA * (elapsed_ms - self.stats.latency_ms)
+
+    def record_failure(self, status: int, error: Exception, retry_after: Optional[float]) -> None:
+        self.stats.requests += 1
+        self.stats.errors += 1
+        self.stats.consecutive_failures += 1
+        self.stats.last_error = f"{status or type(error.__cause__ or error).__name__}"
+        if status == 429:
+            self.stats.rate_limited += 1
+            cooldown = retry_after if retry_after is not None else BASE_COOLDOWN_SECONDS
+        else:
+            self.stats.server_errors += 1
+            cooldown = BASE_COOLDOWN_SECONDS * 2 ** (self.stats.consecutive_failures - 1)
+        self.stats.cooldown_until = time.monotonic() + min(cooldown, MAX_COOLDOWN_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "requests": self.stats.requests,
+            "errors": self.stats.errors,
+            "rate_limited": self.stats.rate_limited,
+            "server_errors": self.stats.server_errors,
+            "latency_ms": self.stats.latency_ms,
+            "healthy": self.healthy(time.monotonic()),
+            "last_error": self.stats.last_error,
+        }
+
+
+def classify_error(error: Exception):
+    """Return (status, retry_after) for failover-worthy errors, or None for errors the caller should see"""
+    cause = error.__cause__ if isinstance(error, SolanaRpcException) else error
+    if isinstance(cause, httpx.HTTPStatusError):
+        status = cause.response.status_code
+        if status == 429 or status >= 500:
+            retry_after = cause.response.headers.get("retry-after")
+            try:
+                return status, float(retry_after) if retry_after is not None else None
+            except ValueError:
+                return status, None
+        return None
+    if isinstance(cause, httpx.TransportError):
+        return 0, None
+    return None
+
+
+def endpoint_limits(endpoints: Sequence[EndpointSpec],
+                    requests_per_second: Optional[float] = None) -> List[Tuple[str, Optional[float]]]:
+    """(url, requests_per_second) per endpoint; bare URLs get the shared default limit"""
+    return [(endpoint, requests_per_second) if isinstance(endpoint, str) else (endpoint[0], endpoint[1])
+            for endpoint in endpoints]
+
+
+def parse_endpoints(spec: str) -> List[EndpointSpec]:
+    """Endpoints from a comma-separated "url[|requests_per_second]" list, e.g. an environment variable"""
+    endpoints: List[EndpointSpec] = []
+    for entry in spec.split(","):
+        url, separator, limit = entry.strip().partition(RATE_LIMIT_SEPARATOR)
+        if not url:
+            continue
+        endpoints.append((url, float(limit) if limit.strip() else None) if separator else url)
+    return endpoints
+
+
+class RpcPool:
+    """Routes Solana RPC calls to the lowest-latency healthy endpoint and fails over on 429/5xx"""
+
+    def __init__(self, endpoints: Sequence[RpcEndpoint]):
+        if not endpoints:
+            raise ValueError("RpcPool needs at least one endpoint")
+        self.endpoints: List[RpcEndpoint] = list(endpoints)
+
+    @classmethod
+    def from_urls(cls, urls: Sequence[EndpointSpec], requests_per_second: Optional[float] = None,
+                  timeout: float = 10.0) -> "RpcPool":
+        """Build a pool from URLs or (url, requests_per_second) pairs; bare URLs use requests_per_second"""
+        return cls([RpcEndpoint(url, limit, timeout) for url, limit in endpoint_limits(urls, requests_per_second)])
+
+    def ranked_endpoints(self) -> List[RpcEndpoint]:
+        """Healthy endpoints with spare rate budget first, then by latency; unmeasured endpoints are tried early"""
+        now = time.monotonic()
+
+        def rank(endpoint: RpcEndpoint):
+            latency = endpoint.stats.latency_ms if endpoint.stats.latency_ms is not None else 0.0
+            return (not endpoint.healthy(now), not endpoint.has_capacity(now), latency)
+
+        return sorted(self.endpoints, key=rank)
+
+    async def route(self, operation: str, request):
+        """Run request(client) against endpoints in rank order until one succeeds"""
+        last_error: Optional[Exception] = None
+        for endpoint in self.ranked_endpoints():
+            await endpoint.acquire()
+            started = time.perf_counter()
+            try:
+                result = await request(endpoint.client)
+            except Exception as e:
+                failure = classify_error(e)
+                if failure is None:
+                    endpoint.record_success((time.perf_counter() - started) * 1000)
+                    raise
+                status, retry_after = failure
+                endpoint.record_failure(status, e, retry_after)
+                logger.warning(f"RPC {operation} failed on {endpoint.url} ({status or 'transport error'}), failing over")
+                last_error = e
+                continue
+
+            endpoint.record_success((time.perf_counter() - started) * 1000)
+            return result
+
+        raise NoHealthyEndpointError(f"All RPC endpoints failed for {operation}") from last_error
+
+    async def call(self, method: str, *args, **kwargs):
+        """Call an AsyncClient method through the pool"""
+        return await self.route(method, lambda client: getattr(client, method)(*args, **kwargs))
+
+    async def make_batch_request(self, reqs, parsers):
+        """Send a JSON-RPC batch through the pool"""
+        return await self.route("batch", lambda client: client._provider.make_batch_request(reqs, parsers))
+
+    def __getattr__(self, name: str):
+        # Lets the pool stand in for an AsyncClient: pool.get_balance(...) routes like pool.call("get_balance", ...).
+        if name.startswith("_") or not asyncio.iscoroutinefunction(getattr(AsyncClient, name, None)):
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+
+        return method
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint request, error and latency counters"""
+        return [endpoint.snapshot() for endpoint in self.endpoints]
+
+    async def close(self) -> None:
+        for endpoint in self.endpoints:
+            await endpoint.client.close()
@@ -395,6 +395,16 @@ async def get_dashboard_stats():
         logger.error(f"Error fetching dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/rpc/stats")
+async def get_rpc_stats():
+    """Get per-endpoint RPC pool statistics"""
+    try:
+        client = await get_solana_client()
+        return client.get_rpc_stats()
+    except Exception as e:
+        logger.error(f"Error fetching RPC stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Market Data Endpoints
 @app.get("/api/market/{symbol}")
 async def get_market_data(symbol: str):
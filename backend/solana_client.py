@@ -3,7 +3,6 @@ import json
 import logging
 from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
-from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
 from solana.rpc.types import TxOpts
 from solana.publickey import PublicKey
@@ -12,10 +11,14 @@ from solana.system_program import SystemProgram
 from solana.transaction import Transaction
 from solana.rpc.core import RPCException
 import aiohttp
+import os
 import time
+from rpc_pool import RpcPool, endpoint_limits, parse_endpoints
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_RPC_URL = "https://rpc.ankr.com/solana"
+
 @dataclass
 class TokenInfo:
     address: str
@@ -44,9 +47,14 @@ class SwapQuote:
 class SolanaClient:
     """Enhanced Solana client with Jupiter integration and real-time data"""
     
-    def __init__(self, rpc_url: str = "https://rpc.ankr.com/solana"):
-        self.rpc_url = rpc_url
-        self.client = AsyncClient(rpc_url)
+    def __init__(self, rpc_url: Optional[str] = None):
+        # Comma-separated list of endpoints, each optionally "url|requests_per_second" to override
+        # SOLANA_RPC_REQUESTS_PER_SECOND; the pool routes each call to the fastest healthy one.
+        rpc_urls = parse_endpoints(rpc_url or os.environ.get("SOLANA_RPC_URLS", DEFAULT_RPC_URL))
+        rpc_limit = os.environ.get("SOLANA_RPC_REQUESTS_PER_SECOND")
+        endpoints = endpoint_limits(rpc_urls, float(rpc_limit) if rpc_limit else None)
+        self.rpc_url = endpoints[0][0]
+        self.client = RpcPool.from_urls(endpoints)
         self.jupiter_api_base = "https://quote-api.jup.ag/v6"
         
         # Common token addresses
@@ -301,6 +309,10 @@ class SolanaClient:
             logger.error(f"Error getting market data: {e}")
             return {}
     
+    def get_rpc_stats(self) -> List[Dict[str, Any]]:
+        """Get per-endpoint RPC pool statistics"""
+        return self.client.stats()
+
     async def close(self):
         """Close the client connection"""
         try:
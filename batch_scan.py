@@ -0,0 +1,326 @@
+"""Multi-wallet batch scanner: wallets are sharded across worker processes that share one database writer
+
+    python scan.py --wallet-file wallets.txt --processes 8 --format csv
+
+Each worker process runs its own asyncio loop, RPC pool and share of the RPC budget and pulls the next wallet
+from a shared queue, so one huge wallet does not hold up a fixed shard. Workers only read the database; their
+writes are shipped to the parent process, where a single SingleWriter applies them with group commits.
+"""
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+from db_schema import migrate
+from db_writer import WRITE_BATCH_SIZE, BulkWriter, RowBuffer, configure_connection
+from mint_cache import MintCache
+from scan_metrics import DISABLED_METRICS, ScanMetrics
+from wallet_rollups import refresh_winning_wallets
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = "trading_data.db"
+# Messages the writer applies before committing, so a burst from many workers shares one transaction.
+WRITER_DRAIN_LIMIT = 200
+WRITER_POLL_SECONDS = 0.5
+# Queue sentinel telling a worker there are no more wallets.
+NO_MORE_WALLETS = None
+
+
+@dataclass
+class WalletResult:
+    wallet_address: str
+    worker: int
+    seconds: float
+    error: Optional[str] = None
+
+
+def read_wallets(wallets: Iterable[str] = (), wallet_file: Optional[str] = None) -> List[str]:
+    """Wallet addresses from arguments and/or a file with one per line (# comments, first CSV column), deduplicated"""
+    addresses = [str(wallet).strip() for wallet in wallets]
+    if wallet_file:
+        with open(wallet_file) as source:
+            for line in source:
+                line = line.split('#', 1)[0].strip()
+                if line:
+                    addresses.append(line.split(',', 1)[0].strip())
+    return list(dict.fromkeys(address for address in addresses if address))
+
+
+class WriterClient(RowBuffer):
+    """BulkWriter stand-in inside a worker process: rows are buffered locally and shipped to the single writer"""
+
+    def __init__(self, worker: int, requests, replies, batch_size: int = WRITE_BATCH_SIZE,
+                 metrics: ScanMetrics = DISABLED_METRICS):
+        super().__init__(batch_size)
+        self.worker = worker
+        self.requests = requests
+        self.replies = replies
+        self.metrics = metrics
+
+    def flush(self) -> None:
+        """Hand the buffered rows to the writer without waiting for its commit"""
+        if not self.pending():
+            return
+        with self.metrics.time('db.flush'):
+            self.requests.put(('rows', self.worker, *self.take()))
+
+    def execute(self, sql: str, params: Sequence = ()) -> None:
+        self.executemany(sql, [tuple(params)])
+
+    def executemany(self, sql: str, rows: Sequence[Sequence]) -> None:
+        self.requests.put(('execute', self.worker, sql, [tuple(row) for row in rows]))
+
+    def sync(self) -> None:
+        """Flush and block until the writer has committed everything this worker sent
+
+        Raises sqlite3.DatabaseError if any of it failed to write since the last sync.
+        """
+        self.flush()
+        with self.metrics.time('db.sync'):
+            self.requests.put(('sync', self.worker))
+            error = self.replies.get()
+        if error is not None:
+            raise sqlite3.DatabaseError(error)
+
+    async def drain(self) -> None:
+        """sync() without blocking the event loop"""
+        await asyncio.get_running_loop().run_in_executor(None, self.sync)
+
+    def close(self) -> None:
+        self.flush()
+
+
+class SingleWriter:
+    """Owns the only write connection to the database and applies what the worker processes send
+
+    A failed write is remembered for every worker whose rows or statement it covered and reported back on that
+    worker's next sync, so WriterClient.sync raises there instead of the writer carrying on silently.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, batch_size: int = WRITE_BATCH_SIZE):
+        self.connection = sqlite3.connect(database_path)
+        configure_connection(self.connection)
+        migrate(self.connection)
+        # Creates token_account_mints, so the workers' own schema checks find everything in place and never write.
+        MintCache(self.connection)
+        self.batch_size = batch_size
+        # Flushed explicitly between messages, never by size in the middle of one.
+        self.writer = BulkWriter(self.connection, sys.maxsize)
+        self.results: List[WalletResult] = []
+        self.messages = 0
+        # Workers with rows in the writer's buffer, and the first write error not yet reported to each worker.
+        self.buffered_workers: Set[int] = set()
+        self.errors: Dict[int, str] = {}
+
+    def fail(self, workers: Iterable[int], error: Exception) -> None:
+        for worker in workers:
+            self.errors.setdefault(worker, f"{type(error).__name__}: {error}")
+
+    def flush(self) -> None:
+        try:
+            self.writer.flush()
+        except sqlite3.Error as e:
+            self.fail(self.buffered_workers, e)
+        self.buffered_workers.clear()
+
+    def register_wallets(self, wallet_addresses: Sequence[str]) -> None:
+        """Insert every wallet up front, so workers only ever read their wallet_address ids"""
+        self.writer.executemany('INSERT INTO wallet_address (wallet_address) VALUES (?) '
+                                'ON CONFLICT(wallet_address) DO NOTHING',
+                                [(wallet_address,) for wallet_address in wallet_addresses])
+
+    def apply(self, message: tuple, replies: Dict[int, object]) -> None:
+        kind = message[0]
+        self.messages += 1
+        if kind == 'rows':
+            _, worker, pnl_rows, token_account_rows, journal_rows = message
+            self.writer.pnl_rows.extend(pnl_rows)
+            self.writer.token_account_rows.extend(token_account_rows)
+            self.writer.journal_rows.extend(journal_rows)
+            self.buffered_workers.add(worker)
+        elif kind == 'execute':
+            _, worker, sql, rows = message
+            # Buffered rows are committed first so statements apply in the order they were made.
+            self.flush()
+            try:
+                self.writer.executemany(sql, rows)
+            except sqlite3.Error as e:
+                self.fail([worker], e)
+        elif kind == 'sync':
+            self.flush()
+            replies[message[1]].put(self.errors.pop(message[1], None))
+        elif kind == 'result':
+            self.results.append(message[1])
+            logger.info(f"Worker {message[1].worker} finished {message[1].wallet_address} "
+                        f"in {message[1].seconds:.1f}s" + (f" with error: {message[1].error}" if message[1].error else ""))
+
+    def serve(self, requests, replies: Dict[int, object], processes: Sequence) -> None:
+        """Apply messages until every worker process has exited and the queue is drained"""
+        while True:
+            try:
+                message = requests.get(timeout=WRITER_POLL_SECONDS)
+            except queue.Empty:
+                self.flush()
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+
+            self.apply(message, replies)
+            for _ in range(WRITER_DRAIN_LIMIT):
+                try:
+                    self.apply(requests.get_nowait(), replies)
+                except queue.Empty:
+                    break
+            if self.writer.pending() >= self.batch_size:
+                self.flush()
+
+        self.flush()
+        for worker, error in self.errors.items():
+            logger.error(f"Writes from worker {worker} failed after its last sync: {error}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def worker_main(worker: int, wallets, requests, replies, options: dict) -> None:
+    """Entry point of one worker process"""
+    if options.get('worker_setup') is not None:
+        options['worker_setup']()
+
+    log_dir = options.get('log_dir')
+    output = open(os.path.join(log_dir, f"worker-{worker}.log"), 'a') if log_dir else open(os.devnull, 'w')
+    with output, contextlib.redirect_stdout(output):
+        asyncio.run(scan_worker(worker, wallets, requests, replies, options))
+
+
+async def scan_worker(worker: int, wallets, requests, replies, options: dict) -> None:
+    import config
+    from backend.rpc_pool import endpoint_limits
+    if options.get('requests_per_second') is not None:
+        config.RPC_REQUESTS_PER_SECOND = options['requests_per_second']
+    # Endpoints with their own limit get the same per-worker share of it as the default limit.
+    config.SOLANA_RPC_URLS = [url if limit is None else (url, limit * options.get('rpc_share', 1.0))
+                              for url, limit in endpoint_limits(config.SOLANA_RPC_URLS, None)]
+
+    import functions
+    from solders.pubkey import Pubkey
+
+    loop = asyncio.get_running_loop()
+    metrics = ScanMetrics(enabled=options.get('metrics', True))
+    while True:
+        # The wallet queue is a blocking multiprocessing queue; waiting on it must not stall this loop's tasks.
+        wallet_address = await loop.run_in_executor(None, wallets.get)
+        if wallet_address is NO_MORE_WALLETS:
+            break
+
+        started = time.perf_counter()
+        error = None
+        writer = WriterClient(worker, requests, replies, metrics=metrics)
+        processor = None
+        try:
+            processor = functions.SolanaTrader(Pubkey.from_string(wallet_address),
+                                               max_workers=options.get('max_workers', functions.TOKEN_ACCOUNT_WORKERS),
+                                               metrics=metrics, db_writer=writer,
+                                               database_name=options.get('database_path', DATABASE_PATH))
+            await processor.initialize()
+            if options.get('retry_quarantined'):
+                await processor.journal.release_quarantined()
+            await processor.process_transactions()
+            # Raises if any of the wallet's writes failed, so the result reports it.
+            await writer.drain()
+            if options.get('reports'):
+                await processor.generate_reports_for_time_periods(list(options['time_periods']),
+                                                                  export_format=options.get('export_format', 'xlsx'))
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"Failed to scan {wallet_address}: {error}")
+        finally:
+            if processor is not None:
+                await processor.price_feed.close()
+                await processor.solana_client.close()
+                processor.record_cache_stats()
+                # Written now, so scans of related wallets in the other workers can skip these transactions.
+                processor.signature_index.save()
+            writer.close()
+
+        requests.put(('result', WalletResult(wallet_address, worker, time.perf_counter() - started, error)))
+
+    if metrics.enabled:
+        print(metrics.summary())
+
+
+def scan_wallets(wallet_addresses: Sequence[str], processes: int = 0, time_periods: Sequence[int] = (),
+                 max_workers: Optional[int] = None, export_format: str = "xlsx", reports: bool = True,
+                 requests_per_second: Optional[float] = None, metrics: bool = True, log_dir: Optional[str] = None,
+                 database_path: str = DATABASE_PATH, retry_quarantined: bool = False,
+                 worker_setup: Optional[Callable[[], None]] = None) -> List[WalletResult]:
+    """Scan every wallet across `processes` worker processes (default: one per core) and return one result each
+
+    requests_per_second is the per-worker RPC budget; by default config.RPC_REQUESTS_PER_SECOND is split evenly
+    between the workers so the batch as a whole stays inside it, as are the limits of (url, requests_per_second)
+    endpoints in config.SOLANA_RPC_URLS. worker_setup runs first in every worker, e.g. to
+    point config at a local replay server.
+    """
+    import config
+
+    wallet_addresses = list(dict.fromkeys(wallet_addresses))
+    processes = max(1, min(processes or os.cpu_count() or 1, len(wallet_addresses) or 1))
+    if requests_per_second is None and config.RPC_REQUESTS_PER_SECOND:
+        requests_per_second = config.RPC_REQUESTS_PER_SECOND / processes
+
+    writer = SingleWriter(database_path)
+    writer.register_wallets(wallet_addresses)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    # spawn rather than fork: workers start clean instead of inheriting the parent's sqlite connection and threads.
+    context = multiprocessing.get_context("spawn")
+    wallets = context.Queue()
+    requests = context.Queue()
+    replies = {worker: context.Queue() for worker in range(processes)}
+    for wallet_address in wallet_addresses:
+        wallets.put(wallet_address)
+    for _ in range(processes):
+        wallets.put(NO_MORE_WALLETS)
+
+    options = {
+        'time_periods': list(time_periods), 'max_workers': max_workers, 'export_format': export_format,
+        'reports': reports, 'requests_per_second': requests_per_second, 'metrics': metrics, 'log_dir': log_dir,
+        'retry_quarantined': retry_quarantined, 'worker_setup': worker_setup, 'rpc_share': 1 / processes,
+        'database_path': database_path,
+    }
+    if max_workers is None:
+        del options['max_workers']
+
+    started = time.perf_counter()
+    workers = [context.Process(target=worker_main, args=(worker, wallets, requests, replies[worker], options),
+                               name=f"scan-worker-{worker}")
+               for worker in range(processes)]
+    for process in workers:
+        process.start()
+    try:
+        writer.serve(requests, replies, workers)
+        # Flushes only refreshed the scanned wallets; age old trades out of every other tracked wallet too.
+        with writer.connection:
+            refresh_winning_wallets(writer.connection)
+    finally:
+        for process in workers:
+            process.join()
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    failed = [result for result in writer.results if result.error]
+    finished = {result.wallet_address for result in writer.results}
+    lost = [wallet_address for wallet_address in wallet_addresses if wallet_address not in finished]
+    logger.info(f"Scanned {len(writer.results)} wallets with {processes} processes in {elapsed:.1f}s "
+                f"({len(failed)} failed, {len(lost)} lost with a crashed worker, {writer.writer.rows_written} rows)")
+    return writer.results + [WalletResult(wallet_address, -1, 0.0, "worker process exited")
+                             for wallet_address in lost]
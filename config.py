@@ -2,6 +2,11 @@
 # You can also make these settings from the user interface.
 
 SOLANA_RPC_URL = "https://api.mainnet-beta.solana.com"
+# Every endpoint the wallet scanner may route to; calls go to the fastest healthy one. An entry may also be a
+# (url, requests_per_second) pair to give that endpoint its own limit, e.g. ("https://my-node.example", 50).
+SOLANA_RPC_URLS = [SOLANA_RPC_URL]
+RPC_REQUESTS_PER_SECOND = 10  # per endpoint without its own limit, None for no limit
+SOLANA_WS_URL = None  # streaming mode websocket, None to derive it from the first RPC URL
 DEFAULT_SLIPPAGE = 0.5  # %
 MAX_GAS = 0.002  # SOL
 
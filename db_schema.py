@@ -0,0 +1,330 @@
+import logging
+import re
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever a step is appended to MIGRATIONS; stored in PRAGMA user_version.
+SCHEMA_VERSION = 5
+
+DURATION_PATTERN = re.compile(r'(?:(-?\d+)h\s*)?(?:(-?\d+)m\s*)?(?:(-?\d+)s)?')
+
+
+def parse_duration(value) -> Optional[int]:
+    """Seconds from a legacy "1h 2m 3s" duration; None for placeholders such as "Unknown" or "No buy\""""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if re.fullmatch(r'-?\d+', text):
+        return int(text)
+    match = DURATION_PATTERN.fullmatch(text)
+    if not text or match is None:
+        return None
+    hours, minutes, seconds = (int(group) if group else 0 for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_duration(seconds: Optional[int]) -> str:
+    """Render a duration in seconds the way reports always showed it, e.g. "1h 2m 3s\""""
+    if seconds is None:
+        return "Unknown"
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    if hours > 0:
+        return f"{int(hours)}h {int(minutes)}m {int(seconds)}s"
+    elif minutes > 0:
+        return f"{int(minutes)}m {int(seconds)}s"
+    else:
+        return f"{int(seconds)}s"
+
+
+def create_base_schema(connection: sqlite3.Connection) -> None:
+    """Version 1: the original tables plus the cursor columns and unique keys the upserts rely on"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS wallet_address (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            wallet_address TEXT UNIQUE
+        )
+    ''')
+
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS token_accounts (
+            wallet_address_id INTEGER,
+            wallet_token_account TEXT,
+            block_time INTEGER,
+            last_signature TEXT,
+            FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
+        )
+    ''')
+
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS pnl_info (
+            token_account TEXT PRIMARY KEY,
+            wallet_address_id INTEGER,
+            income REAL,
+            outcome REAL,
+            total_fee REAL,
+            spent_sol REAL,
+            earned_sol REAL,
+            delta_token REAL,
+            delta_sol REAL,
+            delta_percentage REAL,
+            buys INTEGER,
+            sells INTEGER,
+            last_trade TEXT,
+            time_period TEXT,
+            contract TEXT,
+            scam_tokens TEXT,
+            buy_period TEXT,
+            first_buy_time INTEGER,
+            final_sell_time INTEGER,
+
+            FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
+        )
+    ''')
+
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS winning_wallets (
+            wallet_address_id INTEGER,
+            win_rate_7 REAL,
+            balance_change_7 REAL,
+            token_accounts_7 INTEGER,
+            win_rate_14 REAL,
+            balance_change_14 REAL,
+            token_accounts_14 INTEGER,
+            win_rate_30 REAL,
+            balance_change_30 REAL,
+            token_accounts_30 INTEGER,
+            win_rate_60 REAL,
+            balance_change_60 REAL,
+            token_accounts_60 INTEGER,
+            win_rate_90 REAL,
+            balance_change_90 REAL,
+            token_accounts_90 INTEGER,
+            FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
+        )
+    ''')
+
+    # Databases created before signature cursors were tracked lack these columns.
+    for table, column in (('token_accounts', 'last_signature TEXT'),
+                          ('pnl_info', 'first_buy_time INTEGER'),
+                          ('pnl_info', 'final_sell_time INTEGER')):
+        if column.split()[0] not in {row[1] for row in connection.execute(f'PRAGMA table_info({table})')}:
+            connection.execute(f'ALTER TABLE {table} ADD COLUMN {column}')
+
+    # Upserts need a unique key; older databases may hold duplicates from retried inserts, keep the first.
+    connection.execute('''
+        DELETE FROM token_accounts WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM token_accounts GROUP BY wallet_address_id, wallet_token_account)
+    ''')
+    connection.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_token_accounts_wallet_account
+        ON token_accounts(wallet_address_id, wallet_token_account)
+    ''')
+    connection.execute('''
+        DELETE FROM winning_wallets WHERE rowid NOT IN (
+            SELECT MIN(rowid) FROM winning_wallets GROUP BY wallet_address_id)
+    ''')
+    connection.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_winning_wallets_wallet ON winning_wallets(wallet_address_id)
+    ''')
+
+
+def type_pnl_info(connection: sqlite3.Connection) -> None:
+    """Version 2: INTEGER epoch seconds and durations in pnl_info, plus covering indexes for period filters"""
+    connection.create_function('parse_duration', 1, parse_duration, deterministic=True)
+
+    # SQLite cannot change a column type in place, so the table is rebuilt and the old strings converted.
+    connection.execute('''
+        CREATE TABLE pnl_info_v2 (
+            token_account TEXT PRIMARY KEY,
+            wallet_address_id INTEGER,
+            income REAL,
+            outcome REAL,
+            total_fee REAL,
+            spent_sol REAL,
+            earned_sol REAL,
+            delta_token REAL,
+            delta_sol REAL,
+            delta_percentage REAL,
+            buys INTEGER,
+            sells INTEGER,
+            last_trade INTEGER,
+            time_period INTEGER,
+            contract TEXT,
+            scam_tokens INTEGER,
+            buy_period INTEGER,
+            first_buy_time INTEGER,
+            final_sell_time INTEGER,
+
+            FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
+        )
+    ''')
+    connection.execute('''
+        INSERT INTO pnl_info_v2
+        SELECT token_account, wallet_address_id, income, outcome, total_fee, spent_sol, earned_sol, delta_token,
+               delta_sol, delta_percentage, buys, sells, CAST(last_trade AS INTEGER), parse_duration(time_period),
+               contract, CAST(scam_tokens AS INTEGER), parse_duration(buy_period), first_buy_time, final_sell_time
+        FROM pnl_info
+    ''')
+    connection.execute('DROP TABLE pnl_info')
+    connection.execute('ALTER TABLE pnl_info_v2 RENAME TO pnl_info')
+
+    # Period summaries read only these columns, so they are answered from the index alone.
+    connection.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pnl_info_wallet_last_trade
+        ON pnl_info(wallet_address_id, last_trade, delta_sol, spent_sol, earned_sol, scam_tokens)
+    ''')
+    connection.execute('''
+        CREATE INDEX IF NOT EXISTS idx_pnl_info_wallet_time_period ON pnl_info(wallet_address_id, time_period)
+    ''')
+    # Loading the signature cursors of a wallet never touches the table rows.
+    connection.execute('''
+        CREATE INDEX IF NOT EXISTS idx_token_accounts_wallet_cursor
+        ON token_accounts(wallet_address_id, wallet_token_account, last_signature)
+    ''')
+
+
+def add_daily_rollups(connection: sqlite3.Connection) -> None:
+    """Version 3: per-wallet daily pnl buckets kept in step with pnl_info by triggers"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS pnl_daily (
+            wallet_address_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            trades INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            delta_sol REAL NOT NULL DEFAULT 0,
+            loss_sol REAL NOT NULL DEFAULT 0,
+            spent_sol REAL NOT NULL DEFAULT 0,
+            earned_sol REAL NOT NULL DEFAULT 0,
+            scam_tokens INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (wallet_address_id, day)
+        ) WITHOUT ROWID
+    ''')
+
+    # A bucket is keyed by the UTC day of last_trade; upserts of pnl_info fire the UPDATE trigger.
+    add_row = '''
+            INSERT INTO pnl_daily (wallet_address_id, day, trades, wins, delta_sol, loss_sol, spent_sol, earned_sol,
+                                   scam_tokens)
+            VALUES (NEW.wallet_address_id, NEW.last_trade / 86400, 1, COALESCE(NEW.delta_sol, 0) > 0,
+                    COALESCE(NEW.delta_sol, 0), MIN(COALESCE(NEW.delta_sol, 0), 0), COALESCE(NEW.spent_sol, 0),
+                    COALESCE(NEW.earned_sol, 0), COALESCE(NEW.scam_tokens, 0) = 1)
+            ON CONFLICT(wallet_address_id, day) DO UPDATE SET
+                trades = trades + excluded.trades,
+                wins = wins + excluded.wins,
+                delta_sol = delta_sol + excluded.delta_sol,
+                loss_sol = loss_sol + excluded.loss_sol,
+                spent_sol = spent_sol + excluded.spent_sol,
+                earned_sol = earned_sol + excluded.earned_sol,
+                scam_tokens = scam_tokens + excluded.scam_tokens;
+    '''
+    # Buckets already pruned past the longest window are simply not matched.
+    remove_row = '''
+            UPDATE pnl_daily SET
+                trades = trades - 1,
+                wins = wins - (COALESCE(OLD.delta_sol, 0) > 0),
+                delta_sol = delta_sol - COALESCE(OLD.delta_sol, 0),
+                loss_sol = loss_sol - MIN(COALESCE(OLD.delta_sol, 0), 0),
+                spent_sol = spent_sol - COALESCE(OLD.spent_sol, 0),
+                earned_sol = earned_sol - COALESCE(OLD.earned_sol, 0),
+                scam_tokens = scam_tokens - (COALESCE(OLD.scam_tokens, 0) = 1)
+            WHERE wallet_address_id = OLD.wallet_address_id AND day = OLD.last_trade / 86400;
+            DELETE FROM pnl_daily
+            WHERE wallet_address_id = OLD.wallet_address_id AND day = OLD.last_trade / 86400 AND trades <= 0;
+    '''
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS pnl_daily_insert AFTER INSERT ON pnl_info
+        WHEN NEW.last_trade IS NOT NULL AND NEW.wallet_address_id IS NOT NULL
+        BEGIN {add_row} END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS pnl_daily_update_remove AFTER UPDATE ON pnl_info
+        WHEN OLD.last_trade IS NOT NULL
+        BEGIN {remove_row} END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS pnl_daily_update_add AFTER UPDATE ON pnl_info
+        WHEN NEW.last_trade IS NOT NULL AND NEW.wallet_address_id IS NOT NULL
+        BEGIN {add_row} END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS pnl_daily_delete AFTER DELETE ON pnl_info
+        WHEN OLD.last_trade IS NOT NULL
+        BEGIN {remove_row} END
+    ''')
+
+    connection.execute('''
+        INSERT INTO pnl_daily (wallet_address_id, day, trades, wins, delta_sol, loss_sol, spent_sol, earned_sol,
+                               scam_tokens)
+        SELECT wallet_address_id, last_trade / 86400, COUNT(*), SUM(COALESCE(delta_sol, 0) > 0),
+               TOTAL(delta_sol), TOTAL(MIN(COALESCE(delta_sol, 0), 0)), TOTAL(spent_sol), TOTAL(earned_sol),
+               SUM(COALESCE(scam_tokens, 0) = 1)
+        FROM pnl_info
+        WHERE last_trade IS NOT NULL AND wallet_address_id IS NOT NULL
+        GROUP BY wallet_address_id, last_trade / 86400
+    ''')
+
+
+def add_ranking_indexes(connection: sqlite3.Connection) -> None:
+    """Version 4: per-window winning_wallets indexes so top-K rankings stop after K rows"""
+    for time_period in (7, 14, 30, 60, 90):
+        connection.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_winning_wallets_win_rate_{time_period}
+            ON winning_wallets(win_rate_{time_period}, token_accounts_{time_period}, balance_change_{time_period})
+        ''')
+        connection.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_winning_wallets_balance_change_{time_period}
+            ON winning_wallets(balance_change_{time_period}, token_accounts_{time_period}, win_rate_{time_period})
+        ''')
+
+
+def add_scan_journal(connection: sqlite3.Connection) -> None:
+    """Version 5: per-token-account scan progress, so an interrupted scan resumes and poison accounts are parked"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS scan_journal (
+            wallet_address_id INTEGER NOT NULL,
+            token_account TEXT NOT NULL,
+            status TEXT NOT NULL,
+            last_signature TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            updated_at INTEGER,
+            PRIMARY KEY (wallet_address_id, token_account)
+        ) WITHOUT ROWID
+    ''')
+
+
+MIGRATIONS: List[Tuple[int, Callable[[sqlite3.Connection], None]]] = [
+    (1, create_base_schema),
+    (2, type_pnl_info),
+    (3, add_daily_rollups),
+    (4, add_ranking_indexes),
+    (5, add_scan_journal),
+]
+
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Apply every pending migration, each in its own transaction, and return the resulting version"""
+    version = schema_version(connection)
+    for target, step in MIGRATIONS:
+        if version >= target:
+            continue
+        connection.execute('BEGIN')
+        try:
+            step(connection)
+            connection.execute(f'PRAGMA user_version = {target}')
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        logger.info(f"Migrated trading database from schema version {version} to {target}")
+        version = target
+    return version
@@ -0,0 +1,273 @@
+import asyncio
+import atexit
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import List, Optional, Sequence, Tuple
+
+from scan_journal import JOURNAL_UPSERT_SQL
+from scan_metrics import DISABLED_METRICS, ScanMetrics
+from wallet_rollups import refresh_winning_wallets
+
+logger = logging.getLogger(__name__)
+
+# Rows buffered before an automatic flush; each flush is a single transaction.
+WRITE_BATCH_SIZE = 500
+# Requests the writer thread applies per commit, so a burst of small flushes shares one transaction.
+WRITER_DRAIN_LIMIT = 200
+
+PNL_INFO_COLUMNS = (
+    'wallet_address_id', 'token_account', 'income', 'outcome', 'total_fee', 'spent_sol', 'earned_sol',
+    'delta_token', 'delta_sol', 'delta_percentage', 'buys', 'sells', 'last_trade', 'time_period', 'contract',
+    'scam_tokens', 'buy_period', 'first_buy_time', 'final_sell_time',
+)
+
+TOKEN_ACCOUNT_UPSERT_SQL = '''
+    INSERT INTO token_accounts (wallet_address_id, wallet_token_account, block_time, last_signature)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(wallet_address_id, wallet_token_account) DO UPDATE SET last_signature = excluded.last_signature
+'''
+
+PNL_INFO_UPSERT_SQL = f'''
+    INSERT INTO pnl_info ({', '.join(PNL_INFO_COLUMNS)})
+    VALUES ({', '.join('?' * len(PNL_INFO_COLUMNS))})
+    ON CONFLICT(token_account) DO UPDATE SET
+    {', '.join(f'{column} = excluded.{column}' for column in PNL_INFO_COLUMNS if column != 'token_account')}
+'''
+
+
+def configure_connection(connection: sqlite3.Connection) -> None:
+    """WAL lets readers run alongside the writer; NORMAL sync drops the fsync per commit that WAL makes safe"""
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+
+
+class RowBuffer(ABC):
+    """pnl_info, token_accounts and scan_journal rows waiting for a flush, added one token account at a time
+
+    An account's rows are added as one unit and flush() only runs between units, so no commit ever holds an
+    account's pnl_info row without the cursor and journal row that go with it: a scan killed at any point
+    resumes from a consistent state.
+    """
+
+    def __init__(self, batch_size: int = WRITE_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.token_account_rows: List[Sequence] = []
+        self.pnl_rows: List[Sequence] = []
+        self.journal_rows: List[Sequence] = []
+        self.rows_written = 0
+
+    def pending(self) -> int:
+        return len(self.token_account_rows) + len(self.pnl_rows) + len(self.journal_rows)
+
+    def add_account(self, pnl_row: Optional[Sequence] = None, token_account_row: Optional[Sequence] = None,
+                    journal_row: Optional[Sequence] = None) -> None:
+        """Queue one token account's rows as a unit; any of them may be None
+
+        Rows follow PNL_INFO_COLUMNS, the (wallet_address_id, token account, block_time, last_signature) of
+        TOKEN_ACCOUNT_UPSERT_SQL and scan_journal.JOURNAL_COLUMNS.
+        """
+        if pnl_row is not None:
+            self.pnl_rows.append(tuple(pnl_row))
+        if token_account_row is not None:
+            self.token_account_rows.append(tuple(token_account_row))
+        if journal_row is not None:
+            self.journal_rows.append(tuple(journal_row))
+        if self.pending() >= self.batch_size:
+            self.flush()
+
+    def add_journal(self, row: Sequence) -> None:
+        """Queue a scan_journal row on its own, e.g. a failed attempt"""
+        self.add_account(journal_row=row)
+
+    def take(self) -> Tuple[List[Sequence], List[Sequence], List[Sequence]]:
+        """The buffered (pnl, token account, journal) rows, leaving the buffer empty"""
+        rows = self.pnl_rows, self.token_account_rows, self.journal_rows
+        self.rows_written += self.pending()
+        self.token_account_rows = []
+        self.pnl_rows = []
+        self.journal_rows = []
+        return rows
+
+    @abstractmethod
+    def flush(self) -> None:
+        """Write, or hand over for writing, everything taken from the buffers"""
+
+
+class BulkWriter(RowBuffer):
+    """Buffers token_accounts, pnl_info and scan_journal upserts and flushes them with executemany in one transaction"""
+
+    def __init__(self, connection: sqlite3.Connection, batch_size: int = WRITE_BATCH_SIZE,
+                 metrics: ScanMetrics = DISABLED_METRICS):
+        super().__init__(batch_size)
+        self.connection = connection
+        self.metrics = metrics
+
+    def flush(self) -> None:
+        """Write every buffered row in one transaction
+
+        A failed transaction is rolled back, its rows are dropped and the error is raised: retrying the same
+        batch would fail every later flush too. The accounts it covered keep their previous cursors and pending
+        journal rows, so the next scan picks them up again.
+        """
+        if not self.pending():
+            return
+        self.metrics.gauge('db.pending_rows', self.pending())
+        rows = self.pending()
+        pnl_rows, token_account_rows, journal_rows = self.take()
+        try:
+            with self.metrics.time('db.flush'), self.connection:
+                # pnl rows go first so a stored cursor never points past activity that is not in pnl_info yet.
+                self.connection.executemany(PNL_INFO_UPSERT_SQL, pnl_rows)
+                self.connection.executemany(TOKEN_ACCOUNT_UPSERT_SQL, token_account_rows)
+                self.connection.executemany(JOURNAL_UPSERT_SQL, journal_rows)
+                # pnl_info triggers already moved the daily buckets; re-derive the windows of the touched wallets.
+                if pnl_rows:
+                    refresh_winning_wallets(self.connection, {row[0] for row in pnl_rows})
+        except sqlite3.Error as e:
+            logger.error(f"Dropped a batch of {rows} rows that failed to write: {e}")
+            self.metrics.count('db.flush_errors')
+            self.metrics.count('db.rows_dropped', rows)
+            self.rows_written -= rows
+            raise
+
+    def execute(self, sql: str, params: Sequence = ()) -> None:
+        """One write outside the row buffers, committed on its own"""
+        self.executemany(sql, [params])
+
+    def executemany(self, sql: str, rows: Sequence[Sequence]) -> None:
+        try:
+            with self.metrics.time('db.execute'), self.connection:
+                self.connection.executemany(sql, rows)
+        except sqlite3.Error as e:
+            logger.error(f"Statement failed to write {len(rows)} rows: {e}")
+            self.metrics.count('db.statement_errors')
+            raise
+
+    def sync(self) -> None:
+        """Flush, so everything written through this writer is visible to readers of the database"""
+        self.flush()
+
+    async def drain(self) -> None:
+        self.flush()
+
+    def close(self) -> None:
+        self.flush()
+
+
+class ThreadedWriter(RowBuffer):
+    """BulkWriter on a dedicated thread with its own connection, so commits never stall the event loop
+
+    Rows are buffered on the caller's side as with BulkWriter, and flush() only hands them to the thread, which
+    applies requests in order and groups whatever queued up meanwhile into one transaction. sync() blocks and
+    drain() awaits until everything handed over so far is committed; readers use their own WAL connections.
+    A write that failed on the thread is raised from the next sync() or drain().
+    """
+
+    def __init__(self, database_path: str, batch_size: int = WRITE_BATCH_SIZE,
+                 metrics: ScanMetrics = DISABLED_METRICS):
+        super().__init__(batch_size)
+        self.metrics = metrics
+        self.requests: "queue.Queue[tuple]" = queue.Queue()
+        # First write failure on the thread since the last barrier; only the writer thread touches it.
+        self.error: Optional[Exception] = None
+        # Opened here so a bad path fails in the caller; from now on only the writer thread touches it.
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        configure_connection(self.connection)
+        # Flushed explicitly once per group of requests, never by size.
+        self.writer = BulkWriter(self.connection, batch_size=sys.maxsize, metrics=metrics)
+        self.thread = threading.Thread(target=self.serve, name="db-writer", daemon=True)
+        self.thread.start()
+        # Daemon threads are not joined at exit; make sure queued rows still reach the database.
+        atexit.register(self.close)
+
+    def flush(self) -> None:
+        """Hand the buffered rows to the writer thread without waiting for the commit"""
+        if not self.pending():
+            return
+        self.requests.put(('rows', *self.take()))
+
+    def execute(self, sql: str, params: Sequence = ()) -> None:
+        self.executemany(sql, [tuple(params)])
+
+    def executemany(self, sql: str, rows: Sequence[Sequence]) -> None:
+        self.requests.put(('execute', sql, [tuple(row) for row in rows]))
+
+    def barrier(self) -> Future:
+        self.flush()
+        done: Future = Future()
+        self.requests.put(('barrier', done))
+        return done
+
+    def sync(self) -> None:
+        """Block until everything written so far is committed; raises what failed to write since the last sync"""
+        if self.thread.is_alive():
+            self.barrier().result()
+
+    async def drain(self) -> None:
+        """Wait, without blocking the event loop, until everything written so far is committed"""
+        if self.thread.is_alive():
+            with self.metrics.time('db.drain'):
+                await asyncio.wrap_future(self.barrier())
+
+    def close(self) -> None:
+        """Commit what is queued and stop the thread"""
+        atexit.unregister(self.close)
+        if not self.thread.is_alive():
+            return
+        self.flush()
+        self.requests.put(('stop',))
+        self.thread.join()
+        self.connection.close()
+        if self.error is not None:
+            logger.error(f"Writes failed after the last sync: {self.error}")
+
+    def serve(self) -> None:
+        stopping = False
+        while not stopping:
+            requests = [self.requests.get()]
+            while len(requests) < WRITER_DRAIN_LIMIT:
+                try:
+                    requests.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            barriers = []
+            for request in requests:
+                kind = request[0]
+                if kind == 'rows':
+                    _, pnl_rows, token_account_rows, journal_rows = request
+                    self.writer.pnl_rows.extend(pnl_rows)
+                    self.writer.token_account_rows.extend(token_account_rows)
+                    self.writer.journal_rows.extend(journal_rows)
+                elif kind == 'execute':
+                    # Earlier rows are committed first so statements apply in the order they were made.
+                    self.attempt(self.writer.flush)
+                    self.attempt(self.writer.executemany, request[1], request[2])
+                elif kind == 'barrier':
+                    barriers.append(request[1])
+                elif kind == 'stop':
+                    stopping = True
+            self.attempt(self.writer.flush)
+
+            if barriers:
+                error, self.error = self.error, None
+                for done in barriers:
+                    if error is None:
+                        done.set_result(None)
+                    else:
+                        done.set_exception(error)
+
+    def attempt(self, write, *args) -> None:
+        """Run a write on the writer thread, keeping its error for the next barrier instead of dying on it"""
+        try:
+            write(*args)
+        except Exception as e:
+            if not isinstance(e, sqlite3.Error):
+                logger.exception("Writer thread failed to apply a write")
+            if self.error is None:
+                self.error = e
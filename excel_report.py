@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from db_schema import format_duration
+
+logger = logging.getLogger(__name__)
+
+SHEET_NAME = 'Summary and Transactions'
+
+SUMMARY_COLUMNS = ['ID', 'WalletAddress', 'SolBalance', 'Current_Sol_Price', 'WinRate', 'PnL_R', 'PnL_Loss',
+                   'Balance_Change', 'ScamTokens', 'Profit_USD', 'Loss_USD', 'TimePeriod']
+
+# Rows handed to ExcelReport.write follow this order, with raw epoch seconds and durations in seconds.
+TRANSACTION_COLUMNS = ['token_account', 'income', 'outcome', 'total_fee', 'spent_sol', 'earned_sol', 'delta_token',
+                       'delta_sol', 'delta_percentage', 'buys', 'sells', 'last_trade', 'time_period', 'buy_period',
+                       'contract', 'scam token']
+
+RED_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+GREEN_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
+YELLOW_FILL = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
+BROWN_FILL = PatternFill(start_color="A52A2A", end_color="A52A2A", fill_type="solid")
+GOLD_FILL = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")
+
+THIN_SIDE = Side(style='thin')
+
+
+def cell_styles():
+    """Shared named styles, so every streamed cell references one style record instead of carrying its own"""
+    border = Border(left=THIN_SIDE, right=THIN_SIDE, top=THIN_SIDE, bottom=THIN_SIDE)
+    alignment = Alignment(horizontal="center", vertical="center")
+    body = NamedStyle(name='report_body', border=border, alignment=alignment)
+    header = NamedStyle(name='report_header', border=border, alignment=alignment, font=Font(bold=True))
+    link = NamedStyle(name='report_link', border=border, alignment=alignment, font=Font(underline='single'))
+    return body, header, link
+
+
+def hyperlink(url: str, label: str) -> str:
+    """HYPERLINK formula; unlike cell.hyperlink it is written with the row instead of being held until save"""
+    return f'=HYPERLINK("{url}","{label}")'
+
+
+def summary_fills(summary_row: Sequence) -> dict:
+    """Fills for the summary header cells keyed by column index, from profit vs loss and win rate"""
+    win_rate = summary_row[4] or 0
+    profit = summary_row[9] or 0
+    loss = summary_row[10] or 0
+
+    if profit > loss and win_rate >= 50:
+        return {10: GOLD_FILL, 5: GOLD_FILL}
+    elif profit < loss and win_rate < 50:
+        return {10: RED_FILL, 5: RED_FILL}
+    elif profit < loss and win_rate == 50:
+        return {10: RED_FILL, 5: GOLD_FILL}
+    elif profit > loss and win_rate < 50:
+        return {10: GOLD_FILL, 5: RED_FILL}
+    return {11: RED_FILL, 5: RED_FILL}
+
+
+def add_transaction_rules(worksheet, first_row: int, last_row: int) -> None:
+    """One conditional-formatting rule per colour instead of a fill stored on every cell"""
+    if last_row < first_row:
+        return
+
+    def add(column: str, formula: str, fill: PatternFill) -> None:
+        worksheet.conditional_formatting.add(f"{column}{first_row}:{column}{last_row}",
+                                             FormulaRule(formula=[formula.format(row=first_row)], fill=fill))
+
+    add('C', 'ROUND($C{row},1)>ROUND($B{row},1)', YELLOW_FILL)
+    add('J', '$J{row}>3', YELLOW_FILL)
+    # Durations are written as "1h 2m 3s"; anything without a minutes part is under a minute.
+    add('M', 'ISERROR(SEARCH("m",$M{row}))', YELLOW_FILL)
+    add('H', '$H{row}<0', RED_FILL)
+    add('H', '$H{row}>0', GREEN_FILL)
+    add('I', 'AND($H{row}<0,$I{row}<>-100)', RED_FILL)
+    add('I', 'AND(NOT(AND($H{row}<0,$I{row}<>-100)),$I{row}>0)', GREEN_FILL)
+    add('I', '$I{row}=-100', BROWN_FILL)
+
+
+class ExcelReport:
+    """Streams a wallet report into a write-only workbook, so memory stays flat however many rows it holds"""
+
+    def __init__(self, wallet_address: str):
+        self.wallet_address = wallet_address
+
+    def render_transaction(self, row: Sequence) -> List:
+        row = list(row)
+        row[11] = datetime.fromtimestamp(int(row[11])).strftime('%d.%m.%Y') if row[11] is not None else None
+        row[12] = format_duration(row[12])
+        row[13] = format_duration(row[13])
+        return row
+
+    def display_values(self, row: Sequence) -> List:
+        """Values as they appear in the sheet, hyperlink columns showing their label"""
+        row = self.render_transaction(row)
+        row[0] = 'View Solscan'
+        row[14] = 'View Dexscreener'
+        return row
+
+    def column_widths(self, summary_row: Sequence, rows: Iterable[Sequence]) -> List[int]:
+        """Running maxima of the rendered value lengths, one pass over the rows"""
+        widths = [0] * max(len(SUMMARY_COLUMNS), len(TRANSACTION_COLUMNS))
+        for values in (SUMMARY_COLUMNS, summary_row, TRANSACTION_COLUMNS):
+            for index, value in enumerate(values):
+                widths[index] = max(widths[index], len(str(value)))
+        for row in rows:
+            for index, value in enumerate(self.display_values(row)):
+                length = len(str(value))
+                if length > widths[index]:
+                    widths[index] = length
+        return widths
+
+    def write(self, file_name: str, summary: dict, rows_factory: Callable[[], Iterable[Sequence]]) -> int:
+        """Write the summary block and every transaction row; rows_factory must return a fresh iterator per call
+
+        Write-only sheets serialize column widths before the first row, so the rows are read twice: once for
+        the running width maxima and once to write them. Returns the number of transaction rows written.
+        """
+        summary_row = [summary.get(column) for column in SUMMARY_COLUMNS]
+        widths = self.column_widths(summary_row, rows_factory())
+
+        workbook = Workbook(write_only=True)
+        body_style, header_style, link_style = cell_styles()
+        for style in (body_style, header_style, link_style):
+            workbook.add_named_style(style)
+        worksheet = workbook.create_sheet(SHEET_NAME)
+        for index, width in enumerate(widths, start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width + 2
+
+        def cell(value, style: str = 'report_body', fill: Optional[PatternFill] = None) -> WriteOnlyCell:
+            written = WriteOnlyCell(worksheet, value)
+            written.style = style
+            if fill is not None:
+                written.fill = fill
+            return written
+
+        fills = summary_fills(summary_row)
+        worksheet.append([cell(column, 'report_header', fills.get(index))
+                          for index, column in enumerate(SUMMARY_COLUMNS, start=1)])
+        worksheet.append([cell(value) for value in summary_row])
+        worksheet.append([cell(None) for _ in range(len(widths))])
+        worksheet.append([cell(column, 'report_header') for column in TRANSACTION_COLUMNS])
+
+        first_row = 5
+        written = 0
+        for row in rows_factory():
+            values = self.render_transaction(row)
+            solscan = cell(hyperlink(f'https://solscan.io/account/{values[0]}#splTransfer', 'View Solscan'),
+                           'report_link')
+            dexscreener = cell(hyperlink(f'https://dexscreener.com/solana/{values[14]}?maker={self.wallet_address}',
+                                         'View Dexscreener'), 'report_link')
+            worksheet.append([solscan, *(cell(value) for value in values[1:14]), dexscreener, cell(values[15])])
+            written += 1
+
+        add_transaction_rules(worksheet, first_row, first_row + written - 1)
+        workbook.save(file_name)
+        return written
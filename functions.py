@@ -1,37 +1,57 @@
 # Advanced Solana Trading Bot Core Functions
 # Optimized for high-performance trading operations
 
-import os
-import sys
 import time
-import pandas as pd
-import layouts
+from collections import deque
 import asyncio
-import datetime
-import base58
-import websockets
-import json
 from solders.signature import Signature
-import requests
 from solders.pubkey import Pubkey
-from solana.rpc.api import Client, Keypair
-from solana.rpc.async_api import AsyncClient
+from solders.commitment_config import CommitmentLevel
+from solders.rpc.config import RpcTransactionConfig
+from solders.rpc.requests import GetTransaction
+from solders.rpc.responses import GetTransactionResp
+from solders.transaction_status import UiTransactionEncoding
 from datetime import datetime
-from spl.token.constants import TOKEN_PROGRAM_ID, WRAPPED_SOL_MINT
+from spl.token.constants import TOKEN_PROGRAM_ID
 from solana.rpc import types
 from solana.rpc.types import TokenAccountOpts
-from openpyxl import Workbook
-from openpyxl.styles import Font, NamedStyle, Alignment, PatternFill, Border, Side
-from openpyxl.worksheet.datavalidation import DataValidation
-from openpyxl.formula.translate import Translator
-from openpyxl.utils import get_column_letter
-import re
 import sqlite3
+import config
+from backend.rpc_pool import RpcPool
+from transaction_cache import TransactionCache
+from mint_cache import MintCache
+from scan_journal import ScanJournal
+from signature_index import RecentSignatures, shared_signature_index
+import transaction_decoder
+from price_feed import PriceFeed
+from db_writer import ThreadedWriter, configure_connection
+from db_schema import format_duration, migrate
+from scan_metrics import ScanMetrics
+from wallet_rollups import expire_winning_wallets
+import report_export
 
 # Constants and Configuration
+DATABASE_NAME = "trading_data.db"
 SOLANA_DECIMALS = 10**9
 MAX_TOKEN_ACCOUNTS = 15000
 MIN_TOKEN_ACCOUNTS = 1
+TOKEN_ACCOUNT_WORKERS = 1
+DEFAULT_WALLET_ADDRESS = "EWzk2847WCPis45hPQ6Em5UuRbZiP1CSmqx7nG9ELd2L"
+DEFAULT_REPORT_PERIODS = (90, 60, 30, 14, 7, 1)
+TRANSACTION_BATCH_SIZE = 100
+SIGNATURE_PAGE_LIMIT = 1000
+# Rows pulled from SQLite per fetchmany while streaming a report.
+EXPORT_CHUNK_SIZE = 5000
+# "jsonParsed" has the node parse every instruction; "base64" fetches the raw transaction and decodes the
+# SPL Token transfers locally, which is smaller on the wire and cheaper to walk.
+TRANSACTION_ENCODING = "jsonParsed"
+# trade_queue entries are (kind, value) pairs.
+QUEUED_SIGNATURE = "signature"
+QUEUED_TOKEN_ACCOUNT = "token_account"
+# Seconds before a streamed token account whose refresh failed is queued again, one delay per retry.
+STREAM_RETRY_DELAYS = (2, 10, 60)
+# Errors an account raises on every attempt (e.g. pnl maths on a token without a price); it is quarantined at once.
+PERMANENT_FAILURES = ("type NoneType doesn't define __round__ method",)
 
 class TerminalColors:
     BLACK = '\033[30m'
@@ -45,25 +65,14 @@ class TerminalColors:
     UNDERLINE = '\033[4m'
     RESET = '\033[0m'
 
-# Global Constants
-TRACKED_SIGNATURES = set()
-SOLANA_WRAPPED_MINT = "So11111111111111111111111111111111111111112"
-RAYDIUM_POOL = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"
-RAYDIUM_V4 = "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1"
+class PnlAccumulator:
+    # Per-token-account trading metrics, kept off SolanaTrader so accounts can be accumulated in parallel.
+    __slots__ = ('total_income', 'total_outcome', 'transaction_fees', 'sol_spent', 'sol_earned', 'buy_count',
+                 'sell_count', 'sol_difference', 'token_difference', 'profit_percentage', 'initial_buy_time',
+                 'final_sell_time', 'last_transaction_time', 'trading_duration', 'current_contract',
+                 'suspicious_tokens', 'token_creation_time', 'purchase_period')
 
-class SolanaTrader:
-    def __init__(self, wallet_address):
-        self.trade_queue = asyncio.Queue()
-        self.wallet_address = wallet_address
-        self.active_token_accounts = 0
-        self.solana_client = AsyncClient("RPC_HTTPS_URL")
-        self.database_name = "trading_data.db"
-        self.db_connection = sqlite3.connect(self.database_name)
-        self.db_cursor = self.db_connection.cursor()
-        self.initialize_database()
-        self.wallet_id = self.get_wallet_identifier(wallet_address)
-        
-        # Trading metrics
+    def __init__(self):
         self.total_income = 0
         self.total_outcome = 0
         self.transaction_fees = 0
@@ -80,74 +89,58 @@ class SolanaTrader:
         self.trading_duration = 0
         self.current_contract = None
         self.suspicious_tokens = 0
-        self.sol_balance = None
-        self.solana_usd_price = self.fetch_solana_price()
-        self.token_creation_time = None
+        self.token_creation_time = 0
         self.purchase_period = 0
 
-    def initialize_database(self):
-        self.db_cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS wallet_address (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        wallet_address TEXT UNIQUE
-                    )
-                ''')
+# Global Constants
+# (wallet address, signature) pairs recently queued by streaming mode, so logs and backfill never double-queue one.
+TRACKED_SIGNATURES = RecentSignatures()
+SOLANA_WRAPPED_MINT = "So11111111111111111111111111111111111111112"
+RAYDIUM_POOL = "675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8"
+RAYDIUM_V4 = "5Q544fKrFoe6tsEbD7S8EmxGTJYAKtTVhAW5Q5pge4j1"
 
-        self.db_cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS token_accounts (
-                        wallet_address_id INTEGER,
-                        wallet_token_account TEXT,
-                        block_time INTEGER,
-                        FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
-                    )
-                ''')
+def is_permanent_failure(error):
+    return str(error) in PERMANENT_FAILURES
 
-        self.db_cursor.execute('''
-                 CREATE TABLE IF NOT EXISTS pnl_info (
-                     token_account TEXT PRIMARY KEY,
-                     wallet_address_id INTEGER,
-                     income REAL,
-                     outcome REAL,
-                     total_fee REAL,
-                     spent_sol REAL,
-                     earned_sol REAL,
-                     delta_token REAL,
-                     delta_sol REAL,
-                     delta_percentage REAL,
-                     buys INTEGER,
-                     sells INTEGER,
-                     last_trade TEXT,
-                     time_period TEXT,
-                     contract TEXT,
-                     scam_tokens TEXT,
-                     buy_period TEXT, 
-
-                     FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
-                 )
-             ''')
 
-        self.db_cursor.execute('''
-                       CREATE TABLE IF NOT EXISTS winning_wallets (
-                           wallet_address_id INTEGER,
-                           win_rate_7 REAL,
-                           balance_change_7 REAL,
-                           token_accounts_7 INTEGER,
-                           win_rate_14 REAL,
-                           balance_change_14 REAL,
-                           token_accounts_14 INTEGER,
-                           win_rate_30 REAL,
-                           balance_change_30 REAL,
-                           token_accounts_30 INTEGER,
-                           win_rate_60 REAL,
-                           balance_change_60 REAL,
-                           token_accounts_60 INTEGER,
-                           win_rate_90 REAL,
-                           balance_change_90 REAL,
-                           token_accounts_90 INTEGER,
-                           FOREIGN KEY(wallet_address_id) REFERENCES wallet_address(id)
-                       )
-                   ''')
-        self.db_connection.commit()
+class SolanaTrader:
+    def __init__(self, wallet_address, max_workers=TOKEN_ACCOUNT_WORKERS, batch_size=TRANSACTION_BATCH_SIZE,
+                 transaction_encoding=TRANSACTION_ENCODING, metrics=None, db_writer=None, signature_index=None,
+                 database_name=DATABASE_NAME):
+        self.trade_queue = asyncio.Queue()
+        # Streamed token accounts whose refresh failed -> (retries so far, signatures that pointed at them).
+        self.stream_retries = {}
+        self.metrics = metrics if metrics is not None else ScanMetrics()
+        self.wallet_address = wallet_address
+        self.active_token_accounts = 0
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.transaction_encoding = transaction_encoding
+        self.solana_client = RpcPool.from_urls(config.SOLANA_RPC_URLS, config.RPC_REQUESTS_PER_SECOND)
+        self.database_name = database_name
+        self.db_connection = sqlite3.connect(self.database_name)
+        configure_connection(self.db_connection)
+        self.db_cursor = self.db_connection.cursor()
+        # Writes go through a writer thread with its own connection, so commits overlap RPC work instead of
+        # stalling it; db_connection is left to reads, which WAL keeps from blocking the writer. Batch workers
+        # pass a batch_scan.WriterClient so every write goes through the one writer process.
+        self.db_writer = db_writer if db_writer is not None else ThreadedWriter(self.database_name,
+                                                                                metrics=self.metrics)
+        self.transaction_cache = TransactionCache()
+        # Shared by every wallet scanned in this process; signers of parsed transactions, across wallets and runs.
+        self.signature_index = signature_index if signature_index is not None else shared_signature_index()
+        self.signature_index_counts = (self.signature_index.hits, self.signature_index.misses)
+        self.initialize_database()
+        self.mint_cache = MintCache(self.db_connection, writer=self.db_writer)
+        self.wallet_id = self.get_wallet_identifier(wallet_address)
+        self.journal = ScanJournal(self.db_connection, self.db_writer, self.wallet_id)
+        self.signature_cursors = {}
+        self.sol_balance = None
+        self.price_feed = PriceFeed()
+        self.solana_usd_price = None
+
+    def initialize_database(self):
+        migrate(self.db_connection)
 
     async def get_token_accountsCount(self, wallet_address: Pubkey):
         owner = wallet_address
@@ -157,131 +150,126 @@ class SolanaTrader:
 
     async def initialize(self):
         self.sol_balance = await self.getSOlBalance()
+        self.solana_usd_price = await self.fetch_solana_price()
 
     async def getSOlBalance(self):
         pubkey = self.wallet_address
-        response = await self.solana_client.get_balance(pubkey)
+        with self.metrics.time('rpc.balance'):
+            response = await self.solana_client.get_balance(pubkey)
         balance = response.value / SOLANA_DECIMALS
         return balance
 
-    def fetch_solana_price(self):
-        url = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
-        response = requests.get(url)
-        data = response.json()
-        return data['solana']['usd'] if response.status_code == 200 else None
-
-    def store_win_rate(self, time_period, win_rate, balance_change, token_accounts):
-        check_sql = 'SELECT 1 FROM winning_wallets WHERE wallet_address_id = ?'
-        self.db_cursor.execute(check_sql, (self.wallet_id,))
-        row_exists = self.db_cursor.fetchone() is not None
-
-        time_period_suffix = f"_{time_period}"
-
-        if row_exists:
-            update_sql = f'''
-                UPDATE winning_wallets
-                SET win_rate{time_period_suffix} = ?, 
-                    balance_change{time_period_suffix} = ?, 
-                    token_accounts{time_period_suffix} = ?
-                WHERE wallet_address_id = ?
-            '''
-            self.db_cursor.execute(update_sql, (win_rate, balance_change, token_accounts, self.wallet_id))
-        else:
-            insert_sql = f'''
-                INSERT INTO winning_wallets (
-                    wallet_address_id, 
-                    win_rate_7, balance_change_7, token_accounts_7, 
-                    win_rate_14, balance_change_14, token_accounts_14,
-                    win_rate_30, balance_change_30, token_accounts_30,
-                    win_rate_60, balance_change_60, token_accounts_60,
-                    win_rate_90, balance_change_90, token_accounts_90
-                ) VALUES (
-                    ?, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
-                )
-            '''
-            self.db_cursor.execute(insert_sql, (self.wallet_id,))
-            update_sql = f'''
-                UPDATE winning_wallets
-                SET win_rate{time_period_suffix} = ?, 
-                    balance_change{time_period_suffix} = ?, 
-                    token_accounts{time_period_suffix} = ?
-                WHERE wallet_address_id = ?
-            '''
-            self.db_cursor.execute(update_sql, (win_rate, balance_change, token_accounts, self.wallet_id))
-
-        self.db_connection.commit()
+    async def fetch_solana_price(self):
+        with self.metrics.time('price.sol'):
+            return await self.price_feed.get_sol_price()
+
+    def get_period_summaries(self, time_periods):
+        # One pass over the widest window; every narrower window is a CASE over the same rows.
+        time_periods = list(dict.fromkeys(int(time_period) for time_period in time_periods))
+        cutoffs = [self.period_cutoff(time_period) for time_period in time_periods]
+
+        aggregates = []
+        params = []
+        for cutoff in cutoffs:
+            aggregates.append('''
+                 (SUM(CASE WHEN last_trade >= ? AND delta_sol > 0 THEN 1 ELSE 0 END) * 1.0
+                   / COUNT(CASE WHEN last_trade >= ? THEN 1 END)) * 100,
+                 SUM(CASE WHEN last_trade >= ? THEN delta_sol END),
+                 SUM(CASE WHEN last_trade >= ? THEN CASE WHEN delta_sol < 0 THEN delta_sol ELSE 0 END END),
+                 (SUM(CASE WHEN last_trade >= ? THEN earned_sol END)
+                   / NULLIF(SUM(CASE WHEN last_trade >= ? THEN spent_sol END), 0) - 1) * 100,
+                 COUNT(CASE WHEN last_trade >= ? AND scam_tokens = 1 THEN 1 END),
+                 COUNT(CASE WHEN last_trade >= ? THEN 1 END)''')
+            params += [cutoff] * 8
 
-    def get_summary(self, time_period):
         query = f'''
-             WITH Calculations AS (
-               SELECT
-                 (SUM(CASE WHEN delta_sol > 0 THEN 1 ELSE 0 END) * 1.0 / COUNT(*)) * 100 AS WinRate,
-                 SUM(delta_sol) AS PnL_R,
-                 SUM(CASE WHEN delta_sol < 0 THEN delta_sol ELSE 0 END) AS PnL_Loss,
-                 (SUM(earned_sol) / NULLIF(SUM(spent_sol), 0) - 1) * 100 AS Balance_Change,
-                 COUNT(CASE WHEN scam_tokens = 1 THEN 1 END) AS ScamTokens
-               FROM pnl_info
-               WHERE wallet_address_id = ?
-                 AND last_trade >= strftime('%s', 'now', '-{time_period} days')
-             )
-
-             SELECT
-               *,
-               '{time_period} days' AS TimePeriod
-             FROM Calculations;
+             SELECT {','.join(aggregates)}
+             FROM pnl_info
+             WHERE wallet_address_id = ?
+               AND last_trade >= ?
              '''
-        self.db_cursor.execute(query, (self.wallet_id,))
-
+        self.db_cursor.execute(query, params + [self.wallet_id, min(cutoffs)])
         summary_result = self.db_cursor.fetchone()
 
-        summary_data = {
-            'SolBalance': self.sol_balance,
-            'WalletAddress': str(self.wallet_address),
-            'WinRate': summary_result[0],
-            'PnL_R': summary_result[1],
-            'PnL_Loss': summary_result[2],
-            'Balance_Change': summary_result[3],
-            'ScamTokens': summary_result[4],
-            'TimePeriod': summary_result[5]
-        }
+        summaries = {}
+        for position, time_period in enumerate(time_periods):
+            win_rate, pnl_r, pnl_loss, balance_change, scam_tokens, token_accounts = \
+                summary_result[position * 6:position * 6 + 6]
+            summaries[time_period] = {
+                'SolBalance': self.sol_balance,
+                'WalletAddress': str(self.wallet_address),
+                'WinRate': win_rate,
+                'PnL_R': pnl_r,
+                'PnL_Loss': pnl_loss,
+                'Balance_Change': balance_change,
+                'ScamTokens': scam_tokens,
+                'TimePeriod': f"{time_period} days",
+                'TokenAccounts': token_accounts
+            }
+
+        return summaries
 
-        return summary_data
+    def get_summary(self, time_period):
+        return self.get_period_summaries([time_period])[int(time_period)]
 
-    def get_transactions(self, time_period):
-        query = f'''
-        SELECT *
+    def period_cutoff(self, time_period):
+        return int(time.time()) - int(time_period) * 86400
+
+    def get_transactions(self, time_period, min_duration=None, max_duration=None):
+        query = '''
+        SELECT token_account, wallet_address_id, income, outcome, total_fee, spent_sol, earned_sol, delta_token,
+               delta_sol, delta_percentage, buys, sells, last_trade, time_period, contract, scam_tokens, buy_period
         FROM pnl_info
         WHERE wallet_address_id = ?
-          AND last_trade >= strftime('%s', 'now', '-{time_period} days');
+          AND last_trade >= ?
         '''
-        self.db_cursor.execute(query, (self.wallet_id,))
+        params = [self.wallet_id, self.period_cutoff(time_period)]
+        # Durations are INTEGER seconds, so these bounds are plain range predicates.
+        if min_duration is not None:
+            query += ' AND time_period >= ?'
+            params.append(int(min_duration))
+        if max_duration is not None:
+            query += ' AND time_period <= ?'
+            params.append(int(max_duration))
+        query += ' ORDER BY last_trade DESC'
+        self.db_cursor.execute(query, params)
         results = self.db_cursor.fetchall()
+        import pandas as pd
         transactions_df = pd.DataFrame(results, columns=['token_account', 'wallet_address_id', 'income', 'outcome',
                                                          'total_fee', 'spent_sol', 'earned_sol', 'delta_token',
                                                          'delta_sol', 'delta_percentage', 'buys', 'sells',
                                                          'last_trade', 'time_period', 'contract', 'scam token', 'buy_period'])
 
-        transactions_df = transactions_df.sort_values(by='last_trade', ascending=False)
-
         return transactions_df
 
-    async def generate_reports_for_time_periods(self, time_periods):
+    async def generate_reports_for_time_periods(self, time_periods, streaming=True, export_format="xlsx"):
         await self.initialize()
+        # Reports read pnl_info back, so every queued row has to be committed first.
+        await self.db_writer.drain()
+
+        with self.metrics.time('report.summaries'):
+            # Exact-cutoff figures for the export only; winning_wallets belongs to the daily rollup in the writer.
+            summaries = self.get_period_summaries(time_periods)
+
+        for time_period, summary in summaries.items():
+            if summary['TokenAccounts']:
+                file_name = f"{self.wallet_address}_{time_period}_days.xlsx"
+                with self.metrics.time('report.export'):
+                    if export_format in report_export.EXPORT_FORMATS:
+                        file_name = self.export_report(summary, time_period,
+                                                       f"{self.wallet_address}_{time_period}_days", export_format)
+                    elif streaming:
+                        self.export_to_excel_streaming(summary, time_period, file_name)
+                    else:
+                        self.export_to_excel(summary, self.get_transactions(time_period), file_name)
+                print(f"Exported summary and transactions for {time_period} days to {file_name}")
+            else:
+                print(f"No summary found for {time_period} days.")
 
-        summary = self.get_summary(time_periods[0])
-        transactions = self.get_transactions(time_periods[0])
-        if summary:
-            file_name = f"{self.wallet_address}_{time_periods[0]}_days.xlsx"
-            self.export_to_excel(summary, transactions, file_name)
-            print(f"Exported summary and transactions for {time_periods[0]} days to {file_name}")
-        else:
-            print(f"No summary found for {time_periods[0]} days.")
-
-    def export_to_excel(self, summary, transactions, file_name):
+    def report_summary(self, summary):
         sol_current_price = self.solana_usd_price
         summary['Current_Sol_Price'] = sol_current_price
         summary['ID'] = self.wallet_id
-        win_rate = summary['WinRate']
 
         try:
             summary['Profit_USD'] = summary['PnL_R'] * sol_current_price
@@ -290,6 +278,52 @@ class SolanaTrader:
             summary['Profit_USD'] = 0
             summary['Loss_USD'] = 0
 
+        return summary
+
+    def iter_report_rows(self, time_period, chunk_size=EXPORT_CHUNK_SIZE):
+        for rows in self.iter_report_chunks(time_period, chunk_size):
+            yield from rows
+
+    def iter_report_chunks(self, time_period, chunk_size=EXPORT_CHUNK_SIZE):
+        # A cursor of its own, so streaming a report never disturbs self.db_cursor.
+        cursor = self.db_connection.cursor()
+        try:
+            cursor.execute('''
+                SELECT token_account, income, outcome, total_fee, spent_sol, earned_sol, delta_token, delta_sol,
+                       delta_percentage, buys, sells, last_trade, time_period, buy_period, contract, scam_tokens
+                FROM pnl_info
+                WHERE wallet_address_id = ?
+                  AND last_trade >= ?
+                ORDER BY last_trade DESC
+            ''', (self.wallet_id, self.period_cutoff(time_period)))
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def export_to_excel_streaming(self, summary, time_period, file_name):
+        from excel_report import ExcelReport
+        report = ExcelReport(str(self.wallet_address))
+        return report.write(file_name, self.report_summary(summary), lambda: self.iter_report_rows(time_period))
+
+    def export_report(self, summary, time_period, file_stem, export_format):
+        extension = report_export.FILE_EXTENSIONS[export_format]
+        report_export.export_summary(f"{file_stem}_summary.{extension}", export_format, summary)
+        file_name = f"{file_stem}_transactions.{extension}"
+        report_export.export_transactions(file_name, export_format, self.iter_report_chunks(time_period))
+        return file_name
+
+    def export_to_excel(self, summary, transactions, file_name):
+        # Report-only dependencies; a scan that never exports does not pay for importing them.
+        import pandas as pd
+        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.utils import get_column_letter
+
+        summary = self.report_summary(summary)
+
         summary_df = pd.DataFrame([summary], columns=['ID', 'WalletAddress', 'SolBalance', 'Current_Sol_Price', 'WinRate', 'PnL_R', 'PnL_Loss',
                                                       'Balance_Change', 'ScamTokens', 'Profit_USD',
                                                       'Loss_USD', 'TimePeriod'])
@@ -300,6 +334,11 @@ class SolanaTrader:
                                                               'last_trade', 'time_period', 'buy_period', 'contract', 'scam token'])
         transactions_df.drop(columns=['wallet_address_id'], inplace=True)
         transactions_df['last_trade'] = transactions_df['last_trade'].apply(lambda x: datetime.fromtimestamp(int(x)).strftime('%d.%m.%Y'))
+        # Durations are stored as seconds and only turned into "1h 2m 3s" text for the sheet.
+        short_trades = (transactions_df['time_period'].fillna(0) < 60).tolist()
+        transactions_df['time_period'] = transactions_df['time_period'].apply(format_duration)
+        transactions_df['buy_period'] = transactions_df['buy_period'].apply(
+            lambda x: format_duration(None if pd.isna(x) else int(x)))
 
         with pd.ExcelWriter(file_name, engine='openpyxl') as writer:
             summary_df.to_excel(writer, sheet_name='Summary and Transactions', index=False, startrow=0)
@@ -339,11 +378,11 @@ class SolanaTrader:
                 length = max(len(str(cell.value)) for cell in column_cells)
                 worksheet.column_dimensions[get_column_letter(column_cells[0].column)].width = length + 2
 
-            for idx, row in enumerate(transactions_df.itertuples(index=False), start=row_to_start + 2):
+            for idx, (row, short_trade) in enumerate(zip(transactions_df.itertuples(index=False), short_trades),
+                                                     start=row_to_start + 2):
                 outcome = row[2]
                 income = row[1]
                 delta_percentage = row[8]
-                time_period = row[12]
                 buys = row[9]
 
                 if round(outcome, 1) > round(income, 1):
@@ -352,7 +391,7 @@ class SolanaTrader:
                 if delta_percentage == -100:
                     worksheet.cell(row=idx, column=9).fill = brown_fill
 
-                if pd.to_timedelta(time_period) < pd.Timedelta(minutes=1):
+                if short_trade:
                     worksheet.cell(row=idx, column=13).fill = yellow_fill
 
                 if buys > 3:
@@ -392,15 +431,17 @@ class SolanaTrader:
             workbook.save(file_name)
 
     def get_wallet_identifier(self, wallet_address):
+        # Known wallets are only read, so a restarted or batch scan takes no write lock here.
         self.db_cursor.execute('SELECT id FROM wallet_address WHERE wallet_address = ?', (str(wallet_address),))
-        result = self.db_cursor.fetchone()
+        row = self.db_cursor.fetchone()
+        if row is not None:
+            return row[0]
 
-        if result:
-            return result[0]
-        else:
-            self.db_cursor.execute('INSERT INTO wallet_address (wallet_address) VALUES (?)', (str(wallet_address),))
-            self.db_connection.commit()
-            return self.db_cursor.lastrowid
+        self.db_writer.execute('INSERT INTO wallet_address (wallet_address) VALUES (?) ON CONFLICT(wallet_address) DO NOTHING',
+                               (str(wallet_address),))
+        self.db_writer.sync()
+        self.db_cursor.execute('SELECT id FROM wallet_address WHERE wallet_address = ?', (str(wallet_address),))
+        return self.db_cursor.fetchone()[0]
 
     def convert_unix_to_date(self, unix_timestamp):
         timestamp_str = str(unix_timestamp)
@@ -410,21 +451,13 @@ class SolanaTrader:
 
         return datetime.fromtimestamp(unix_timestamp)
 
-    async def update_token_account(self, wallet_address, wallet_token_account, block_time, wallet_address_id):
-        try:
-            wallet_token_account_str = str(wallet_token_account)
-
-            self.db_cursor.execute(
-                'INSERT INTO token_accounts (wallet_address_id, wallet_token_account, block_time) VALUES (?, ?, ?)',
-                (wallet_address_id, wallet_token_account_str, block_time))
-            self.db_connection.commit()
+    def token_account_row(self, wallet_token_account_str, block_time, wallet_address_id, last_signature=None):
+        # The token_accounts row holding the account's cursor, written together with its pnl_info row.
+        if wallet_token_account_str not in self.signature_cursors:
             print(
-                f"{TerminalColors.CYAN}New token account added for wallet address: {str(wallet_address)}, token account: {wallet_token_account_str}",
+                f"{TerminalColors.CYAN}New token account added for wallet address: {str(self.wallet_address)}, token account: {wallet_token_account_str}",
                 TerminalColors.RESET)
-
-        except Exception as e:
-            print(f"Error updating token account: {e}")
-            self.db_connection.rollback()
+        return wallet_address_id, wallet_token_account_str, block_time, last_signature
 
     def get_token_data(self, decimals):
         for token_balances in decimals:
@@ -437,16 +470,19 @@ class SolanaTrader:
                 return token_contract, token_decimal
 
     async def transactionType(self, Account: str):
-        data_response = await self.solana_client.get_account_info(Pubkey.from_string(Account))
-        data = data_response.value.data
-        parsed_data = layouts.SPL_ACCOUNT_LAYOUT.parse(data)
-        mint = Pubkey.from_bytes(parsed_data.mint)
-        if mint == SOLANA_WRAPPED_MINT:
+        mint = self.mint_cache.get(Account)
+        if mint is not None:
             return mint
+
+        with self.metrics.time('rpc.account_info'):
+            data_response = await self.solana_client.get_account_info(Pubkey.from_string(Account))
+        # The mint is the first field of an SPL token account.
+        mint = str(Pubkey.from_bytes(bytes(data_response.value.data[:32])))
+        self.mint_cache.put_many({Account: mint})
         return mint
 
-    async def transactionDetails(self, block_time, txn_fee, information_array: list, token_traded: str,
-                           token_decimal: int):
+    async def transactionDetails(self, pnl: PnlAccumulator, block_time, txn_fee, information_array: list,
+                                 token_traded: str, token_decimal: int):
         try:
             first_info = information_array[0]
             second_info = information_array[1]
@@ -455,301 +491,564 @@ class SolanaTrader:
 
             if first_authority == str(self.wallet_address) and str(t_type) != SOLANA_WRAPPED_MINT:
                 first_amount = int(first_info['amount']) / 10 ** 9
-                self.update_buy(int(second_info['amount']) / 10 ** token_decimal, txn_fee, block_time)
-                self.sol_spent += first_amount
-                self.current_contract = token_traded
-                self.last_transaction_time = block_time
-                print(f"{TerminalColors.GREEN}BUY {first_amount} SOL {TerminalColors.RESET} -FOR  {int(second_info['amount']) / 10 ** token_decimal} TokenBought= {self.current_contract}  ")
+                self.update_buy(pnl, int(second_info['amount']) / 10 ** token_decimal, txn_fee, block_time)
+                pnl.sol_spent += first_amount
+                pnl.current_contract = token_traded
+                pnl.last_transaction_time = block_time
+                print(f"{TerminalColors.GREEN}BUY {first_amount} SOL {TerminalColors.RESET} -FOR  {int(second_info['amount']) / 10 ** token_decimal} TokenBought= {pnl.current_contract}  ")
 
             else:
                 first_amount = int(first_info['amount']) / 10 ** token_decimal
-                self.update_sell(first_amount, txn_fee, block_time)
-                self.sol_earned += int(second_info['amount']) / 10 ** 9
-                self.current_contract = token_traded
-                self.last_transaction_time = block_time
+                self.update_sell(pnl, first_amount, txn_fee, block_time)
+                pnl.sol_earned += int(second_info['amount']) / 10 ** 9
+                pnl.current_contract = token_traded
+                pnl.last_transaction_time = block_time
                 print(
-                    f"{TerminalColors.RED}SELL{TerminalColors.RESET} {first_amount} -{self.current_contract}--FOR  {TerminalColors.GREEN}{int(second_info['amount']) / 10 ** 9} {TerminalColors.RESET}SOL")
+                    f"{TerminalColors.RED}SELL{TerminalColors.RESET} {first_amount} -{pnl.current_contract}--FOR  {TerminalColors.GREEN}{int(second_info['amount']) / 10 ** 9} {TerminalColors.RESET}SOL")
         except Exception as e:
             print(f"Error processing transaction details: {e}")
 
-    async def process_token_account(self, token_accounts: list, wallet_address_id: int):
-        self.active_token_accounts = len(token_accounts)
+        return pnl
+
+    async def get_transactions_batched(self, signatures: list):
+        # Finalized transactions never change, so anything already in the on-disk cache skips RPC entirely.
+        cached = self.transaction_cache.get_many(signatures, self.transaction_encoding)
+        missing = [signature for signature in signatures if str(signature) not in cached]
+
+        if missing:
+            self.metrics.count('transactions.fetched', len(missing))
+            fetched = await self.fetch_transactions_rpc(missing)
+            self.transaction_cache.put_many(zip(missing, fetched), self.transaction_encoding)
+            cached.update((str(signature), transaction) for signature, transaction in zip(missing, fetched))
+
+        return [cached[str(signature)] for signature in signatures]
+
+    async def fetch_transactions_rpc(self, signatures: list):
+        # Packs up to batch_size getTransaction calls into each JSON-RPC batch request. Entries the node
+        # answers with an error are retried on their own so the usual RPC exception surfaces.
+        if self.batch_size == 1:
+            transactions = []
+            for signature in signatures:
+                with self.metrics.time('rpc.transaction'):
+                    transactions.append(await self.solana_client.get_transaction(
+                        signature, encoding=self.transaction_encoding, max_supported_transaction_version=0))
+            return transactions
+
+        encoding = UiTransactionEncoding.Base64 if self.transaction_encoding == "base64" else UiTransactionEncoding.JsonParsed
+        transaction_config = RpcTransactionConfig(encoding=encoding,
+                                                  commitment=CommitmentLevel.Finalized,
+                                                  max_supported_transaction_version=0)
+        transactions = []
+        for start in range(0, len(signatures), self.batch_size):
+            chunk = signatures[start:start + self.batch_size]
+            requests_batch = tuple(GetTransaction(signature, transaction_config, id=index) for index, signature in enumerate(chunk))
+            parsers = (GetTransactionResp,) * len(requests_batch)
+            with self.metrics.time('rpc.transaction_batch'):
+                responses = await self.solana_client.make_batch_request(requests_batch, parsers)
+
+            for signature, response in zip(chunk, responses):
+                if not isinstance(response, GetTransactionResp):
+                    self.metrics.count('transactions.batch_retries')
+                    response = await self.solana_client.get_transaction(signature, encoding=self.transaction_encoding,
+                                                                        max_supported_transaction_version=0)
+                transactions.append(response)
+
+        return transactions
+
+    async def fetch_signatures(self, token_account: str, until=None):
+        # Pages backwards from the newest signature until the history (or the stored cursor) is exhausted.
+        signatures = []
+        before = None
+        while True:
+            with self.metrics.time('rpc.signatures'):
+                page = await self.solana_client.get_signatures_for_address(Pubkey.from_string(token_account),
+                                                                           before=before, until=until,
+                                                                           limit=SIGNATURE_PAGE_LIMIT)
+            signatures.extend(page.value)
+            if len(page.value) < SIGNATURE_PAGE_LIMIT:
+                return signatures
+            before = page.value[-1].signature
+
+    async def fetch_token_account(self, token_account: str):
+        cursor = self.signature_cursors.get(token_account)
+        sig_value = await self.fetch_signatures(token_account,
+                                                until=Signature.from_string(cursor) if cursor else None)
+        if not sig_value:
+            return None, [], cursor
+
+        block_time = sig_value[-1].block_time
+
+        signatures = [signature for signature in reversed(sig_value) if signature.err == None]
+        # Transactions some other wallet signed never count towards this one; skip those already parsed elsewhere.
+        foreign = self.signature_index.foreign([signature.signature for signature in signatures], self.wallet_address)
+        if foreign:
+            self.metrics.count('transactions.skipped_foreign', len(foreign))
+            signatures = [signature for signature in signatures if str(signature.signature) not in foreign]
+        fetched = await self.get_transactions_batched([signature.signature for signature in signatures])
+        transactions = list(zip(signatures, fetched))
+
+        return block_time, transactions, str(sig_value[0].signature)
+
+    def load_pnl_state(self, token_account: str):
+        # Rebuilds the accumulator from the stored pnl_info row so a rescan only has to apply new signatures.
+        pnl = PnlAccumulator()
+        self.metrics.count('accounts.resumed')
+        self.db_cursor.execute('''
+            SELECT income, outcome, total_fee, spent_sol, earned_sol, buys, sells, last_trade, contract,
+                   first_buy_time, final_sell_time
+            FROM pnl_info WHERE token_account = ?
+        ''', (token_account,))
+        row = self.db_cursor.fetchone()
+        if row is None:
+            return pnl
+
+        (pnl.total_income, pnl.total_outcome, total_fee, pnl.sol_spent, pnl.sol_earned, pnl.buy_count,
+         pnl.sell_count, last_trade, pnl.current_contract, pnl.initial_buy_time, pnl.final_sell_time) = row
+        pnl.transaction_fees = round(total_fee * SOLANA_DECIMALS)
+        pnl.last_transaction_time = int(last_trade) if last_trade is not None else None
+        return pnl
+
+    def get_account_signer(self, transaction):
+        if self.transaction_encoding == "base64":
+            return transaction_decoder.account_signer(transaction)
+        return transaction.value.transaction.transaction.message.account_keys[0].pubkey
+
+    def get_information_array(self, transaction):
+        if self.transaction_encoding == "base64":
+            return transaction_decoder.decode_information_array(transaction)
+
+        information_array = []
+        for ui_inner_instructions in transaction.value.transaction.meta.inner_instructions:
+            for txn_instructions in ui_inner_instructions.instructions:
+                if txn_instructions.program_id == TOKEN_PROGRAM_ID:
+                    txn_information = txn_instructions.parsed['info']
+                    if 'destination' in txn_information:
+                        information_array.append(txn_information)
+        return information_array
+
+    async def accumulate_token_account(self, token_account_str: str, block_time, transactions: list,
+                                       last_signature, wallet_address_id: int, journal_row=None):
+        # journal_row, if given, is committed in the same unit as the account's pnl_info row and cursor.
+        cursor = self.signature_cursors.get(token_account_str)
+        if cursor is not None and last_signature == cursor:
+            print(f"No new signatures for token account {token_account_str}")
+            if journal_row is not None:
+                self.db_writer.add_journal(journal_row)
+            return None
+
+        pnl = self.load_pnl_state(token_account_str) if cursor is not None else PnlAccumulator()
+
+        signed_transactions = []
+        signers = []
+        for signature, transaction in transactions:
+            account_signer = self.get_account_signer(transaction)
+            signers.append((signature.signature, account_signer))
+
+            print(TerminalColors.RED, signature.signature, TerminalColors.RESET)
+            print(account_signer, self.wallet_address)
+
+            if account_signer == self.wallet_address:
+                signed_transactions.append((signature, transaction, self.get_information_array(transaction)))
+        self.signature_index.add_many(signers)
+
+        # transactionType needs the mint of every counterparty source account; resolve the misses up front
+        # in a handful of getMultipleAccounts calls instead of one getAccountInfo per transaction.
+        self.metrics.count('transactions.signed', len(signed_transactions))
+        with self.metrics.time('mint.resolve'):
+            await self.mint_cache.resolve(self.solana_client,
+                                          [information_array[1]['source'] for _, _, information_array in signed_transactions
+                                           if len(information_array) > 1 and 'source' in information_array[1]])
+
+        for signature, transaction, information_array in signed_transactions:
+            txn_fee = transaction.value.transaction.meta.fee
+            decimals = transaction.value.transaction.meta.post_token_balances
 
-        while self.active_token_accounts > 0:
             try:
-                for token_account in token_accounts:
-                    self.reset_variables()
-                    print(token_account, "Number of token Account to be processed", len(token_accounts))
-
-                    token_account_str = str(token_account)
-                    sig = await self.solana_client.get_signatures_for_address(Pubkey.from_string(token_account), limit=500)
-                    last_signature = await self.solana_client.get_transaction(sig.value[-1].signature,
-                                                                                    encoding="jsonParsed",
-                                                                                    max_supported_transaction_version=0)
-
-                    block_time = last_signature.value.block_time
-                    try:
-                        await self.update_token_account(self.wallet_address, Pubkey.from_string(token_account_str), block_time, wallet_address_id)
-
-                    except Exception as e:
-                        print(f"The problem is here: {e}")
-
-                    print("UPDATING TOKEN ACCOUNT DONE")
-                    for signature in reversed(sig.value):
-                        if signature.err == None:
-                            transaction = await self.solana_client.get_transaction(signature.signature, encoding="jsonParsed",
-                                                                                         max_supported_transaction_version=0)
-
-                            txn_fee = transaction.value.transaction.meta.fee
-                            instruction_list = transaction.value.transaction.meta.inner_instructions
-                            account_signer = transaction.value.transaction.transaction.message.account_keys[0].pubkey
-                            decimals = transaction.value.transaction.meta.post_token_balances
-                            information_array = []
-
-                            print(TerminalColors.RED, signature.signature, TerminalColors.RESET)
-                            print(account_signer, self.wallet_address)
-
-                            if account_signer == self.wallet_address:
-                                for ui_inner_instructions in instruction_list:
-                                    for txn_instructions in ui_inner_instructions.instructions:
-                                        if txn_instructions.program_id == TOKEN_PROGRAM_ID:
-                                            txn_information = txn_instructions.parsed['info']
-                                            if 'destination' in txn_information:
-                                                information_array.append(txn_information)
-
-                                try:
-                                    block_time = transaction.value.block_time
-
-                                    token_traded, token_decimal = self.get_token_data(decimals)
-                                    await self.transactionDetails(block_time, txn_fee, information_array, token_traded,
-                                                                  token_decimal)
-                                except Exception as e:
-                                    print(e, signature.signature)
-                                    print(TerminalColors.RED, "Error Adding Transaction Details", TerminalColors.RESET)
-                                    continue
-
-                    print("Calculating and updating pnl")
-                    await self.calculate_deltas()
-                    self.print_summary()
-
-                    await self.fill_pnl_info_table(token_account_str, wallet_address_id)
-                    token_accounts.remove(token_account)
-                    self.active_token_accounts = len(token_accounts)
+                block_time = transaction.value.block_time
 
+                token_traded, token_decimal = self.get_token_data(decimals)
+                await self.transactionDetails(pnl, block_time, txn_fee, information_array, token_traded,
+                                              token_decimal)
             except Exception as e:
-                print(f"Error processing token account: {e}, {token_account}")
+                print(e, signature.signature)
+                print(TerminalColors.RED, "Error Adding Transaction Details", TerminalColors.RESET)
+                self.metrics.count('transactions.failed')
+                continue
 
-                if str(e) == "type NoneType doesn't define __round__ method":
-                    token_accounts.remove(token_account)
+        print("Calculating and updating pnl")
+        with self.metrics.time('pnl.deltas'):
+            await self.calculate_deltas(pnl)
+        self.print_summary(pnl)
 
-                continue
+        pnl_row = self.pnl_info_row(pnl, token_account_str, wallet_address_id)
+        # One unit, so a flush never commits the pnl_info row without the cursor and journal row, or vice versa.
+        self.db_writer.add_account(pnl_row, self.token_account_row(token_account_str, block_time, wallet_address_id,
+                                                                   last_signature), journal_row)
+        if last_signature is not None:
+            self.signature_cursors[token_account_str] = last_signature
 
-    async def pair_createdTime(self, token_traded):
-        url = f'https://api.dexscreener.com/latest/dex/tokens/{token_traded}'
+        print("UPDATING TOKEN ACCOUNT DONE")
+        return pnl
+
+    async def process_token_account(self, token_accounts: list, wallet_address_id: int):
+        if self.max_workers > 1:
+            await self.process_token_accounts_concurrently(token_accounts, wallet_address_id)
+            self.db_writer.flush()
+            return
+
+        # A failed account goes to the back of the queue until the journal quarantines it.
+        pending = deque(str(token_account) for token_account in token_accounts)
+        self.active_token_accounts = len(pending)
+
+        while pending:
+            token_account_str = pending.popleft()
+            print(token_account_str, "Number of token Account to be processed", self.active_token_accounts)
+            try:
+                with self.metrics.time('account.total'):
+                    block_time, transactions, last_signature = await self.fetch_token_account(token_account_str)
+                    await self.accumulate_token_account(token_account_str, block_time, transactions,
+                                                        last_signature, wallet_address_id,
+                                                        self.journal.done_row(token_account_str, last_signature))
+                self.metrics.count('accounts.processed')
+
+            except Exception as e:
+                print(f"Error processing token account: {e}, {token_account_str}")
+                self.metrics.count('accounts.failed')
+                if self.journal.failed(token_account_str, e, permanent=is_permanent_failure(e)):
+                    pending.append(token_account_str)
+                else:
+                    self.metrics.count('accounts.quarantined')
+
+            self.active_token_accounts = len(pending)
+            self.metrics.gauge('queue.token_accounts', self.active_token_accounts)
+
+        self.db_writer.flush()
+
+    async def process_token_accounts_concurrently(self, token_accounts: list, wallet_address_id: int):
+        # Up to max_workers accounts are in flight at once, each with its own PnlAccumulator.
+        queue = asyncio.Queue()
+        for token_account in token_accounts:
+            queue.put_nowait(str(token_account))
+        self.active_token_accounts = queue.qsize()
+
+        busy = 0
+
+        async def worker():
+            nonlocal busy
+            while True:
+                token_account_str = await queue.get()
+                busy += 1
+                self.metrics.gauge('queue.token_accounts', queue.qsize())
+                self.metrics.gauge('workers.busy', busy)
+                try:
+                    print(token_account_str, "Number of token Account to be processed", self.active_token_accounts)
+                    with self.metrics.time('account.total'):
+                        block_time, transactions, last_signature = await self.fetch_token_account(token_account_str)
+                        await self.accumulate_token_account(token_account_str, block_time, transactions,
+                                                            last_signature, wallet_address_id,
+                                                            self.journal.done_row(token_account_str, last_signature))
+                    self.active_token_accounts -= 1
+                    self.metrics.count('accounts.processed')
+
+                except Exception as e:
+                    print(f"Error processing token account: {e}, {token_account_str}")
+                    self.metrics.count('accounts.failed')
+
+                    if self.journal.failed(token_account_str, e, permanent=is_permanent_failure(e)):
+                        queue.put_nowait(token_account_str)
+                    else:
+                        self.active_token_accounts -= 1
+                        self.metrics.count('accounts.quarantined')
+
+                finally:
+                    busy -= 1
+                    self.metrics.gauge('workers.busy', busy)
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.max_workers, queue.qsize()))]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
-        response = requests.get(url)
-        data = response.json()
-        if data['pairs'] is not None:
-            return round(data['pairs'][0]['pairCreatedAt'] / 1000)
+    async def pair_createdTime(self, token_traded):
+        with self.metrics.time('price.pair'):
+            pair = await self.price_feed.get_pair(str(token_traded))
+        if pair is not None and pair.get('pairCreatedAt') is not None:
+            return round(pair['pairCreatedAt'] / 1000)
         return 0
 
-    def calculate_time_difference(self, unix_timestamp1, unix_timestamp2):
+    def calculate_duration_seconds(self, unix_timestamp1, unix_timestamp2):
         date1 = self.convert_unix_to_date(round(unix_timestamp1))
         date2 = self.convert_unix_to_date(round(unix_timestamp2))
 
-        difference = date2 - date1
-
-        hours, remainder = divmod(difference.total_seconds(), 3600)
-        minutes, seconds = divmod(remainder, 60)
+        return int((date2 - date1).total_seconds())
 
-        if hours > 0:
-            return f"{int(hours)}h {int(minutes)}m {int(seconds)}s"
-        elif minutes > 0:
-            return f"{int(minutes)}m {int(seconds)}s"
-        else:
-            return f"{int(seconds)}s"
-
-    def update_buy(self, amount, fee, block_time):
-        self.total_income += amount
-        self.transaction_fees += fee
-        self.buy_count += 1
-        if self.initial_buy_time is None:
-            self.initial_buy_time = block_time
-
-    def update_sell(self, amount, fee, block_time):
-        self.total_outcome += amount
-        self.transaction_fees += fee
-        self.sell_count += 1
-        self.final_sell_time = block_time
-        if self.last_transaction_time is None or block_time > self.last_transaction_time:
-            self.last_transaction_time = block_time
-
-    def print_summary(self):
-        print(f"Income: {self.total_income}")
-        print(f"Outcome: {self.total_outcome}")
-        print(f"Total Fee: {self.transaction_fees / SOLANA_DECIMALS}")
-        print(f"Spent SOL: {self.sol_spent}")
-        print(f"Earned SOL: {self.sol_earned}")
-        print(f"Delta Token: {self.token_difference}")
-        print(f"Delta SOL: {self.sol_difference}")
-        print(f"Delta Percentage: {self.profit_percentage}%")
-        print(f"Buys: {self.buy_count}")
-        print(f"Sells: {self.sell_count}")
-
-        print(f"Time Period: {self.trading_duration}")
-        print(f"Contract: {self.current_contract}")
-        print(f"Scam Tokens: {self.suspicious_tokens}")
-
-        if self.token_creation_time == 0:
+    def calculate_time_difference(self, unix_timestamp1, unix_timestamp2):
+        return format_duration(self.calculate_duration_seconds(unix_timestamp1, unix_timestamp2))
+
+    def update_buy(self, pnl: PnlAccumulator, amount, fee, block_time):
+        pnl.total_income += amount
+        pnl.transaction_fees += fee
+        pnl.buy_count += 1
+        if pnl.initial_buy_time is None:
+            pnl.initial_buy_time = block_time
+        return pnl
+
+    def update_sell(self, pnl: PnlAccumulator, amount, fee, block_time):
+        pnl.total_outcome += amount
+        pnl.transaction_fees += fee
+        pnl.sell_count += 1
+        pnl.final_sell_time = block_time
+        if pnl.last_transaction_time is None or block_time > pnl.last_transaction_time:
+            pnl.last_transaction_time = block_time
+        return pnl
+
+    def print_summary(self, pnl: PnlAccumulator):
+        print(f"Income: {pnl.total_income}")
+        print(f"Outcome: {pnl.total_outcome}")
+        print(f"Total Fee: {pnl.transaction_fees / SOLANA_DECIMALS}")
+        print(f"Spent SOL: {pnl.sol_spent}")
+        print(f"Earned SOL: {pnl.sol_earned}")
+        print(f"Delta Token: {pnl.token_difference}")
+        print(f"Delta SOL: {pnl.sol_difference}")
+        print(f"Delta Percentage: {pnl.profit_percentage}%")
+        print(f"Buys: {pnl.buy_count}")
+        print(f"Sells: {pnl.sell_count}")
+
+        print(f"Time Period: {format_duration(pnl.trading_duration)}")
+        print(f"Contract: {pnl.current_contract}")
+        print(f"Scam Tokens: {pnl.suspicious_tokens}")
+
+        if pnl.token_creation_time == 0:
             buy_period = "Unknown"
             print("Buy Period:", buy_period)
-            print(self.current_contract)
+            print(pnl.current_contract)
 
         else:
             try:
-                buy_period = self.calculate_time_difference(self.token_creation_time, self.initial_buy_time)
+                buy_period = self.calculate_time_difference(pnl.token_creation_time, pnl.initial_buy_time)
                 print("Buy Period:", buy_period)
             except Exception as e:
                 print(f"Error calculating buy period: {e}")
                 buy_period = "No buy"
 
-    def reset_variables(self):
-        self.total_income = 0
-        self.total_outcome = 0
-        self.transaction_fees = 0
-        self.sol_spent = 0
-        self.sol_earned = 0
-        self.buy_count = 0
-        self.sell_count = 0
-        self.sol_difference = 0
-        self.token_difference = 0
-        self.profit_percentage = 0
-        self.initial_buy_time = None
-        self.final_sell_time = None
-        self.last_transaction_time = None
-        self.trading_duration = 0
-        self.current_contract = None
-        self.suspicious_tokens = 0
-        self.token_creation_time = 0
-        self.purchase_period = 0
-
-    async def getToken_SolAmount(self):
-        token_address = str(self.current_contract)
-        url = f'https://api.dexscreener.com/latest/dex/tokens/{token_address}'
-
-        response = requests.get(url)
-        data = response.json()
-        if data['pairs'] is not None:
-            token_price_usd = float(data['pairs'][0]['priceUsd'])
-            wallet_amount = self.total_income
+    async def getToken_SolAmount(self, pnl: PnlAccumulator):
+        with self.metrics.time('price.pair'):
+            pair = await self.price_feed.get_pair(str(pnl.current_contract))
+        if pair is not None:
+            token_price_usd = float(pair['priceUsd'])
+            wallet_amount = pnl.total_income
             Worth_wallet_amount = token_price_usd * wallet_amount
             worth_in_solana = Worth_wallet_amount / self.solana_usd_price
             return worth_in_solana
         else:
-            self.suspicious_tokens = 1
+            pnl.suspicious_tokens = 1
             return 0
 
-    async def calculate_deltas(self):
-        if self.sell_count > 0:
-            self.token_difference = self.total_income - self.total_outcome
-            self.sol_difference = self.sol_earned - self.sol_spent
-            self.profit_percentage = (self.sol_difference / self.sol_spent) * 100 if self.sol_spent != 0 else 0
+    async def calculate_deltas(self, pnl: PnlAccumulator):
+        pnl.suspicious_tokens = 0
+        if pnl.sell_count > 0:
+            pnl.token_difference = pnl.total_income - pnl.total_outcome
+            pnl.sol_difference = pnl.sol_earned - pnl.sol_spent
+            pnl.profit_percentage = (pnl.sol_difference / pnl.sol_spent) * 100 if pnl.sol_spent != 0 else 0
         else:
-            self.token_difference = self.total_income
-            self.sol_difference = self.sol_earned - self.sol_spent
-            self.profit_percentage = -100
+            pnl.token_difference = pnl.total_income
+            pnl.sol_difference = pnl.sol_earned - pnl.sol_spent
+            pnl.profit_percentage = -100
 
-        self.token_creation_time = await self.pair_createdTime(self.current_contract)
-        if self.token_creation_time == 0:
-            self.purchase_period = "Unknown"
+        pnl.token_creation_time = await self.pair_createdTime(pnl.current_contract)
+        if pnl.token_creation_time == 0:
+            pnl.purchase_period = None
 
         else:
-            self.purchase_period = self.calculate_time_difference(self.token_creation_time, self.initial_buy_time)
+            pnl.purchase_period = self.calculate_duration_seconds(pnl.token_creation_time, pnl.initial_buy_time)
+
+        if pnl.initial_buy_time and pnl.final_sell_time:
+            pnl.trading_duration = self.calculate_duration_seconds(pnl.initial_buy_time, pnl.final_sell_time)
+        elif pnl.initial_buy_time and not pnl.final_sell_time:
+            pnl.trading_duration = 0
+            pnl.suspicious_tokens = 1
 
-        if self.initial_buy_time and self.final_sell_time:
-            time_difference = self.final_sell_time - self.initial_buy_time
-            self.trading_duration = self.calculate_time_difference(self.initial_buy_time, self.final_sell_time)
-        elif self.initial_buy_time and not self.final_sell_time:
-            self.trading_duration = 0
-            self.suspicious_tokens = 1
+        return pnl
 
-    async def fill_pnl_info_table(self, token_account, wallet_address_id):
+    def pnl_info_row(self, pnl: PnlAccumulator, token_account, wallet_address_id):
+        # The pnl_info row for the account, or None when a field is missing.
         try:
             fields = [
                 ('token_account', token_account),
-                ('income', self.total_income),
-                ('outcome', self.total_outcome),
-                ('fee', self.transaction_fees),
-                ('spent_sol', self.sol_spent),
-                ('earned_sol', self.sol_earned),
-                ('delta_token', self.token_difference),
-                ('delta_sol', self.sol_difference),
-                ('buys', self.buy_count),
-                ('sells', self.sell_count),
-                ('time_period', self.trading_duration),
-                ('contract', self.current_contract),
-                ('scam_tokens', self.suspicious_tokens),
+                ('income', pnl.total_income),
+                ('outcome', pnl.total_outcome),
+                ('fee', pnl.transaction_fees),
+                ('spent_sol', pnl.sol_spent),
+                ('earned_sol', pnl.sol_earned),
+                ('delta_token', pnl.token_difference),
+                ('delta_sol', pnl.sol_difference),
+                ('buys', pnl.buy_count),
+                ('sells', pnl.sell_count),
+                ('time_period', pnl.trading_duration),
+                ('contract', pnl.current_contract),
+                ('scam_tokens', pnl.suspicious_tokens),
                 ('wallet_address_id', wallet_address_id),
-                ('last_trade', self.last_transaction_time),
-                ('buy_period', self.purchase_period)
+                ('last_trade', pnl.last_transaction_time)
             ]
 
             none_fields = [field_name for field_name, field_value in fields if field_value is None]
             if none_fields:
                 print(f"One or more fields are None: {', '.join(none_fields)}. Skipping the operation.")
-                return
-
-            insert_sql = '''
-                    INSERT INTO pnl_info (
-                        wallet_address_id, token_account, income, outcome, total_fee, spent_sol, earned_sol,
-                        delta_token, delta_sol, delta_percentage, buys, sells, last_trade,
-                        time_period, contract, scam_tokens, buy_period
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,?)
-                '''
+                return None
 
             if any(value is None for value in
-                   [token_account, self.total_income, self.total_outcome, self.transaction_fees, self.sol_spent, self.sol_earned, self.token_difference,
-                    self.sol_difference, self.buy_count, self.sell_count, self.trading_duration, self.current_contract, self.suspicious_tokens,
-                    wallet_address_id, self.last_transaction_time, self.calculate_time_difference(self.initial_buy_time, self.token_creation_time) if self.token_creation_time != 0 or self.initial_buy_time != None else 0]):
+                   [token_account, pnl.total_income, pnl.total_outcome, pnl.transaction_fees, pnl.sol_spent, pnl.sol_earned, pnl.token_difference,
+                    pnl.sol_difference, pnl.buy_count, pnl.sell_count, pnl.trading_duration, pnl.current_contract, pnl.suspicious_tokens,
+                    wallet_address_id, pnl.last_transaction_time, self.calculate_duration_seconds(pnl.initial_buy_time, pnl.token_creation_time) if pnl.token_creation_time != 0 or pnl.initial_buy_time != None else 0]):
                 print("One or more fields are None. Skipping the operation.")
-                return
-
-            check_sql = '''
-                    SELECT   1 FROM pnl_info
-                    WHERE wallet_address_id = ? AND last_trade = ?
-                '''
-            cursor = self.db_connection.cursor()
-            cursor.execute(check_sql, (wallet_address_id, self.last_transaction_time))
-            if cursor.fetchone() is not None:
-                print("Transaction already exists in the database. Skipping the operation.")
-                return
+                return None
 
             insert_data = (
                 wallet_address_id,
                 token_account,
-                self.total_income,
-                self.total_outcome,
-                self.transaction_fees / SOLANA_DECIMALS,
-                self.sol_spent,
-                self.sol_earned,
-                self.token_difference,
-                self.sol_difference,
-                self.profit_percentage,
-                self.buy_count,
-                self.sell_count,
-                self.last_transaction_time,
-                self.trading_duration,
-                str(self.current_contract),
-                self.suspicious_tokens,
-                self.purchase_period
+                pnl.total_income,
+                pnl.total_outcome,
+                pnl.transaction_fees / SOLANA_DECIMALS,
+                pnl.sol_spent,
+                pnl.sol_earned,
+                pnl.token_difference,
+                pnl.sol_difference,
+                pnl.profit_percentage,
+                pnl.buy_count,
+                pnl.sell_count,
+                pnl.last_transaction_time,
+                pnl.trading_duration,
+                str(pnl.current_contract),
+                pnl.suspicious_tokens,
+                pnl.purchase_period,
+                pnl.initial_buy_time,
+                pnl.final_sell_time
             )
 
-            cursor.execute(insert_sql, insert_data)
-            self.db_connection.commit()
-
-            print("PNL info successfully inserted into the database.")
+            print("PNL info queued for the database.")
+            return insert_data
         except Exception as e:
             print(f"Filling info issue, {e}")
+            return None
+
+    def record_cache_stats(self):
+        # Caches and the RPC pool keep their own totals; fold them into the metrics once the wallet is done.
+        self.metrics.add_cache('transactions', self.transaction_cache.hits, self.transaction_cache.misses)
+        self.metrics.add_cache('mints', self.mint_cache.hits, self.mint_cache.misses)
+        self.metrics.add_cache('mints.batch', self.mint_cache.batch_hits, self.mint_cache.batch_misses)
+        self.metrics.add_cache('pairs', self.price_feed.hits, self.price_feed.misses)
+        hits, misses = self.signature_index_counts
+        self.metrics.add_cache('signatures', self.signature_index.hits - hits, self.signature_index.misses - misses)
+        self.signature_index_counts = (self.signature_index.hits, self.signature_index.misses)
+        self.metrics.gauge('signatures.filter_fp_rate', round(self.signature_index.filter.false_positive_rate(), 6))
+        self.metrics.gauge('signatures.filter_bytes', self.signature_index.filter.memory_bytes())
+        for endpoint in self.solana_client.stats():
+            self.metrics.count('rpc.requests', endpoint['requests'])
+            self.metrics.count('rpc.errors', endpoint['errors'])
+            self.metrics.count('rpc.rate_limited', endpoint['rate_limited'])
+        self.metrics.count('price.requests', self.price_feed.requests)
+
+    def queue_signature(self, signature):
+        # Streaming mode: a wallet transaction to map onto the token accounts it touched.
+        key = (str(self.wallet_address), str(signature))
+        if key in TRACKED_SIGNATURES:
+            return False
+        TRACKED_SIGNATURES.add(key)
+        self.trade_queue.put_nowait((QUEUED_SIGNATURE, str(signature)))
+        self.metrics.gauge('queue.trades', self.trade_queue.qsize())
+        return True
+
+    def queue_token_account(self, token_account):
+        self.trade_queue.put_nowait((QUEUED_TOKEN_ACCOUNT, str(token_account)))
+        self.metrics.gauge('queue.trades', self.trade_queue.qsize())
+
+    def wallet_token_accounts(self, transaction):
+        # Token accounts of this wallet whose balance the transaction changed, wrapped SOL excluded.
+        value = transaction.value
+        if value is None:
+            return set()
+        meta = value.transaction.meta
+        if self.transaction_encoding == "base64":
+            account_keys = transaction_decoder.resolve_account_keys(transaction)
+        else:
+            account_keys = [account.pubkey for account in value.transaction.transaction.message.account_keys]
+
+        token_accounts = set()
+        for balance in list(meta.pre_token_balances or []) + list(meta.post_token_balances or []):
+            if balance.owner == self.wallet_address and str(balance.mint) != SOLANA_WRAPPED_MINT \
+                    and balance.account_index < len(account_keys):
+                token_accounts.add(str(account_keys[balance.account_index]))
+        return token_accounts
+
+    async def refresh_token_account(self, token_account_str: str):
+        # Applies the signatures since the stored cursor; a token account seen for the first time gets its whole history.
+        block_time, transactions, last_signature = await self.fetch_token_account(token_account_str)
+        if not transactions:
+            return None
+        return await self.accumulate_token_account(token_account_str, block_time, transactions, last_signature,
+                                                   self.wallet_id)
+
+    async def process_trade_queue(self):
+        # Streaming consumer: drains whatever has queued up, resolves signatures to token accounts, refreshes each
+        # account once and flushes, so pnl_info trails a trade by one batch.
+        while True:
+            batch = [await self.trade_queue.get()]
+            while not self.trade_queue.empty():
+                batch.append(self.trade_queue.get_nowait())
+            self.metrics.gauge('queue.trades', 0)
+
+            try:
+                with self.metrics.time('stream.batch'):
+                    token_accounts = {value for kind, value in batch if kind == QUEUED_TOKEN_ACCOUNT}
+                    signatures = [Signature.from_string(value) for kind, value in batch if kind == QUEUED_SIGNATURE]
+                    sources = {}
+                    if signatures:
+                        transactions = await self.get_transactions_batched(signatures)
+                        for signature, transaction in zip(signatures, transactions):
+                            for token_account_str in self.wallet_token_accounts(transaction):
+                                sources.setdefault(token_account_str, set()).add(str(signature))
+                    token_accounts |= sources.keys()
+
+                    for token_account_str in token_accounts:
+                        try:
+                            await self.refresh_token_account(token_account_str)
+                            self.stream_retries.pop(token_account_str, None)
+                            self.metrics.count('stream.accounts_refreshed')
+                        except Exception as e:
+                            print(f"Error refreshing token account: {e}, {token_account_str}")
+                            self.metrics.count('accounts.failed')
+                            self.retry_token_account(token_account_str, sources.get(token_account_str, ()), e)
+                    # The next refresh of these accounts resumes from their pnl_info rows, so they must be committed.
+                    await self.db_writer.drain()
+            except Exception as e:
+                print(f"Error processing streamed trades: {e}")
+                self.metrics.count('stream.batch_errors')
+                # Forget the batch's signatures so a later backfill can queue them again.
+                TRACKED_SIGNATURES.difference_update((str(self.wallet_address), value) for kind, value in batch
+                                                     if kind == QUEUED_SIGNATURE)
+            finally:
+                for _ in batch:
+                    self.trade_queue.task_done()
+
+    def retry_token_account(self, token_account_str, signatures, error):
+        # The cursor did not move, but the signatures that led here are already tracked, so neither a later
+        # notification nor a backfill would bring the account back on its own: queue it again after a delay.
+        retries, sources = self.stream_retries.get(token_account_str, (0, set()))
+        sources |= set(signatures)
+        if retries < len(STREAM_RETRY_DELAYS) and not is_permanent_failure(error):
+            self.stream_retries[token_account_str] = (retries + 1, sources)
+            asyncio.get_running_loop().call_later(STREAM_RETRY_DELAYS[retries], self.queue_token_account,
+                                                  token_account_str)
+            self.metrics.count('stream.accounts_requeued')
+            return
+        # Out of retries: forget its signatures so the next reconnect backfill can queue them again.
+        self.stream_retries.pop(token_account_str, None)
+        TRACKED_SIGNATURES.difference_update((str(self.wallet_address), signature) for signature in sources)
+        self.metrics.count('stream.accounts_abandoned')
 
     async def process_transactions(self):
         try:
@@ -759,26 +1058,45 @@ class SolanaTrader:
             opts = TokenAccountOpts(
                 program_id=Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
             )
-            response = await self.solana_client.get_token_accounts_by_owner(owner, opts)
+            with self.metrics.time('rpc.token_accounts'):
+                response = await self.solana_client.get_token_accounts_by_owner(owner, opts)
             solana_token_accounts = {str(token_account.pubkey): token_account for token_account in response.value}
 
             num_tokenAccounts = len(solana_token_accounts)
             print("Number of token Accounts", num_tokenAccounts)
-            self.db_cursor.execute('SELECT wallet_token_account FROM token_accounts WHERE wallet_address_id = ?',
+            self.db_cursor.execute('SELECT wallet_token_account, last_signature FROM token_accounts WHERE wallet_address_id = ?',
                            (wallet_address_id,))
-            db_token_accounts = {row[0] for row in self.db_cursor.fetchall()}
+            db_rows = self.db_cursor.fetchall()
+            db_token_accounts = {row[0] for row in db_rows}
+            self.signature_cursors = {row[0]: row[1] for row in db_rows if row[1] is not None}
             newTokenAccounts = solana_token_accounts.keys() - db_token_accounts
             new_token_accounts = list(newTokenAccounts)
+            # Accounts scanned with a stored cursor are refreshed with only the signatures since that cursor.
+            refresh_token_accounts = [token_account for token_account in solana_token_accounts
+                                      if token_account in self.signature_cursors]
 
-            if not newTokenAccounts:
+            if not newTokenAccounts and not refresh_token_accounts:
                 print("No new token accounts")
                 return
 
-            if 1 <= len(newTokenAccounts) < MAX_TOKEN_ACCOUNTS:
+            if len(newTokenAccounts) < MAX_TOKEN_ACCOUNTS:
+                # An interrupted scan left pending accounts behind: only those (and brand-new ones) are left to do.
+                planned = set(await self.journal.plan(new_token_accounts + refresh_token_accounts))
+                if self.journal.resumed:
+                    print(f"Resuming scan of {self.wallet_address}: {len(planned)} token accounts left")
+                    self.metrics.count('accounts.resume_skipped',
+                                       len(new_token_accounts) + len(refresh_token_accounts) - len(planned))
+                new_token_accounts = [token_account for token_account in new_token_accounts if token_account in planned]
+                refresh_token_accounts = [token_account for token_account in refresh_token_accounts
+                                          if token_account in planned]
+
                 print(
-                    f"Processing Address {self.wallet_address} Number of Token Accounts to be Processed {len(newTokenAccounts)}")
-                new_token_accounts = list(newTokenAccounts)
-                await self.process_token_account(new_token_accounts, wallet_address_id)
+                    f"Processing Address {self.wallet_address} Number of Token Accounts to be Processed {len(new_token_accounts)}, refreshing {len(refresh_token_accounts)}")
+                # A token account's mint is its first 32 bytes; warm the Dexscreener pairs for all of them at once.
+                with self.metrics.time('price.prefetch'):
+                    await self.price_feed.prefetch(str(Pubkey.from_bytes(bytes(solana_token_accounts[token_account].account.data[:32])))
+                                                   for token_account in new_token_accounts)
+                await self.process_token_account(new_token_accounts + refresh_token_accounts, wallet_address_id)
                 print("ALL TOKEN ACCOUNTS PROCESSED")
             else:
                 print(
@@ -789,15 +1107,73 @@ class SolanaTrader:
             print(e)
             print(f"Failed to process transaction {self.wallet_address} {e}")
 
-async def run():
-    processor = SolanaTrader(Pubkey.from_string("EWzk2847WCPis45hPQ6Em5UuRbZiP1CSmqx7nG9ELd2L"))
-
-    await processor.initialize()
-
-    await processor.process_transactions()
-
-    await processor.generate_reports_for_time_periods([90, 60, 30, 14, 7, 1])
-
+async def run(wallet_addresses=(DEFAULT_WALLET_ADDRESS,), time_periods=DEFAULT_REPORT_PERIODS,
+              max_workers=TOKEN_ACCOUNT_WORKERS, export_format="xlsx", reports=True, metrics=None,
+              metrics_file=None, metrics_format=None, retry_quarantined=False):
+    metrics = metrics if metrics is not None else ScanMetrics()
+    for wallet_address in wallet_addresses:
+        processor = SolanaTrader(Pubkey.from_string(str(wallet_address)), max_workers=max_workers, metrics=metrics)
+        try:
+            await processor.initialize()
+
+            if retry_quarantined:
+                print(f"Released {await processor.journal.release_quarantined()} quarantined token accounts")
+            await processor.process_transactions()
+            await processor.db_writer.drain()
+            for token_account, attempts, error in processor.journal.quarantined():
+                print(f"{TerminalColors.YELLOW}Quarantined token account {token_account} after {attempts} attempts: "
+                      f"{error}{TerminalColors.RESET}")
+
+            if reports:
+                await processor.generate_reports_for_time_periods(list(time_periods), export_format=export_format)
+        finally:
+            await processor.price_feed.close()
+            await processor.solana_client.close()
+            processor.db_writer.close()
+            processor.record_cache_stats()
+            processor.signature_index.save()
+
+        for endpoint in processor.solana_client.stats():
+            print(f"RPC {endpoint['url']}: {endpoint['requests']} requests, {endpoint['errors']} errors, "
+                  f"{endpoint['rate_limited']} rate limited, latency {endpoint['latency_ms']} ms")
+
+    if wallet_addresses:
+        # Flushes only refreshed the scanned wallets; age old trades out of every other tracked wallet too.
+        expire_winning_wallets(DATABASE_NAME)
     print("All accounts processed and reports generated.")
-
-asyncio.run(run())
\ No newline at end of file
+    if metrics.enabled:
+        print(metrics.summary())
+        if metrics_file:
+            metrics.export(metrics_file, metrics_format)
+            print(f"Metrics written to {metrics_file}")
+
+
+async def stream(wallet_addresses=(DEFAULT_WALLET_ADDRESS,), max_workers=TOKEN_ACCOUNT_WORKERS, metrics=None,
+                 ws_url=None):
+    # Streaming mode: one websocket per wallet keeps pnl_info current until cancelled (Ctrl+C).
+    from wallet_stream import WalletStream
+
+    metrics = metrics if metrics is not None else ScanMetrics()
+    processors = [SolanaTrader(Pubkey.from_string(str(wallet_address)), max_workers=max_workers, metrics=metrics)
+                  for wallet_address in wallet_addresses]
+    try:
+        for processor in processors:
+            await processor.initialize()
+        await asyncio.gather(*(WalletStream(processor, ws_url=ws_url).run() for processor in processors))
+    finally:
+        for processor in processors:
+            await processor.price_feed.close()
+            await processor.solana_client.close()
+            processor.db_writer.close()
+            processor.record_cache_stats()
+            processor.signature_index.save()
+        if metrics.enabled:
+            print(metrics.summary())
+
+
+if __name__ == "__main__":
+    import sys
+    import scan
+    # Let scan reuse this already-imported module instead of loading functions.py a second time.
+    sys.modules.setdefault("functions", sys.modules[__name__])
+    raise SystemExit(scan.main())
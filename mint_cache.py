@@ -0,0 +1,119 @@
+import logging
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from solana.rpc.types import DataSliceOpts
+from solders.pubkey import Pubkey
+
+logger = logging.getLogger(__name__)
+
+MINT_CACHE_CAPACITY = 100_000
+# getMultipleAccounts accepts at most 100 pubkeys per call.
+MULTIPLE_ACCOUNTS_LIMIT = 100
+# The mint is the first field of an SPL token account, so only these bytes are requested.
+MINT_DATA_SLICE = DataSliceOpts(offset=0, length=32)
+SQL_PARAMETER_CHUNK = 500
+MINT_INSERT_SQL = 'INSERT OR IGNORE INTO token_account_mints (token_account, mint) VALUES (?, ?)'
+
+
+class MintCache:
+    """Token account -> mint lookups backed by an in-memory LRU and a SQLite table"""
+
+    def __init__(self, connection: sqlite3.Connection, capacity: int = MINT_CACHE_CAPACITY, writer=None):
+        self.connection = connection
+        # Resolved mints are stored through the scanner's writer when it has one (see batch_scan.WriterClient).
+        self.writer = writer
+        self.capacity = capacity
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # resolve() lookups, kept apart from get() whose reads mostly follow a resolve and always hit.
+        self.batch_hits = 0
+        self.batch_misses = 0
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS token_account_mints (
+                token_account TEXT PRIMARY KEY,
+                mint TEXT NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self.connection.commit()
+
+    def remember(self, token_account: str, mint: str) -> None:
+        """Insert into the in-memory LRU, evicting the oldest entry when full"""
+        self.entries[token_account] = mint
+        self.entries.move_to_end(token_account)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def get_many(self, token_accounts: Iterable[str]) -> Dict[str, str]:
+        """Return known mints from memory, then from disk"""
+        found: Dict[str, str] = {}
+        on_disk: List[str] = []
+        for token_account in token_accounts:
+            mint = self.entries.get(token_account)
+            if mint is None:
+                on_disk.append(token_account)
+            else:
+                self.entries.move_to_end(token_account)
+                found[token_account] = mint
+
+        for start in range(0, len(on_disk), SQL_PARAMETER_CHUNK):
+            chunk = on_disk[start:start + SQL_PARAMETER_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f'SELECT token_account, mint FROM token_account_mints WHERE token_account IN ({placeholders})', chunk)
+            for token_account, mint in rows:
+                self.remember(token_account, mint)
+                found[token_account] = mint
+
+        return found
+
+    def get(self, token_account: str) -> Optional[Pubkey]:
+        """Return the cached mint for one token account, counting the lookup as a hit or miss"""
+        mint = self.get_many([token_account]).get(token_account)
+        if mint is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return Pubkey.from_string(mint)
+
+    def put_many(self, mints: Dict[str, str]) -> None:
+        """Store resolved mints in memory and on disk"""
+        if not mints:
+            return
+        for token_account, mint in mints.items():
+            self.remember(token_account, mint)
+        if self.writer is not None:
+            self.writer.executemany(MINT_INSERT_SQL, list(mints.items()))
+            return
+        self.connection.executemany(MINT_INSERT_SQL, list(mints.items()))
+        self.connection.commit()
+
+    async def resolve(self, solana_client, token_accounts: Iterable[str]) -> Dict[str, str]:
+        """Resolve mints for many token accounts, batching cache misses through getMultipleAccounts"""
+        wanted = list(dict.fromkeys(str(token_account) for token_account in token_accounts))
+        found = self.get_many(wanted)
+        missing = [token_account for token_account in wanted if token_account not in found]
+        self.batch_hits += len(found)
+        self.batch_misses += len(missing)
+
+        for start in range(0, len(missing), MULTIPLE_ACCOUNTS_LIMIT):
+            chunk = missing[start:start + MULTIPLE_ACCOUNTS_LIMIT]
+            try:
+                response = await solana_client.get_multiple_accounts([Pubkey.from_string(token_account)
+                                                                      for token_account in chunk],
+                                                                     encoding="base64", data_slice=MINT_DATA_SLICE)
+            except Exception as e:
+                logger.error(f"Error resolving mints for {len(chunk)} token accounts: {e}")
+                continue
+
+            resolved = {}
+            for token_account, account in zip(chunk, response.value):
+                # Closed accounts come back empty and are left to the single-account path.
+                if account is not None and len(account.data) >= 32:
+                    resolved[token_account] = str(Pubkey.from_bytes(bytes(account.data[:32])))
+            self.put_many(resolved)
+            found.update(resolved)
+
+        return found
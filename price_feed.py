@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEXSCREENER_TOKENS_URL = "https://api.dexscreener.com/latest/dex/tokens"
+COINGECKO_SOL_PRICE_URL = "https://api.coingecko.com/api/v3/simple/price?ids=solana&vs_currencies=usd"
+# Dexscreener's multi-token endpoint accepts up to 30 comma-separated addresses.
+DEXSCREENER_BATCH_LIMIT = 30
+PAIR_TTL_SECONDS = 300
+SOL_PRICE_TTL_SECONDS = 60
+# Lookups issued within this window are coalesced into one multi-token request.
+COALESCE_WINDOW_SECONDS = 0.01
+HTTP_CONNECTION_LIMIT = 20
+HTTP_TIMEOUT_SECONDS = 15
+
+
+class TTLCache:
+    """Dictionary whose entries expire after a fixed time-to-live"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entries: Dict[Any, tuple] = {}
+
+    def get(self, key):
+        """Return (found, value)"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return False, None
+        return True, value
+
+    def set(self, key, value) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+
+
+class PriceFeed:
+    """Shared async HTTP client for Dexscreener pair data and the CoinGecko SOL price"""
+
+    def __init__(self, dexscreener_url: str = DEXSCREENER_TOKENS_URL, coingecko_url: str = COINGECKO_SOL_PRICE_URL,
+                 pair_ttl: float = PAIR_TTL_SECONDS, sol_price_ttl: float = SOL_PRICE_TTL_SECONDS):
+        self.dexscreener_url = dexscreener_url
+        self.coingecko_url = coingecko_url
+        self.pairs = TTLCache(pair_ttl)
+        self.sol_price = TTLCache(sol_price_ttl)
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self.pending: Dict[str, asyncio.Future] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.requests = 0
+        # Pair lookups answered from the TTL cache or an in-flight request vs ones that queued a new fetch.
+        self.hits = 0
+        self.misses = 0
+
+    def get_session(self) -> "aiohttp.ClientSession":
+        if self.session is None or self.session.closed:
+            # Imported on first request so loading the scanner does not pay for aiohttp.
+            import aiohttp
+
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS))
+        return self.session
+
+    async def get_json(self, url: str):
+        self.requests += 1
+        async with self.get_session().get(url) as response:
+            if response.status != 200:
+                logger.error(f"HTTP {response.status} from {url}")
+                return None
+            return await response.json(content_type=None)
+
+    async def get_sol_price(self) -> Optional[float]:
+        """SOL/USD price, cached for a short TTL"""
+        found, price = self.sol_price.get("solana")
+        if found:
+            return price
+        data = await self.get_json(self.coingecko_url)
+        price = data['solana']['usd'] if data else None
+        if price is not None:
+            self.sol_price.set("solana", price)
+        return price
+
+    async def fetch_pairs(self, mints: list) -> Dict[str, Optional[dict]]:
+        """One Dexscreener request for up to DEXSCREENER_BATCH_LIMIT mints; the first listed pair wins per mint"""
+        data = await self.get_json(f"{self.dexscreener_url}/{','.join(mints)}")
+        wanted = set(mints)
+        pairs: Dict[str, Optional[dict]] = {mint: None for mint in mints}
+        for pair in (data or {}).get('pairs') or []:
+            for side in ('baseToken', 'quoteToken'):
+                address = (pair.get(side) or {}).get('address')
+                if address in wanted and pairs[address] is None:
+                    pairs[address] = pair
+        # Failed requests are not cached so the next lookup retries.
+        if data is not None:
+            for mint, pair in pairs.items():
+                self.pairs.set(mint, pair)
+        return pairs
+
+    async def flush_pending(self) -> None:
+        await asyncio.sleep(COALESCE_WINDOW_SECONDS)
+        pending, self.pending = self.pending, {}
+        self.flush_task = None
+        mints = list(pending)
+        for start in range(0, len(mints), DEXSCREENER_BATCH_LIMIT):
+            chunk = mints[start:start + DEXSCREENER_BATCH_LIMIT]
+            try:
+                pairs = await self.fetch_pairs(chunk)
+            except Exception as e:
+                logger.error(f"Error fetching Dexscreener pairs: {e}")
+                pairs = {}
+            for mint in chunk:
+                self.in_flight.pop(mint, None)
+                if not pending[mint].done():
+                    pending[mint].set_result(pairs.get(mint))
+
+    async def get_pair(self, mint: str) -> Optional[dict]:
+        """Most liquid Dexscreener pair for a mint, or None when the token has no pairs"""
+        mint = str(mint)
+        found, pair = self.pairs.get(mint)
+        if found:
+            self.hits += 1
+            return pair
+
+        future = self.in_flight.get(mint)
+        if future is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[mint] = future
+            self.pending[mint] = future
+            if self.flush_task is None:
+                self.flush_task = asyncio.create_task(self.flush_pending())
+        return await asyncio.shield(future)
+
+    async def prefetch(self, mints: Iterable[str]) -> None:
+        """Warm the pair cache for many mints with as few multi-token requests as possible"""
+        await asyncio.gather(*(self.get_pair(mint) for mint in dict.fromkeys(str(mint) for mint in mints)))
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
@@ -0,0 +1,107 @@
+import csv
+import logging
+import os
+from typing import Iterable, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+FILE_EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrow'}
+
+# Order of the rows SolanaTrader.iter_report_chunks yields; times are epoch seconds, durations seconds.
+TRANSACTION_FIELDS: List[Tuple[str, str]] = [
+    ('token_account', 'string'), ('income', 'float64'), ('outcome', 'float64'), ('total_fee', 'float64'),
+    ('spent_sol', 'float64'), ('earned_sol', 'float64'), ('delta_token', 'float64'), ('delta_sol', 'float64'),
+    ('delta_percentage', 'float64'), ('buys', 'int64'), ('sells', 'int64'), ('last_trade', 'int64'),
+    ('time_period', 'int64'), ('buy_period', 'int64'), ('contract', 'string'), ('scam_tokens', 'int64'),
+]
+
+SUMMARY_FIELDS: List[Tuple[str, str]] = [
+    ('WalletAddress', 'string'), ('TimePeriod', 'string'), ('SolBalance', 'float64'), ('WinRate', 'float64'),
+    ('PnL_R', 'float64'), ('PnL_Loss', 'float64'), ('Balance_Change', 'float64'), ('ScamTokens', 'int64'),
+    ('TokenAccounts', 'int64'),
+]
+
+
+def load_pyarrow():
+    """pyarrow is only needed for the columnar formats, so it is imported on first use"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet and Arrow exports need pyarrow: pip install pyarrow") from e
+    return pyarrow
+
+
+def arrow_schema(pa, fields: Sequence[Tuple[str, str]]):
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in fields])
+
+
+def record_batch(pa, schema, rows: Sequence[Sequence]):
+    """Column-wise RecordBatch from one chunk of row tuples"""
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+
+def write_csv(path: str, fields: Sequence[Tuple[str, str]], chunks: Iterable[Sequence[Sequence]]) -> int:
+    written = 0
+    with open(path, 'w', newline='') as output:
+        writer = csv.writer(output)
+        writer.writerow([name for name, _ in fields])
+        for rows in chunks:
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def write_columnar(path: str, export_format: str, fields: Sequence[Tuple[str, str]],
+                   chunks: Iterable[Sequence[Sequence]]) -> int:
+    pa = load_pyarrow()
+    schema = arrow_schema(pa, fields)
+    written = 0
+    if export_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(path, schema)
+    else:
+        # Uncompressed IPC file, so readers can pa.memory_map it without copying.
+        writer = pa.ipc.new_file(path, schema)
+    try:
+        for rows in chunks:
+            if rows:
+                writer.write_batch(record_batch(pa, schema, rows))
+                written += len(rows)
+    finally:
+        writer.close()
+    return written
+
+
+def export_rows(path: str, export_format: str, fields: Sequence[Tuple[str, str]],
+                chunks: Iterable[Sequence[Sequence]]) -> int:
+    """Stream row chunks into one CSV, Parquet or Arrow IPC file and return the row count
+
+    The file is written next to its final name and renamed into place, so readers never see a partial file.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r}; expected one of {EXPORT_FORMATS}")
+
+    partial_path = f"{path}.partial"
+    try:
+        if export_format == 'csv':
+            written = write_csv(partial_path, fields, chunks)
+        else:
+            written = write_columnar(partial_path, export_format, fields, chunks)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.replace(partial_path, path)
+    return written
+
+
+def export_summary(path: str, export_format: str, summary: dict) -> int:
+    return export_rows(path, export_format, SUMMARY_FIELDS, [[tuple(summary.get(name) for name, _ in SUMMARY_FIELDS)]])
+
+
+def export_transactions(path: str, export_format: str, chunks: Iterable[Sequence[Sequence]]) -> int:
+    return export_rows(path, export_format, TRANSACTION_FIELDS, chunks)
@@ -0,0 +1,387 @@
+"""Local stand-in for the Solana JSON-RPC, Dexscreener and CoinGecko endpoints, replaying recorded fixtures
+
+    python rpc_replay.py record fixtures.json.gz --rpc-upstream https://rpc.ankr.com/solana
+    python rpc_replay.py serve fixtures.json.gz --latency-ms 40 --jitter-ms 10 --rps 50 --error-rate 0.01
+
+Point config.SOLANA_RPC_URLS at http://HOST:PORT/ and PriceFeed at http://HOST:PORT/dexscreener/latest/dex/tokens
+and http://HOST:PORT/coingecko/api/v3/simple/price?ids=solana&vs_currencies=usd.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientSession, web
+
+logger = logging.getLogger(__name__)
+
+FIXTURE_VERSION = 1
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8899
+DEXSCREENER_UPSTREAM = "https://api.dexscreener.com"
+COINGECKO_UPSTREAM = "https://api.coingecko.com"
+# Path prefixes the stand-in serves the HTTP price APIs under.
+HTTP_UPSTREAMS = {"dexscreener": DEXSCREENER_UPSTREAM, "coingecko": COINGECKO_UPSTREAM}
+DEXSCREENER_TOKENS_PATH = "/dexscreener/latest/dex/tokens/"
+# JSON-RPC error code returned for calls that have no recorded response.
+MISSING_FIXTURE_CODE = -32000
+
+
+def params_key(params) -> str:
+    return json.dumps(params if params is not None else [], sort_keys=True, separators=(",", ":"))
+
+
+def account_key(pubkey: str, params) -> str:
+    """Per-account key: the pubkey plus the encoding and data slice the account was read with"""
+    options = params[1] if len(params) > 1 and isinstance(params[1], dict) else {}
+    return f"{pubkey}|{params_key({name: options.get(name) for name in ('encoding', 'dataSlice')})}"
+
+
+def first_param_key(params) -> Optional[str]:
+    """Looser key on the first positional parameter, e.g. the signature of getTransaction"""
+    if isinstance(params, list) and params:
+        return json.dumps(params[0], sort_keys=True, separators=(",", ":"))
+    return None
+
+
+def page_signatures(response: dict, params) -> dict:
+    """Apply before/until/limit to a recorded newest-first signature list, as the node would"""
+    statuses = response.get("result")
+    options = params[1] if len(params) > 1 and isinstance(params[1], dict) else {}
+    if not isinstance(statuses, list) or not any(options.get(name) for name in ("before", "until", "limit")):
+        return response
+    signatures = [status.get("signature") for status in statuses]
+    start = signatures.index(options["before"]) + 1 if options.get("before") in signatures else 0
+    end = signatures.index(options["until"]) if options.get("until") in signatures else len(statuses)
+    paged = statuses[start:end]
+    if options.get("limit"):
+        paged = paged[:options["limit"]]
+    return {"result": paged}
+
+
+class Fixtures:
+    """Recorded JSON-RPC results keyed by method and parameters, plus raw HTTP GET bodies keyed by path
+
+    Account reads and Dexscreener pairs are also kept per account / per mint, because the scanner groups them
+    into getMultipleAccounts and multi-token requests whose composition depends on cache state and scheduling.
+    Replay recombines those per-item answers for any grouping.
+    """
+
+    def __init__(self, rpc: Optional[Dict[str, Dict[str, dict]]] = None, http: Optional[Dict[str, Any]] = None,
+                 accounts: Optional[Dict[str, Any]] = None, pairs: Optional[Dict[str, list]] = None,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.rpc: Dict[str, Dict[str, dict]] = rpc or {}
+        self.http: Dict[str, Any] = http or {}
+        self.accounts: Dict[str, Any] = accounts or {}
+        self.pairs: Dict[str, list] = pairs or {}
+        self.meta: Dict[str, Any] = meta or {}
+        self.loose: Dict[str, Dict[str, dict]] = {}
+        for method, calls in self.rpc.items():
+            for key, response in calls.items():
+                self.index_loose(method, json.loads(key), response)
+
+    def index_loose(self, method: str, params, response: dict) -> None:
+        loose_key = first_param_key(params)
+        if loose_key is not None:
+            self.loose.setdefault(method, {})[loose_key] = response
+
+    def add_rpc(self, method: str, params, response: dict) -> None:
+        """Store the result or error part of one JSON-RPC response"""
+        stored = {"error": response["error"]} if "error" in response else {"result": response.get("result")}
+        self.rpc.setdefault(method, {})[params_key(params)] = stored
+        self.index_loose(method, params, stored)
+
+        result = stored.get("result")
+        if result is None or not isinstance(params, list) or not params:
+            return
+        if method == "getMultipleAccounts":
+            for pubkey, account in zip(params[0], result.get("value") or []):
+                self.accounts[account_key(pubkey, params)] = account
+        elif method == "getAccountInfo":
+            self.accounts[account_key(params[0], params)] = result.get("value")
+
+    def add_http(self, path: str, body) -> None:
+        self.http[path] = body
+        if path.startswith(DEXSCREENER_TOKENS_PATH) and isinstance(body, dict):
+            mints = path[len(DEXSCREENER_TOKENS_PATH):].split("?")[0].split(",")
+            for mint in mints:
+                self.pairs[mint] = [pair for pair in body.get("pairs") or []
+                                    if mint in ((pair.get("baseToken") or {}).get("address"),
+                                                (pair.get("quoteToken") or {}).get("address"))]
+
+    def lookup_rpc(self, method: str, params) -> Optional[dict]:
+        response = self.rpc.get(method, {}).get(params_key(params))
+        if response is None and method in ("getMultipleAccounts", "getAccountInfo"):
+            response = self.compose_accounts(method, params)
+        if response is None:
+            # Cursors and commitment options can drift between recording and replay; the subject rarely does.
+            loose_key = first_param_key(params)
+            if loose_key is not None:
+                response = self.loose.get(method, {}).get(loose_key)
+                if response is not None and method == "getSignaturesForAddress":
+                    response = page_signatures(response, params)
+        return response
+
+    def compose_accounts(self, method: str, params) -> Optional[dict]:
+        if not isinstance(params, list) or not params:
+            return None
+        pubkeys = params[0] if method == "getMultipleAccounts" else [params[0]]
+        keys = [account_key(pubkey, params) for pubkey in pubkeys]
+        if not all(key in self.accounts for key in keys):
+            return None
+        values = [self.accounts[key] for key in keys]
+        return {"result": {"context": {"slot": 0}, "value": values if method == "getMultipleAccounts" else values[0]}}
+
+    def lookup_http(self, path: str):
+        body = self.http.get(path)
+        if body is None and path.startswith(DEXSCREENER_TOKENS_PATH):
+            mints = path[len(DEXSCREENER_TOKENS_PATH):].split("?")[0].split(",")
+            if all(mint in self.pairs for mint in mints):
+                pairs = []
+                seen = set()
+                for mint in mints:
+                    for pair in self.pairs[mint]:
+                        identity = pair.get("pairAddress") or json.dumps(pair, sort_keys=True)
+                        if identity not in seen:
+                            seen.add(identity)
+                            pairs.append(pair)
+                body = {"schemaVersion": "1.0.0", "pairs": pairs or None}
+        return body
+
+    def count(self) -> int:
+        return sum(len(calls) for calls in self.rpc.values()) + len(self.http)
+
+    @classmethod
+    def load(cls, path: str) -> "Fixtures":
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt") as source:
+            data = json.load(source)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"Unsupported fixture version {data.get('version')} in {path}")
+        return cls(data.get("rpc"), data.get("http"), data.get("accounts"), data.get("pairs"), data.get("meta"))
+
+    def save(self, path: str) -> None:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "wt") as output:
+            json.dump({"version": FIXTURE_VERSION, "meta": self.meta, "rpc": self.rpc, "http": self.http,
+                       "accounts": self.accounts, "pairs": self.pairs}, output, separators=(",", ":"))
+
+
+class ReplayServer:
+    """aiohttp server answering from Fixtures with injected latency, jitter, rate limiting and errors"""
+
+    def __init__(self, fixtures: Fixtures, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 requests_per_second: Optional[float] = None, error_rate: float = 0.0,
+                 retry_after_seconds: float = 1.0, seed: int = 0):
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests_per_second = requests_per_second
+        self.error_rate = error_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.rng = random.Random(seed)
+        self.tokens = requests_per_second or 0.0
+        self.refilled_at = time.monotonic()
+        self.stats: Counter = Counter()
+        self.runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    def application(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 ** 2)
+        app.router.add_post("/", self.handle_rpc)
+        app.router.add_get("/{upstream}/{tail:.*}", self.handle_http)
+        return app
+
+    def take_token(self) -> bool:
+        if not self.requests_per_second:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.requests_per_second,
+                          self.tokens + (now - self.refilled_at) * self.requests_per_second)
+        self.refilled_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def injected_failure(self) -> Optional[web.Response]:
+        """429 when over the rate limit, a 5xx for a random error_rate share of requests, else None"""
+        self.stats["http_requests"] += 1
+        if not self.take_token():
+            self.stats["rate_limited"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after_seconds)})
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            return web.Response(status=503, text="injected failure")
+        return None
+
+    async def delay(self) -> None:
+        delay_ms = self.latency_ms + (self.rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+    def answer(self, call: dict) -> dict:
+        method = call.get("method")
+        self.stats[f"rpc.{method}"] += 1
+        response = self.fixtures.lookup_rpc(method, call.get("params"))
+        if response is None:
+            self.stats["missing"] += 1
+            response = {"error": {"code": MISSING_FIXTURE_CODE, "message": f"No recorded response for {method}"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), **response}
+
+    async def handle_rpc(self, request: web.Request) -> web.Response:
+        failure = self.injected_failure()
+        if failure is not None:
+            return failure
+        body = await request.json()
+        await self.delay()
+        if isinstance(body, list):
+            self.stats["batches"] += 1
+            return web.json_response([self.answer(call) for call in body])
+        return web.json_response(self.answer(body))
+
+    async def handle_http(self, request: web.Request) -> web.Response:
+        failure = self.injected_failure()
+        if failure is not None:
+            return failure
+        await self.delay()
+        self.stats[f"http.{request.match_info['upstream']}"] += 1
+        body = self.fixtures.lookup_http(request.path_qs)
+        if body is None:
+            self.stats["missing"] += 1
+            return web.json_response({"error": f"No recorded response for {request.path_qs}"}, status=404)
+        return web.json_response(body)
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = 0) -> str:
+        """Start listening; port 0 picks a free port. Returns the base URL"""
+        self.runner = web.AppRunner(self.application())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.url = f"http://{host}:{self.runner.addresses[0][1]}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+class Recorder:
+    """Recording proxy: forwards to the real endpoints and captures every successful answer into Fixtures"""
+
+    def __init__(self, rpc_upstream: str, http_upstreams: Optional[Dict[str, str]] = None,
+                 fixtures: Optional[Fixtures] = None):
+        self.rpc_upstream = rpc_upstream
+        self.http_upstreams = dict(HTTP_UPSTREAMS if http_upstreams is None else http_upstreams)
+        self.fixtures = fixtures or Fixtures()
+        self.session: Optional[ClientSession] = None
+
+    def get_session(self) -> ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = ClientSession()
+        return self.session
+
+    def application(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 ** 2)
+        app.router.add_post("/", self.record_rpc)
+        app.router.add_get("/{upstream}/{tail:.*}", self.record_http)
+        return app
+
+    async def record_rpc(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        async with self.get_session().post(self.rpc_upstream, json=body) as upstream:
+            payload = await upstream.json(content_type=None) if upstream.status == 200 else None
+            if payload is None:
+                return web.Response(status=upstream.status, body=await upstream.read(),
+                                    headers={key: value for key, value in upstream.headers.items()
+                                             if key.lower() == "retry-after"})
+
+        calls = body if isinstance(body, list) else [body]
+        responses = payload if isinstance(payload, list) else [payload]
+        by_id = {response.get("id"): response for response in responses}
+        for call in calls:
+            response = by_id.get(call.get("id"))
+            if response is not None:
+                self.fixtures.add_rpc(call.get("method"), call.get("params"), response)
+        return web.json_response(payload)
+
+    async def record_http(self, request: web.Request) -> web.Response:
+        base = self.http_upstreams.get(request.match_info["upstream"])
+        if base is None:
+            return web.Response(status=404)
+        async with self.get_session().get(f"{base}/{request.match_info['tail']}",
+                                          params=request.query) as upstream:
+            if upstream.status != 200:
+                return web.Response(status=upstream.status, body=await upstream.read())
+            payload = await upstream.json(content_type=None)
+        self.fixtures.add_http(request.path_qs, payload)
+        return web.json_response(payload)
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+
+async def serve_forever(app: web.Application, host: str, port: int) -> None:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Listening on http://{host}:{port}/")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Replay or record Solana RPC and price API sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="replay a fixture file")
+    serve.add_argument("fixtures")
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+    serve.add_argument("--rps", type=float, default=None, help="requests per second before answering 429")
+    serve.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    serve.add_argument("--seed", type=int, default=0)
+
+    record = commands.add_parser("record", help="proxy to real endpoints and save what was seen")
+    record.add_argument("fixtures")
+    record.add_argument("--rpc-upstream", required=True)
+
+    for command in (serve, record):
+        command.add_argument("--host", default=DEFAULT_HOST)
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "serve":
+        fixtures = Fixtures.load(args.fixtures)
+        logger.info(f"Loaded {fixtures.count()} recorded responses from {args.fixtures}")
+        server = ReplayServer(fixtures, args.latency_ms, args.jitter_ms, args.rps, args.error_rate, seed=args.seed)
+        try:
+            asyncio.run(serve_forever(server.application(), args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        logger.info(f"Served: {dict(server.stats)}")
+        return
+
+    recorder = Recorder(args.rpc_upstream)
+    try:
+        asyncio.run(serve_forever(recorder.application(), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.fixtures.save(args.fixtures)
+        logger.info(f"Saved {recorder.fixtures.count()} responses to {args.fixtures}")
+
+
+if __name__ == "__main__":
+    main()
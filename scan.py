@@ -0,0 +1,117 @@
+"""Command-line entry point for the wallet scanner: python scan.py WALLET [WALLET ...] --periods 30 7"""
+import time
+
+STARTED_AT = time.perf_counter()
+
+import argparse
+import asyncio
+import logging
+import sys
+from typing import List, Optional
+
+from scan_metrics import METRICS_FORMATS, ScanMetrics
+
+logger = logging.getLogger(__name__)
+
+# Time from process start until the scanner is imported and arguments are parsed. Report-only
+# dependencies (pandas, openpyxl, pyarrow) are loaded on first use and are not part of it.
+STARTUP_BUDGET_SECONDS = 0.4
+EXPORT_CHOICES = ("xlsx", "csv", "parquet", "arrow")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scan Solana wallets for token PnL and export reports")
+    parser.add_argument("wallets", nargs="*", help="wallet addresses to scan (default: the configured demo wallet)")
+    parser.add_argument("--wallet-file", help="also scan the wallets in this file, one address per line")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="scan wallets in this many worker processes sharing one database writer "
+                             "(0: one per core)")
+    parser.add_argument("--log-dir", help="with --processes, write each worker's output to LOG_DIR/worker-N.log")
+    parser.add_argument("--periods", nargs="+", type=int, default=None,
+                        help="report windows in days (default: 90 60 30 14 7 1)")
+    parser.add_argument("--workers", type=int, default=None, help="token accounts processed concurrently")
+    parser.add_argument("--format", dest="export_format", choices=EXPORT_CHOICES, default="xlsx",
+                        help="report file format")
+    parser.add_argument("--no-reports", action="store_true", help="scan and store PnL without writing reports")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="skip stage timing and the profile summary printed at the end")
+    parser.add_argument("--metrics-file", help="also write the metrics to this file (.json for a JSON snapshot)")
+    parser.add_argument("--metrics-format", choices=METRICS_FORMATS, default=None,
+                        help="metrics file format (default: from the file extension, else prometheus)")
+    parser.add_argument("--retry-quarantined", action="store_true",
+                        help="retry token accounts quarantined after repeated failures in earlier scans")
+    parser.add_argument("--stream", action="store_true",
+                        help="after catching up, follow the wallets over websockets and update PnL as trades land")
+    parser.add_argument("--ws-url", help="websocket endpoint for --stream (default: derived from the RPC URL)")
+    parser.add_argument("--startup-check", action="store_true",
+                        help="only measure startup time; exit 1 if it is over budget")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    import functions
+
+    startup_seconds = time.perf_counter() - STARTED_AT
+    over_budget = startup_seconds > STARTUP_BUDGET_SECONDS
+    if over_budget:
+        logger.warning(f"Startup took {startup_seconds:.3f}s, over the {STARTUP_BUDGET_SECONDS}s budget")
+    if args.startup_check:
+        print(f"Startup: {startup_seconds:.3f}s (budget {STARTUP_BUDGET_SECONDS}s)")
+        return 1 if over_budget else 0
+
+    wallet_addresses = args.wallets
+    if args.wallet_file:
+        from batch_scan import read_wallets
+        wallet_addresses = read_wallets(args.wallets, args.wallet_file)
+    wallet_addresses = wallet_addresses or [functions.DEFAULT_WALLET_ADDRESS]
+
+    if args.stream:
+        try:
+            asyncio.run(functions.stream(
+                wallet_addresses=wallet_addresses,
+                max_workers=args.workers or functions.TOKEN_ACCOUNT_WORKERS,
+                metrics=ScanMetrics(enabled=not args.no_metrics),
+                ws_url=args.ws_url,
+            ))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.processes != 1:
+        from batch_scan import scan_wallets
+        results = scan_wallets(
+            wallet_addresses,
+            processes=args.processes,
+            time_periods=args.periods or functions.DEFAULT_REPORT_PERIODS,
+            max_workers=args.workers,
+            export_format=args.export_format,
+            reports=not args.no_reports,
+            metrics=not args.no_metrics,
+            log_dir=args.log_dir,
+            retry_quarantined=args.retry_quarantined,
+        )
+        failed = [result for result in results if result.error]
+        for result in failed:
+            print(f"{result.wallet_address}: {result.error}")
+        print(f"Scanned {len(results) - len(failed)} of {len(results)} wallets.")
+        return 1 if failed else 0
+
+    asyncio.run(functions.run(
+        wallet_addresses=wallet_addresses,
+        time_periods=args.periods or functions.DEFAULT_REPORT_PERIODS,
+        max_workers=args.workers or functions.TOKEN_ACCOUNT_WORKERS,
+        export_format=args.export_format,
+        reports=not args.no_reports,
+        metrics=ScanMetrics(enabled=not args.no_metrics),
+        metrics_file=args.metrics_file,
+        metrics_format=args.metrics_format,
+        retry_quarantined=args.retry_quarantined,
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import logging
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_PENDING = "pending"
+ACCOUNT_DONE = "done"
+ACCOUNT_QUARANTINED = "quarantined"
+# Failed attempts, summed over restarts, after which a token account is parked instead of retried.
+MAX_ACCOUNT_ATTEMPTS = 3
+LAST_ERROR_LENGTH = 500
+
+JOURNAL_COLUMNS = ('wallet_address_id', 'token_account', 'status', 'last_signature', 'attempts', 'last_error',
+                   'updated_at')
+
+JOURNAL_UPSERT_SQL = f'''
+    INSERT INTO scan_journal ({', '.join(JOURNAL_COLUMNS)})
+    VALUES ({', '.join('?' * len(JOURNAL_COLUMNS))})
+    ON CONFLICT(wallet_address_id, token_account) DO UPDATE SET
+        status = excluded.status,
+        last_signature = COALESCE(excluded.last_signature, scan_journal.last_signature),
+        attempts = excluded.attempts,
+        last_error = excluded.last_error,
+        updated_at = excluded.updated_at
+'''
+
+
+class ScanJournal:
+    """Durable per-token-account progress of one wallet's scan: status, last signature and failed attempts
+
+    A scan marks its accounts pending up front and each one done as it completes. A scan that finds pending
+    accounts left behind resumes: only those (and accounts new since) are processed. Accounts failing
+    max_attempts times are quarantined and skipped until released. Row updates go through the scanner's writer;
+    an account's done row is added in one unit with its pnl_info row and cursor, so they commit together.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, writer, wallet_address_id: int,
+                 max_attempts: int = MAX_ACCOUNT_ATTEMPTS):
+        self.connection = connection
+        self.writer = writer
+        self.wallet_address_id = wallet_address_id
+        self.max_attempts = max_attempts
+        self.attempts: Dict[str, int] = {}
+        self.resumed = False
+
+    def load(self) -> Dict[str, Tuple[str, int]]:
+        """token account -> (status, attempts) as last committed"""
+        rows = self.connection.execute('SELECT token_account, status, attempts FROM scan_journal '
+                                       'WHERE wallet_address_id = ?', (self.wallet_address_id,))
+        return {token_account: (status, attempts) for token_account, status, attempts in rows}
+
+    def row(self, token_account: str, status: str, last_signature=None, attempts: int = 0,
+            error: Optional[str] = None) -> tuple:
+        return (self.wallet_address_id, token_account, status, last_signature, attempts,
+                error[:LAST_ERROR_LENGTH] if error else None, int(time.time()))
+
+    async def plan(self, token_accounts: Iterable[str]) -> List[str]:
+        """The accounts this scan has to process, recording them as pending before any work starts"""
+        token_accounts = [str(token_account) for token_account in token_accounts]
+        entries = self.load()
+        self.resumed = any(entries.get(token_account, (None,))[0] == ACCOUNT_PENDING
+                           for token_account in token_accounts)
+
+        planned = []
+        for token_account in token_accounts:
+            status, attempts = entries.get(token_account, (None, 0))
+            if status == ACCOUNT_QUARANTINED or (self.resumed and status == ACCOUNT_DONE):
+                continue
+            # Attempts carry over only into the run that resumes them; a fresh scan gives every account a clean slate.
+            self.attempts[token_account] = attempts if self.resumed and status == ACCOUNT_PENDING else 0
+            planned.append(token_account)
+
+        quarantined = sum(1 for status, _ in entries.values() if status == ACCOUNT_QUARANTINED)
+        if self.resumed:
+            logger.info(f"Resuming scan of wallet {self.wallet_address_id}: {len(planned)} token accounts left")
+        if quarantined:
+            logger.warning(f"Skipping {quarantined} quarantined token accounts of wallet {self.wallet_address_id}")
+
+        # Committed before any work starts: a crash from here on leaves these rows pending, which resumes the scan.
+        self.writer.executemany(JOURNAL_UPSERT_SQL, [self.row(token_account, ACCOUNT_PENDING,
+                                                              attempts=self.attempts[token_account])
+                                                     for token_account in planned])
+        await self.writer.drain()
+        return planned
+
+    def done_row(self, token_account: str, last_signature) -> tuple:
+        """The row marking token_account done, for the writer to add with the account's pnl_info row and cursor"""
+        return self.row(token_account, ACCOUNT_DONE, last_signature)
+
+    def failed(self, token_account: str, error, permanent: bool = False) -> bool:
+        """Record a failed attempt; returns whether the account should be retried"""
+        attempts = self.attempts.get(token_account, 0) + 1
+        if permanent:
+            attempts = max(attempts, self.max_attempts)
+        self.attempts[token_account] = attempts
+        if attempts < self.max_attempts:
+            self.writer.add_journal(self.row(token_account, ACCOUNT_PENDING, attempts=attempts, error=str(error)))
+            return True
+
+        logger.warning(f"Quarantined token account {token_account} after {attempts} failed attempts: {error}")
+        self.writer.add_journal(self.row(token_account, ACCOUNT_QUARANTINED, attempts=attempts, error=str(error)))
+        return False
+
+    def quarantined(self) -> List[Tuple[str, int, Optional[str]]]:
+        """(token account, attempts, last error) of every quarantined account of the wallet"""
+        return self.connection.execute('SELECT token_account, attempts, last_error FROM scan_journal '
+                                       'WHERE wallet_address_id = ? AND status = ?',
+                                       (self.wallet_address_id, ACCOUNT_QUARANTINED)).fetchall()
+
+    async def release_quarantined(self) -> int:
+        """Forget quarantined accounts, so the next scan treats them as new, e.g. after fixing what made them fail"""
+        released = [(self.wallet_address_id, token_account) for token_account, _, _ in self.quarantined()]
+        self.writer.executemany('DELETE FROM scan_journal WHERE wallet_address_id = ? AND token_account = ?', released)
+        await self.writer.drain()
+        return len(released)
@@ -0,0 +1,226 @@
+import bisect
+import json
+import logging
+import math
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = "solana_scanner"
+# Upper bounds in seconds; one fast local SQLite flush up to a slow public-RPC page.
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_FORMATS = ("prometheus", "json")
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum and max"""
+    __slots__ = ('bounds', 'buckets', 'count', 'total', 'peak')
+
+    def __init__(self, bounds: Tuple[float, ...] = STAGE_BUCKETS):
+        self.bounds = bounds
+        # One slot per bound plus the +Inf overflow.
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.peak = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.peak:
+            self.peak = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation, capped at the largest value seen"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for bound, bucket in zip(self.bounds + (self.peak,), self.buckets):
+            seen += bucket
+            if seen >= rank:
+                return min(bound, self.peak)
+        return self.peak
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(le, count) pairs in Prometheus order, ending with +Inf"""
+        pairs = []
+        running = 0
+        for bound, bucket in zip(self.bounds, self.buckets):
+            running += bucket
+            pairs.append((repr(bound), running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+
+class StageTimer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class NullTimer:
+    """Shared do-nothing context manager handed out while metrics are disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class ScanMetrics:
+    """Per-stage latency histograms, event counters, queue-depth gauges and cache hit rates for one scan
+
+    Disabled instances return NULL_TIMER and skip every update, so instrumented call sites cost one attribute
+    check. Export with prometheus_text() or snapshot(), or print summary() at the end of a run.
+    """
+
+    def __init__(self, enabled: bool = True, bounds: Tuple[float, ...] = STAGE_BUCKETS):
+        self.enabled = enabled
+        self.bounds = bounds
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.peaks: Dict[str, float] = {}
+        self.caches: Dict[str, Tuple[int, int]] = {}
+        self.started = time.perf_counter()
+
+    def histogram(self, stage: str) -> Histogram:
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = Histogram(self.bounds)
+        return histogram
+
+    def time(self, stage: str):
+        """Context manager recording the wall time of its block under stage"""
+        if not self.enabled:
+            return NULL_TIMER
+        return StageTimer(self.histogram(stage))
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if self.enabled:
+            self.histogram(stage).observe(seconds)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: float) -> None:
+        """Current value of e.g. a queue depth; the peak is kept alongside"""
+        if self.enabled:
+            self.gauges[name] = value
+            if value > self.peaks.get(name, value - 1):
+                self.peaks[name] = value
+
+    def add_cache(self, name: str, hits: int, misses: int) -> None:
+        """Add the hit and miss totals of a cache that keeps its own counters, e.g. once per scanned wallet"""
+        if self.enabled:
+            total_hits, total_misses = self.caches.get(name, (0, 0))
+            self.caches[name] = (total_hits + hits, total_misses + misses)
+
+    def snapshot(self) -> dict:
+        return {
+            "elapsed_seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {stage: {"count": histogram.count, "sum": round(histogram.total, 6),
+                               "max": round(histogram.peak, 6), "p50": histogram.quantile(0.5),
+                               "p95": histogram.quantile(0.95), "p99": histogram.quantile(0.99),
+                               "buckets": dict(histogram.cumulative())}
+                       for stage, histogram in sorted(self.stages.items())},
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": {name: {"value": value, "peak": self.peaks.get(name, value)}
+                       for name, value in sorted(self.gauges.items())},
+            "caches": {name: {"hits": hits, "misses": misses, "hit_rate": hit_rate(hits, misses)}
+                       for name, (hits, misses) in sorted(self.caches.items())},
+        }
+
+    def prometheus_text(self, prefix: str = METRICS_PREFIX) -> str:
+        """Prometheus text exposition format, version 0.0.4"""
+        lines = [f"# HELP {prefix}_stage_seconds Wall time per scanner stage",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in sorted(self.stages.items()):
+            for le, count in histogram.cumulative():
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += [f"# HELP {prefix}_events_total Scanner events", f"# TYPE {prefix}_events_total counter"]
+        lines += [f'{prefix}_events_total{{event="{name}"}} {value}' for name, value in sorted(self.counters.items())]
+
+        lines += [f"# HELP {prefix}_gauge Current scanner gauges such as queue depth", f"# TYPE {prefix}_gauge gauge"]
+        lines += [f'{prefix}_gauge{{name="{name}"}} {value}' for name, value in sorted(self.gauges.items())]
+        lines += [f"# HELP {prefix}_gauge_peak Highest value each gauge reached", f"# TYPE {prefix}_gauge_peak gauge"]
+        lines += [f'{prefix}_gauge_peak{{name="{name}"}} {self.peaks.get(name, value)}'
+                  for name, value in sorted(self.gauges.items())]
+
+        for kind, index in (("hits", 0), ("misses", 1)):
+            lines += [f"# HELP {prefix}_cache_{kind}_total Cache {kind}", f"# TYPE {prefix}_cache_{kind}_total counter"]
+            lines += [f'{prefix}_cache_{kind}_total{{cache="{name}"}} {counts[index]}'
+                      for name, counts in sorted(self.caches.items())]
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str, metrics_format: Optional[str] = None) -> None:
+        """Write prometheus text or a JSON snapshot; the format defaults from the file extension"""
+        metrics_format = metrics_format or ("json" if path.endswith(".json") else "prometheus")
+        if metrics_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format {metrics_format!r}; expected one of {METRICS_FORMATS}")
+        with open(path, "w") as output:
+            if metrics_format == "json":
+                json.dump(self.snapshot(), output, indent=2)
+                output.write("\n")
+            else:
+                output.write(self.prometheus_text())
+
+    def summary(self) -> str:
+        """Profile table: stages by total time, then counters, gauges and cache hit rates
+
+        Stages nest and overlap across concurrent workers, so their shares of wall time can add up past 100%.
+        """
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Scan profile ({elapsed:.2f}s)",
+                 f"{'stage':<24}{'calls':>9}{'total s':>10}{'of wall':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for stage, histogram in sorted(self.stages.items(), key=lambda item: -item[1].total):
+            share = histogram.total / elapsed if elapsed else 0.0
+            lines.append(f"{stage:<24}{histogram.count:>9}{histogram.total:>10.3f}{share:>9.1%}"
+                         f"{histogram.quantile(0.5) * 1000:>10.1f}{histogram.quantile(0.95) * 1000:>10.1f}"
+                         f"{histogram.peak * 1000:>10.1f}")
+        lines += format_pairs("counters", self.counters.items())
+        lines += format_pairs("gauges (value / peak)",
+                              ((name, f"{value} / {self.peaks.get(name, value)}") for name, value in
+                               self.gauges.items()))
+        lines += format_pairs("cache hit rates",
+                              ((name, f"{hit_rate(hits, misses):.1%} of {hits + misses}")
+                               for name, (hits, misses) in self.caches.items()))
+        return "\n".join(lines)
+
+
+def hit_rate(hits: int, misses: int) -> float:
+    total = hits + misses
+    return hits / total if total else 0.0
+
+
+def format_pairs(title: str, pairs: Iterable[Tuple[str, object]]) -> List[str]:
+    pairs = sorted(pairs)
+    if not pairs:
+        return []
+    return [f"{title}:"] + [f"  {name:<30}{value}" for name, value in pairs]
+
+
+# Stand-in for components created without a metrics sink; being disabled, it is never written to.
+DISABLED_METRICS = ScanMetrics(enabled=False)
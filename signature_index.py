@@ -0,0 +1,277 @@
+import atexit
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from transaction_cache import SQL_PARAMETER_CHUNK, TRANSACTION_CACHE_BUSY_SECONDS, TRANSACTION_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Signatures per filter generation; memory stays at SIGNATURE_FILTER_GENERATIONS filters of this size.
+SIGNATURE_FILTER_CAPACITY = 1_000_000
+# Target false-positive rate of the whole filter, split evenly over the generations.
+SIGNATURE_FILTER_ERROR_RATE = 0.01
+SIGNATURE_FILTER_GENERATIONS = 2
+# Signers buffered before they are written, so concurrent scans contend for the cache's write lock rarely.
+SIGNER_WRITE_BATCH = 2000
+RECENT_SIGNATURES_CAPACITY = 100_000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, sized for capacity items at error_rate"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, item: str) -> List[int]:
+        # Double hashing: two 64-bit halves of one digest stand in for k independent hashes.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def false_positive_rate(self) -> float:
+        """Expected false-positive rate at the current fill"""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class RotatingBloomFilter:
+    """Bloom filters in generations: when the newest fills up the oldest is dropped, so memory never grows
+
+    A dropped signature just reads as unseen again; the false-positive rate stays below error_rate.
+    """
+
+    def __init__(self, capacity: int = SIGNATURE_FILTER_CAPACITY, error_rate: float = SIGNATURE_FILTER_ERROR_RATE,
+                 generations: int = SIGNATURE_FILTER_GENERATIONS):
+        self.capacity = capacity
+        self.generation_error_rate = error_rate / generations
+        self.generations = [BloomFilter(capacity, self.generation_error_rate) for _ in range(generations)]
+        self.rotations = 0
+
+    def add(self, item: str) -> None:
+        if self.generations[0].full():
+            self.generations.pop()
+            self.generations.insert(0, BloomFilter(self.capacity, self.generation_error_rate))
+            self.rotations += 1
+        self.generations[0].add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return any(item in generation for generation in self.generations)
+
+    def false_positive_rate(self) -> float:
+        return 1 - math.prod(1 - generation.false_positive_rate() for generation in self.generations)
+
+    def memory_bytes(self) -> int:
+        return sum(len(generation.bits) for generation in self.generations)
+
+
+class SignatureIndex:
+    """Signer of every transaction any scan has parsed, shared across wallets and runs
+
+    Related wallets (copy-traders, bundlers) see the same transactions under many token accounts, yet only the
+    ones a wallet signed count towards its PnL. The exact signature -> signer table lives next to the transaction
+    cache; a rotating Bloom filter in front of it answers "never seen" from memory, so only likely hits reach disk.
+    save() stores the filter's bits with the last table row they cover, so the next process loads them and only
+    adds the rows indexed since, instead of hashing the whole table again.
+    """
+
+    def __init__(self, path: str = TRANSACTION_CACHE_PATH, capacity: int = SIGNATURE_FILTER_CAPACITY,
+                 error_rate: float = SIGNATURE_FILTER_ERROR_RATE, generations: int = SIGNATURE_FILTER_GENERATIONS):
+        self.path = path
+        self.filter = RotatingBloomFilter(capacity, error_rate, generations)
+        self.hits = 0
+        self.misses = 0
+        self.false_positives = 0
+        # Signers not written to the table yet; looked up before the table.
+        self.pending: Dict[str, str] = {}
+        self.connection = sqlite3.connect(path, timeout=TRANSACTION_CACHE_BUSY_SECONDS)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS transaction_signers (
+                signature TEXT PRIMARY KEY,
+                signer TEXT NOT NULL
+            )
+        ''')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS signature_filters (
+                generation INTEGER PRIMARY KEY,
+                capacity INTEGER NOT NULL,
+                error_rate REAL NOT NULL,
+                item_count INTEGER NOT NULL,
+                last_rowid INTEGER NOT NULL,
+                bits BLOB NOT NULL
+            )
+        ''')
+        self.connection.commit()
+
+        self.last_rowid = self.load_filter()
+        if self.last_rowid is None:
+            # No usable snapshot: the most recently indexed signatures, up to one generation, are what later scans
+            # are likely to meet.
+            self.last_rowid = self.connection.execute('SELECT COALESCE(MAX(rowid), 0) '
+                                                      'FROM transaction_signers').fetchone()[0]
+            for (signature,) in self.connection.execute('SELECT signature FROM transaction_signers '
+                                                         'ORDER BY rowid DESC LIMIT ?', (capacity,)):
+                self.filter.add(signature)
+        self.catch_up()
+
+    def load_filter(self) -> Optional[int]:
+        """Restore the saved filter generations; returns the last table rowid they cover, None without a snapshot"""
+        rows = self.connection.execute('SELECT capacity, error_rate, item_count, last_rowid, bits '
+                                       'FROM signature_filters ORDER BY generation').fetchall()
+        generations = self.filter.generations
+        if len(rows) != len(generations) or any(
+                capacity != generation.capacity or error_rate != generation.error_rate
+                or len(bits) != len(generation.bits)
+                for (capacity, error_rate, _, _, bits), generation in zip(rows, generations)):
+            return None
+        for (_, _, item_count, _, bits), generation in zip(rows, generations):
+            generation.bits = bytearray(bits)
+            generation.count = item_count
+        return rows[0][3]
+
+    def catch_up(self) -> None:
+        """Add the signatures indexed since last_rowid, e.g. by scans in other processes"""
+        for rowid, signature in self.connection.execute('SELECT rowid, signature FROM transaction_signers '
+                                                        'WHERE rowid > ? ORDER BY rowid', (self.last_rowid,)):
+            if signature not in self.filter:
+                self.filter.add(signature)
+            self.last_rowid = rowid
+
+    def signers(self, signatures: Iterable) -> Dict[str, str]:
+        """Known signers of the given signatures, keyed by signature string"""
+        candidates = []
+        found: Dict[str, str] = {}
+        for signature in signatures:
+            key = str(signature)
+            if key in self.pending:
+                found[key] = self.pending[key]
+                self.hits += 1
+            elif key in self.filter:
+                candidates.append(key)
+            else:
+                self.misses += 1
+
+        indexed: Dict[str, str] = {}
+        for start in range(0, len(candidates), SQL_PARAMETER_CHUNK):
+            chunk = candidates[start:start + SQL_PARAMETER_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            indexed.update(self.connection.execute(
+                f'SELECT signature, signer FROM transaction_signers WHERE signature IN ({placeholders})', chunk))
+
+        self.hits += len(indexed)
+        self.misses += len(candidates) - len(indexed)
+        self.false_positives += len(candidates) - len(indexed)
+        found.update(indexed)
+        return found
+
+    def foreign(self, signatures: Iterable, signer) -> set:
+        """Signatures already known to be signed by someone other than signer"""
+        signer = str(signer)
+        return {signature for signature, known in self.signers(signatures).items() if known != signer}
+
+    def add_many(self, items: Iterable[Tuple[object, object]]) -> None:
+        """Record (signature, signer) pairs; they reach the table in batches of SIGNER_WRITE_BATCH"""
+        for signature, signer in items:
+            key = str(signature)
+            self.pending.setdefault(key, str(signer))
+            if key not in self.filter:
+                self.filter.add(key)
+        if len(self.pending) >= SIGNER_WRITE_BATCH:
+            self.write_pending()
+
+    def write_pending(self) -> None:
+        if not self.pending:
+            return
+        try:
+            with self.connection:
+                self.connection.executemany('INSERT OR IGNORE INTO transaction_signers (signature, signer) '
+                                            'VALUES (?, ?)', self.pending.items())
+        except sqlite3.OperationalError as e:
+            # Another scan held the write lock past the busy timeout; the rows stay pending for the next batch.
+            logger.warning(f"Could not write {len(self.pending)} signers to {self.path}: {e}")
+            return
+        self.pending.clear()
+
+    def save(self) -> None:
+        """Write pending signers and a snapshot of the filter covering every row up to the table's last"""
+        self.write_pending()
+        self.catch_up()
+        rows = [(index, generation.capacity, generation.error_rate, generation.count, self.last_rowid,
+                 bytes(generation.bits))
+                for index, generation in enumerate(self.filter.generations)]
+        try:
+            with self.connection:
+                self.connection.execute('DELETE FROM signature_filters')
+                self.connection.executemany('INSERT INTO signature_filters (generation, capacity, error_rate, '
+                                            'item_count, last_rowid, bits) VALUES (?, ?, ?, ?, ?, ?)', rows)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not save the signature filter to {self.path}: {e}")
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        self.save()
+        self.connection.close()
+
+
+_shared_indexes: Dict[str, SignatureIndex] = {}
+
+
+def shared_signature_index(path: str = TRANSACTION_CACHE_PATH) -> SignatureIndex:
+    """One index per database file and process, so the filter is loaded once however many wallets are scanned"""
+    key = os.path.abspath(path)
+    index = _shared_indexes.get(key)
+    if index is None:
+        index = _shared_indexes[key] = SignatureIndex(path)
+        # Scans call save() as each wallet finishes; this covers whatever was added after the last one.
+        atexit.register(index.close)
+    return index
+
+
+class RecentSignatures:
+    """Exact set of the most recently added keys, forgetting the oldest beyond capacity"""
+
+    def __init__(self, capacity: int = RECENT_SIGNATURES_CAPACITY):
+        self.capacity = capacity
+        self.entries: "OrderedDict[object, None]" = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, key) -> None:
+        self.entries[key] = None
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def discard(self, key) -> None:
+        self.entries.pop(key, None)
+
+    def difference_update(self, keys: Iterable) -> None:
+        for key in keys:
+            self.discard(key)
@@ -0,0 +1,408 @@
+"""End-to-end ingestion benchmark: process_transactions -> pnl_info -> reports against replayed fixtures
+
+    python -m tests.benchmark_scanner                       # all tiers, compared with tests/benchmark_baselines.json
+    python -m tests.benchmark_scanner --tiers 10 1000 --latency-ms 20
+    python -m tests.benchmark_scanner --update-baselines    # record new baselines on this machine
+    python -m tests.benchmark_scanner --fixtures wallet.json.gz   # a wallet recorded with rpc_replay.py record
+
+Each tier synthesizes a wallet with that many token accounts, serves it from rpc_replay.ReplayServer and runs the
+scanner in a fresh subprocess, so peak RSS is the scanner's own. Exits 1 when a metric regresses past its tolerance.
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+from rpc_replay import Fixtures, ReplayServer, account_key
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES_PATH = Path(__file__).resolve().parent / "benchmark_baselines.json"
+
+# process_transactions skips wallets with MAX_TOKEN_ACCOUNTS or more, so the large tier sits just under it.
+BENCHMARK_TIERS = (10, 1000, 14999)
+DEFAULT_SEED = 7
+TOKEN_PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+WRAPPED_SOL_MINT = "So11111111111111111111111111111111111111112"
+TOKEN_DECIMALS = 6
+SOL_PRICE_USD = 150.0
+SECONDS_PER_DAY = 86400
+# Trades land inside the longest report window so every period has rows to export.
+HISTORY_DAYS = 80
+# Share of mints without a Dexscreener pair, i.e. counted as scam tokens.
+UNLISTED_MINT_SHARE = 0.1
+MINT_SLICE_OPTIONS = {"encoding": "base64", "dataSlice": {"offset": 0, "length": 32}}
+FULL_ACCOUNT_OPTIONS = {"encoding": "base64"}
+DEXSCREENER_PATH = "/dexscreener/latest/dex/tokens"
+COINGECKO_PATH = "/coingecko/api/v3/simple/price?ids=solana&vs_currencies=usd"
+
+# metric -> (direction, relative tolerance, absolute slack). "higher" metrics fail when they drop below the
+# baseline, "lower" ones when they rise above it; the slack keeps millisecond-scale timings from flapping.
+TOLERANCES = {
+    "transactions_per_second": ("higher", 0.25, 0.0),
+    "peak_rss_mb": ("lower", 0.25, 16.0),
+    "rpc_calls_per_account": ("lower", 0.05, 0.05),
+    "rpc_requests_per_account": ("lower", 0.10, 0.05),
+    "db_seconds": ("lower", 0.25, 0.05),
+}
+
+
+def random_pubkey(rng: random.Random) -> str:
+    return str(Pubkey.from_bytes(rng.randbytes(32)))
+
+
+def random_signature(rng: random.Random) -> str:
+    return str(Signature.from_bytes(rng.randbytes(64)))
+
+
+def token_account_data(mint: str, owner: str, amount: int) -> str:
+    """Base64 of a 165-byte SPL token account: mint, owner, amount, then zeroed fields"""
+    data = bytes(Pubkey.from_string(mint)) + bytes(Pubkey.from_string(owner)) + amount.to_bytes(8, "little")
+    return base64.b64encode(data + bytes(165 - len(data))).decode()
+
+
+def account_value(data: str) -> dict:
+    return {"data": [data, "base64"], "executable": False, "lamports": 2039280, "owner": TOKEN_PROGRAM,
+            "rentEpoch": 0, "space": len(base64.b64decode(data))}
+
+
+def transfer(source: str, destination: str, authority: str, amount: int) -> dict:
+    return {"program": "spl-token", "programId": TOKEN_PROGRAM, "stackHeight": 2,
+            "parsed": {"type": "transfer",
+                       "info": {"source": source, "destination": destination, "authority": authority,
+                                "amount": str(amount)}}}
+
+
+def parsed_transaction(signature: str, wallet: str, block_time: int, mint: str, transfers: List[dict],
+                       accounts: List[str]) -> dict:
+    """jsonParsed getTransaction result shaped like a Raydium swap signed by the wallet"""
+    keys = [wallet] + accounts + [TOKEN_PROGRAM]
+    return {
+        "slot": block_time, "blockTime": block_time, "version": 0,
+        "meta": {
+            "err": None, "status": {"Ok": None}, "fee": 5000, "preBalances": [0] * len(keys),
+            "postBalances": [0] * len(keys), "logMessages": [], "preTokenBalances": [],
+            "postTokenBalances": [{"accountIndex": 1, "mint": mint, "owner": wallet, "programId": TOKEN_PROGRAM,
+                                   "uiTokenAmount": {"uiAmount": 1.0, "decimals": TOKEN_DECIMALS, "amount": "1",
+                                                     "uiAmountString": "1"}}],
+            "innerInstructions": [{"index": 0, "instructions": transfers}],
+            "rewards": [], "loadedAddresses": {"writable": [], "readonly": []}, "computeUnitsConsumed": 1000,
+        },
+        "transaction": {
+            "signatures": [signature],
+            "message": {
+                "accountKeys": [{"pubkey": key, "writable": index < len(keys) - 1, "signer": index == 0,
+                                 "source": "transaction"} for index, key in enumerate(keys)],
+                "recentBlockhash": "11111111111111111111111111111111",
+                "instructions": [{"programId": keys[-2], "accounts": accounts, "data": "A",
+                                  "stackHeight": None}],
+                "addressTableLookups": [],
+            },
+        },
+    }
+
+
+def synthesize_wallet(token_accounts: int, seed: int = DEFAULT_SEED, now: Optional[int] = None) -> Fixtures:
+    """Deterministic fixtures for a wallet with the given number of token accounts, each a buy and one or two sells"""
+    rng = random.Random(seed * 1_000_003 + token_accounts)
+    now = int(time.time()) if now is None else now
+    wallet = random_pubkey(rng)
+    wrapped_sol_account = random_pubkey(rng)
+    fixtures = Fixtures(meta={"wallet": wallet, "token_accounts": token_accounts, "seed": seed, "synthesized": True})
+
+    owned = []
+    transactions = 0
+    for _ in range(token_accounts):
+        token_account, mint, pool_authority, token_vault, sol_vault, pool = (random_pubkey(rng) for _ in range(6))
+        owned.append({"pubkey": token_account, "account": account_value(token_account_data(mint, wallet, 0))})
+        for vault, vault_mint in ((token_vault, mint), (sol_vault, WRAPPED_SOL_MINT)):
+            fixtures.accounts[account_key(vault, [vault, MINT_SLICE_OPTIONS])] = account_value(
+                base64.b64encode(bytes(Pubkey.from_string(vault_mint))).decode())
+            fixtures.accounts[account_key(vault, [vault, FULL_ACCOUNT_OPTIONS])] = account_value(
+                token_account_data(vault_mint, pool_authority, 10 ** 12))
+
+        bought_at = now - rng.randint(SECONDS_PER_DAY, HISTORY_DAYS * SECONDS_PER_DAY)
+        spent = rng.randint(10 ** 7, 5 * 10 ** 9)
+        tokens = rng.randint(10 ** 6, 10 ** 12)
+        swap_accounts = [token_account, wrapped_sol_account, token_vault, sol_vault, pool_authority, pool]
+        trades = [(bought_at, [transfer(wrapped_sol_account, sol_vault, wallet, spent),
+                               transfer(token_vault, token_account, pool_authority, tokens)])]
+        sold_at = bought_at
+        sells = rng.choice((1, 1, 2))
+        for sell in range(sells):
+            sold_at += rng.randint(30, SECONDS_PER_DAY // 2)
+            share = tokens // sells if sell < sells - 1 else tokens - (tokens // sells) * (sells - 1)
+            earned = int(spent * rng.uniform(0.2, 3.0) / sells)
+            trades.append((min(sold_at, now - 60), [transfer(token_account, token_vault, wallet, share),
+                                                   transfer(sol_vault, wrapped_sol_account, pool_authority, earned)]))
+
+        signatures = []
+        for block_time, transfers in trades:
+            signature = random_signature(rng)
+            signatures.append({"signature": signature, "slot": block_time, "err": None, "memo": None,
+                               "blockTime": block_time, "confirmationStatus": "finalized"})
+            fixtures.add_rpc("getTransaction", [signature, {"encoding": "jsonParsed", "commitment": "finalized",
+                                                            "maxSupportedTransactionVersion": 0}],
+                             {"result": parsed_transaction(signature, wallet, block_time, mint, transfers,
+                                                           swap_accounts)})
+        transactions += len(signatures)
+        fixtures.add_rpc("getSignaturesForAddress", [token_account, {"limit": 1000}],
+                         {"result": list(reversed(signatures))})
+
+        if rng.random() >= UNLISTED_MINT_SHARE:
+            fixtures.pairs[mint] = [{
+                "chainId": "solana", "dexId": "raydium", "pairAddress": pool,
+                "baseToken": {"address": mint, "name": "Token", "symbol": "TKN"},
+                "quoteToken": {"address": WRAPPED_SOL_MINT, "name": "Wrapped SOL", "symbol": "SOL"},
+                "priceUsd": f"{rng.uniform(1e-6, 0.5):.8f}",
+                "pairCreatedAt": (bought_at - rng.randint(60, 30 * SECONDS_PER_DAY)) * 1000,
+            }]
+        else:
+            fixtures.pairs[mint] = []
+
+    fixtures.add_rpc("getTokenAccountsByOwner", [wallet, {"programId": TOKEN_PROGRAM}, {"encoding": "base64"}],
+                     {"result": {"context": {"slot": now}, "value": owned}})
+    fixtures.add_rpc("getBalance", [wallet], {"result": {"context": {"slot": now}, "value": 12 * 10 ** 9}})
+    fixtures.http[COINGECKO_PATH] = {"solana": {"usd": SOL_PRICE_USD}}
+    fixtures.meta["transactions"] = transactions
+    return fixtures
+
+
+async def scan_wallet(url: str, wallet: str, workers: int, periods: List[int], export_format: str) -> Dict:
+    """Runs inside the tier subprocess: one full scan of the wallet plus its reports"""
+    import config
+    config.SOLANA_RPC_URLS = [url]
+    config.RPC_REQUESTS_PER_SECOND = None
+
+    import functions
+    from price_feed import PriceFeed
+
+    trader = functions.SolanaTrader(Pubkey.from_string(wallet), max_workers=workers)
+    trader.price_feed = PriceFeed(dexscreener_url=url + DEXSCREENER_PATH, coingecko_url=url + COINGECKO_PATH)
+
+    transactions = 0
+    get_transactions_batched = trader.get_transactions_batched
+
+    async def counted_transactions(signatures):
+        nonlocal transactions
+        transactions += len(signatures)
+        return await get_transactions_batched(signatures)
+
+    trader.get_transactions_batched = counted_transactions
+
+    try:
+        await trader.initialize()
+        started = time.perf_counter()
+        await trader.process_transactions()
+        scan_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await trader.generate_reports_for_time_periods(periods, export_format=export_format)
+        report_seconds = time.perf_counter() - started
+    finally:
+        await trader.price_feed.close()
+        await trader.solana_client.close()
+        trader.db_writer.close()
+
+    # Commits run on the writer thread, so flush() itself is only a queue put; time the transactions instead.
+    db_seconds = sum(trader.metrics.histogram(stage).total for stage in ('db.flush', 'db.execute'))
+    pnl_rows = trader.db_connection.execute('SELECT COUNT(*) FROM pnl_info').fetchone()[0]
+    return {
+        "transactions": transactions,
+        "pnl_rows": pnl_rows,
+        "scan_seconds": round(scan_seconds, 3),
+        "report_seconds": round(report_seconds, 3),
+        "db_seconds": round(db_seconds, 3),
+        "transactions_per_second": round(transactions / scan_seconds, 1) if scan_seconds else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process; Linux ru_maxrss survives exec and would include the parent's fixtures"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak_rss / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_tier_subprocess(args: argparse.Namespace) -> int:
+    with tempfile.TemporaryDirectory(prefix="benchmark_scanner_") as workdir:
+        # trading_data.db, transaction_cache.db and the reports are all created in the working directory.
+        os.chdir(workdir)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = asyncio.run(scan_wallet(args.url, args.wallet, args.workers, args.periods, args.export_format))
+        os.chdir(ROOT)
+    metrics["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(metrics))
+    return 0
+
+
+async def run_tier(fixtures: Fixtures, args: argparse.Namespace) -> Dict:
+    server = ReplayServer(fixtures, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    url = await server.start()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "tests.benchmark_scanner", "--run-tier", "--url", url,
+            "--wallet", fixtures.meta["wallet"], "--workers", str(args.workers), "--format", args.export_format,
+            "--periods", *map(str, args.periods), cwd=str(ROOT), stdout=asyncio.subprocess.PIPE)
+        output, _ = await process.communicate()
+    finally:
+        await server.stop()
+    if process.returncode != 0:
+        raise RuntimeError(f"Benchmark scan exited with {process.returncode}")
+
+    metrics = json.loads(output.decode().strip().splitlines()[-1])
+    accounts = fixtures.meta["token_accounts"]
+    rpc_calls = sum(count for name, count in server.stats.items() if name.startswith("rpc."))
+    http_calls = sum(count for name, count in server.stats.items() if name.startswith("http."))
+    metrics.update({
+        "token_accounts": accounts,
+        "rpc_calls": rpc_calls,
+        "rpc_requests": server.stats["http_requests"] - http_calls,
+        "price_requests": http_calls,
+        "missing_fixtures": server.stats["missing"],
+        "rpc_calls_per_account": round(rpc_calls / accounts, 3),
+        "rpc_requests_per_account": round((server.stats["http_requests"] - http_calls) / accounts, 3),
+    })
+    return metrics
+
+
+def regressions(tier: str, metrics: Dict, baseline: Dict) -> List[str]:
+    failures = []
+    if metrics["missing_fixtures"]:
+        failures.append(f"{tier}: {metrics['missing_fixtures']} calls had no fixture")
+    if metrics["pnl_rows"] != metrics["token_accounts"]:
+        failures.append(f"{tier}: {metrics['pnl_rows']} pnl_info rows for {metrics['token_accounts']} token accounts")
+    for metric, (direction, relative, slack) in TOLERANCES.items():
+        if metric not in baseline:
+            continue
+        expected, measured = baseline[metric], metrics[metric]
+        if direction == "higher" and measured < expected * (1 - relative) - slack:
+            failures.append(f"{tier}: {metric} {measured} is below baseline {expected} (-{relative:.0%})")
+        elif direction == "lower" and measured > expected * (1 + relative) + slack:
+            failures.append(f"{tier}: {metric} {measured} is above baseline {expected} (+{relative:.0%})")
+    return failures
+
+
+def load_baselines(path: Path) -> Dict:
+    if not path.exists():
+        return {}
+    with open(path) as source:
+        return json.load(source).get("tiers", {})
+
+
+def save_baselines(path: Path, results: Dict[str, Dict], args: argparse.Namespace) -> None:
+    tiers = load_baselines(path)
+    for tier, metrics in results.items():
+        tiers[tier] = {metric: metrics[metric] for metric in TOLERANCES}
+    with open(path, "w") as output:
+        json.dump({"settings": {"workers": args.workers, "latency_ms": args.latency_ms,
+                                "format": args.export_format, "periods": args.periods},
+                   "tiers": tiers}, output, indent=2, sort_keys=True)
+        output.write("\n")
+
+
+def print_table(results: Dict[str, Dict]) -> None:
+    columns = ("token_accounts", "transactions", "transactions_per_second", "scan_seconds", "report_seconds",
+               "db_seconds", "peak_rss_mb", "rpc_calls_per_account", "rpc_requests_per_account", "price_requests")
+    print("  ".join(f"{column:>24}" for column in ("tier",) + columns[1:]))
+    for tier, metrics in results.items():
+        print("  ".join(f"{value!s:>24}" for value in (tier,) + tuple(metrics[column] for column in columns[1:])))
+
+
+def iter_fixtures(args: argparse.Namespace):
+    """(tier name, Fixtures) one at a time, recorded files or synthesized wallets"""
+    if args.fixtures:
+        for path in args.fixtures:
+            fixtures = Fixtures.load(path)
+            if "wallet" not in fixtures.meta or "token_accounts" not in fixtures.meta:
+                raise ValueError(f"{path} has no wallet/token_accounts meta; add them before benchmarking it")
+            yield Path(path).name, fixtures
+        return
+
+    for tier in args.tiers:
+        started = time.perf_counter()
+        fixtures = synthesize_wallet(tier, seed=args.seed)
+        logger.info(f"Synthesized {tier} token accounts in {time.perf_counter() - started:.1f}s")
+        if args.save_fixtures:
+            fixtures.save(os.path.join(args.save_fixtures, f"wallet_{tier}.json.gz"))
+        yield str(tier), fixtures
+
+
+async def run_benchmarks(args: argparse.Namespace) -> int:
+    results = {}
+    for name, fixtures in iter_fixtures(args):
+        logger.info(f"Running tier {name}")
+        results[name] = await run_tier(fixtures, args)
+    print_table(results)
+
+    if args.update_baselines:
+        save_baselines(args.baselines, results, args)
+        print(f"Baselines written to {args.baselines}")
+        return 0
+
+    baselines = load_baselines(args.baselines)
+    failures = []
+    for name, metrics in results.items():
+        if name not in baselines:
+            logger.warning(f"No baseline for tier {name}; run with --update-baselines to record one")
+        failures.extend(regressions(name, metrics, baselines.get(name, {})))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    from functions import DEFAULT_REPORT_PERIODS, TOKEN_ACCOUNT_WORKERS
+
+    parser = argparse.ArgumentParser(description="End-to-end ingestion benchmark against replayed RPC fixtures")
+    parser.add_argument("--tiers", nargs="+", type=int, default=list(BENCHMARK_TIERS),
+                        help="token accounts per synthesized wallet")
+    parser.add_argument("--fixtures", nargs="+", help="benchmark recorded fixture files instead of synthesized ones")
+    parser.add_argument("--save-fixtures", metavar="DIR", help="also write the synthesized fixtures to DIR")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--workers", type=int, default=TOKEN_ACCOUNT_WORKERS)
+    parser.add_argument("--periods", nargs="+", type=int, default=list(DEFAULT_REPORT_PERIODS))
+    parser.add_argument("--format", dest="export_format", default="xlsx",
+                        choices=("xlsx", "csv", "parquet", "arrow"))
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="replayed per-request latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    parser.add_argument("--update-baselines", action="store_true", help="overwrite the baselines with this run")
+    parser.add_argument("--run-tier", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--wallet", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.run_tier:
+        return run_tier_subprocess(args)
+    return asyncio.run(run_benchmarks(args))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("aiohttp.access").setLevel(logging.WARNING)
+    sys.exit(main())
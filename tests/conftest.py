@@ -0,0 +1,71 @@
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+
+import pytest
+from solders.pubkey import Pubkey
+
+from db_writer import PNL_INFO_COLUMNS
+from rpc_replay import Fixtures, ReplayServer
+from tests.benchmark_scanner import COINGECKO_PATH, DEXSCREENER_PATH, synthesize_wallet
+
+TOKEN_ACCOUNTS = 40
+NOW = 1_790_000_000
+
+
+async def scan(url: str, wallet: str, workdir, max_workers: int = 1, db_writer=None, signature_index=None,
+               report_periods=()):
+    """One scan of the replayed wallet into workdir/trading_data.db, then csv reports for report_periods"""
+    import functions
+    from price_feed import PriceFeed
+
+    os.chdir(workdir)
+    writer = db_writer() if db_writer is not None else None
+    trader = functions.SolanaTrader(Pubkey.from_string(wallet), max_workers=max_workers, db_writer=writer,
+                                    signature_index=signature_index)
+    trader.price_feed = PriceFeed(dexscreener_url=url + DEXSCREENER_PATH, coingecko_url=url + COINGECKO_PATH)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await trader.initialize()
+            await trader.process_transactions()
+            if report_periods:
+                await trader.generate_reports_for_time_periods(list(report_periods), export_format="csv")
+        trader.db_writer.close()
+    finally:
+        await trader.price_feed.close()
+        await trader.solana_client.close()
+    return trader
+
+
+def pnl_info(workdir, database: str = "trading_data.db"):
+    """pnl_info in a comparable form: every column but the row id, ordered by token account"""
+    with contextlib.closing(sqlite3.connect(os.path.join(workdir, database))) as connection:
+        return connection.execute(f"SELECT {', '.join(PNL_INFO_COLUMNS)} FROM pnl_info "
+                                  f"ORDER BY token_account").fetchall()
+
+
+@contextlib.contextmanager
+def replayed(monkeypatch, fixtures: Fixtures):
+    """(event loop, RPC url) of a ReplayServer for fixtures, with config pointed at it"""
+    import config
+    server = ReplayServer(fixtures)
+    loop = asyncio.new_event_loop()
+    url = loop.run_until_complete(server.start())
+    monkeypatch.setattr(config, "SOLANA_RPC_URLS", [url])
+    monkeypatch.setattr(config, "RPC_REQUESTS_PER_SECOND", None)
+    try:
+        yield loop, url
+    finally:
+        loop.run_until_complete(server.stop())
+        loop.close()
+
+
+@pytest.fixture
+def replay(monkeypatch, tmp_path):
+    """(event loop, RPC url, wallet) of a synthesized wallet served by a ReplayServer"""
+    fixtures = synthesize_wallet(TOKEN_ACCOUNTS, now=NOW)
+    monkeypatch.chdir(tmp_path)
+    with replayed(monkeypatch, fixtures) as (loop, url):
+        yield loop, url, fixtures.meta["wallet"]
@@ -0,0 +1,134 @@
+import asyncio
+import contextlib
+import functools
+import queue
+import sqlite3
+import threading
+
+import pytest
+
+from batch_scan import SingleWriter, WriterClient, scan_wallets
+from db_schema import migrate
+from rpc_replay import Fixtures, ReplayServer
+from tests.benchmark_scanner import COINGECKO_PATH, DEXSCREENER_PATH, synthesize_wallet
+from tests.conftest import NOW, pnl_info, replayed, scan
+from tests.test_db_writer import pnl_row
+
+
+def run_worker(writer: SingleWriter, body) -> None:
+    """Run body(client) on a thread standing in for a worker process while the writer serves it"""
+    requests, replies, errors = queue.Queue(), {0: queue.Queue()}, []
+
+    def worker():
+        try:
+            body(WriterClient(0, requests, replies[0]))
+        except BaseException as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    writer.serve(requests, replies, [thread])
+    if errors:
+        raise errors[0]
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writer = SingleWriter(str(tmp_path / "trading_data.db"))
+    writer.register_wallets(["wallet"])
+    yield writer
+    writer.close()
+
+
+def test_failed_statement_raises_in_the_worker(writer):
+    def body(client):
+        client.execute('INSERT INTO no_such_table VALUES (?)', (1,))
+        with pytest.raises(sqlite3.DatabaseError, match="no_such_table"):
+            client.sync()
+        # Reported once; later writes go through.
+        client.add_account(pnl_row(1, "after"))
+        client.sync()
+
+    run_worker(writer, body)
+    assert writer.connection.execute("SELECT token_account FROM pnl_info").fetchall() == [("after",)]
+
+
+def test_failed_rows_raise_in_the_worker(writer):
+    def body(client):
+        client.add_account(pnl_row(1, "bad")[:-1])
+        client.flush()
+        with pytest.raises(sqlite3.DatabaseError):
+            client.sync()
+        client.add_account(pnl_row(1, "good"))
+        client.sync()
+
+    run_worker(writer, body)
+    assert writer.connection.execute("SELECT token_account FROM pnl_info").fetchall() == [("good",)]
+
+
+def replay_setup(url: str) -> None:
+    """worker_setup pointing a worker process at the replay server"""
+    import config
+    import functions
+    from price_feed import PriceFeed
+    config.SOLANA_RPC_URLS = [url]
+    config.RPC_REQUESTS_PER_SECOND = None
+    functions.PriceFeed = functools.partial(PriceFeed, dexscreener_url=url + DEXSCREENER_PATH,
+                                            coingecko_url=url + COINGECKO_PATH)
+
+
+@contextlib.contextmanager
+def served(fixtures: Fixtures):
+    """URL of a ReplayServer running on its own thread, so it answers while the test blocks in scan_wallets"""
+    loop = asyncio.new_event_loop()
+    server = ReplayServer(fixtures)
+    url = loop.run_until_complete(server.start())
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    try:
+        yield url
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def test_scan_wallets_into_another_database(monkeypatch, tmp_path):
+    wallets = [synthesize_wallet(12, seed=seed, now=NOW) for seed in (1, 2)]
+    rpc = {}
+    for wallet in wallets:
+        for method, calls in wallet.rpc.items():
+            rpc.setdefault(method, {}).update(calls)
+    fixtures = Fixtures(rpc, {**wallets[0].http, **wallets[1].http}, {**wallets[0].accounts, **wallets[1].accounts},
+                        {**wallets[0].pairs, **wallets[1].pairs})
+    serial, batch = tmp_path / "serial", tmp_path / "batch"
+    serial.mkdir()
+    batch.mkdir()
+
+    with replayed(monkeypatch, fixtures) as (loop, url):
+        for wallet in wallets:
+            loop.run_until_complete(scan(url, wallet.meta["wallet"], serial))
+
+    monkeypatch.chdir(batch)
+    with contextlib.closing(sqlite3.connect(batch / "other.db")) as connection:
+        # Tracked by an earlier batch, with trades that have all aged out since; this batch does not rescan it.
+        migrate(connection)
+        connection.execute("INSERT INTO wallet_address (wallet_address) VALUES ('idle')")
+        connection.execute("INSERT INTO winning_wallets (wallet_address_id, win_rate_7, token_accounts_7) "
+                           "VALUES (last_insert_rowid(), 75.0, 4)")
+        connection.commit()
+    with served(fixtures) as url:
+        results = scan_wallets([wallet.meta["wallet"] for wallet in wallets], processes=2, reports=False,
+                               metrics=False, database_path=str(batch / "other.db"),
+                               worker_setup=functools.partial(replay_setup, url))
+
+    assert [result.error for result in results] == [None, None]
+    assert not (batch / "trading_data.db").exists()
+    # wallet_address ids depend on registration order; everything else must match the serial scans.
+    assert sorted(row[1:] for row in pnl_info(batch, "other.db")) == sorted(row[1:] for row in pnl_info(serial))
+    assert len(pnl_info(serial)) == 24
+    with contextlib.closing(sqlite3.connect(batch / "other.db")) as connection:
+        assert connection.execute("SELECT win_rate_7, token_accounts_7 FROM winning_wallets ww "
+                                  "JOIN wallet_address w ON w.id = ww.wallet_address_id "
+                                  "WHERE w.wallet_address = 'idle'").fetchall() == [(None, 0)]
@@ -0,0 +1,20 @@
+"""Accounts processed by concurrent workers through the writer thread must leave the same pnl_info as a serial scan"""
+import pytest
+
+from tests.conftest import TOKEN_ACCOUNTS, pnl_info, scan
+
+
+@pytest.mark.parametrize("max_workers", [4, 16])
+def test_concurrent_scan_matches_serial_scan(replay, tmp_path, max_workers):
+    loop, url, wallet = replay
+    serial, concurrent = tmp_path / "serial", tmp_path / "concurrent"
+    serial.mkdir()
+    concurrent.mkdir()
+
+    loop.run_until_complete(scan(url, wallet, serial))
+    trader = loop.run_until_complete(scan(url, wallet, concurrent, max_workers=max_workers))
+
+    expected = pnl_info(serial)
+    assert len(expected) == TOKEN_ACCOUNTS
+    assert pnl_info(concurrent) == expected
+    assert trader.metrics.peaks['workers.busy'] > 1
@@ -0,0 +1,85 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from db_schema import migrate
+from db_writer import PNL_INFO_COLUMNS, BulkWriter, RowBuffer, ThreadedWriter
+
+
+def pnl_row(wallet_address_id, token_account, delta_sol=1.0):
+    row = dict.fromkeys(PNL_INFO_COLUMNS, 0)
+    row.update(wallet_address_id=wallet_address_id, token_account=token_account, delta_sol=delta_sol,
+               last_trade=1_700_000_000, time_period=1_700_000_000, contract="mint", buy_period=None,
+               first_buy_time=None, final_sell_time=None)
+    return tuple(row[column] for column in PNL_INFO_COLUMNS)
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    migrate(connection)
+    connection.execute("INSERT INTO wallet_address (wallet_address) VALUES ('wallet')")
+    connection.commit()
+    yield connection
+    connection.close()
+
+
+def test_failed_batch_does_not_poison_later_flushes(connection):
+    writer = BulkWriter(connection)
+    writer.add_account(pnl_row(1, "good-1"))
+    writer.add_account(pnl_row(1, "bad")[:-1])
+    with pytest.raises(sqlite3.Error):
+        writer.flush()
+    assert writer.pending() == 0
+    assert connection.execute("SELECT COUNT(*) FROM pnl_info").fetchone() == (0,)
+
+    writer.add_account(pnl_row(1, "good-2"))
+    writer.flush()
+    assert connection.execute("SELECT token_account FROM pnl_info").fetchall() == [("good-2",)]
+    assert writer.rows_written == 1
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "trading_data.db")
+    connection = sqlite3.connect(path)
+    migrate(connection)
+    connection.execute("INSERT INTO wallet_address (wallet_address) VALUES ('wallet')")
+    connection.commit()
+    yield path, connection
+    connection.close()
+
+
+def test_writer_thread_raises_failed_statement_on_sync(database):
+    path, connection = database
+    writer = ThreadedWriter(path)
+    try:
+        writer.execute('INSERT INTO no_such_table VALUES (?)', (1,))
+        with pytest.raises(sqlite3.OperationalError, match="no_such_table"):
+            writer.sync()
+        # Reported once; the thread keeps serving.
+        writer.add_account(pnl_row(1, "after"))
+        writer.sync()
+    finally:
+        writer.close()
+    assert connection.execute("SELECT token_account FROM pnl_info").fetchall() == [("after",)]
+
+
+def test_writer_thread_raises_failed_rows_on_drain(database):
+    path, connection = database
+    writer = ThreadedWriter(path)
+    try:
+        writer.add_account(pnl_row(1, "bad")[:-1])
+        with pytest.raises(sqlite3.Error):
+            asyncio.run(writer.drain())
+        writer.add_account(pnl_row(1, "good"))
+        asyncio.run(writer.drain())
+    finally:
+        writer.close()
+    assert connection.execute("SELECT token_account FROM pnl_info").fetchall() == [("good",)]
+
+
+def test_row_buffer_needs_a_flush():
+    with pytest.raises(TypeError):
+        RowBuffer()
@@ -0,0 +1,60 @@
+"""The streaming workbook must read back like the pandas one: same values, same widths, rules over every row"""
+import re
+
+import pytest
+from openpyxl import load_workbook
+
+from excel_report import SHEET_NAME
+from tests.conftest import NOW, TOKEN_ACCOUNTS, scan
+
+PERIOD = 90
+FIRST_ROW = 5
+HYPERLINK = re.compile(r'^=HYPERLINK\("[^"]*","([^"]*)"\)$')
+
+
+def displayed(value):
+    """A cell as the reader sees it: the label of a HYPERLINK formula, the value otherwise"""
+    match = HYPERLINK.match(value) if isinstance(value, str) else None
+    return match.group(1) if match else value
+
+
+@pytest.fixture
+def workbooks(replay, tmp_path):
+    loop, url, wallet = replay
+    trader = loop.run_until_complete(scan(url, wallet, tmp_path))
+    # Windows relative to the synthesized wallet's clock, not today's.
+    trader.period_cutoff = lambda time_period: NOW - int(time_period) * 86400
+    trader.solana_usd_price = 150.0
+    summary = trader.get_summary(PERIOD)
+    streamed, pandas = tmp_path / "streamed.xlsx", tmp_path / "pandas.xlsx"
+    written = trader.export_to_excel_streaming(dict(summary), PERIOD, str(streamed))
+    trader.export_to_excel(dict(summary), trader.get_transactions(PERIOD), str(pandas))
+    assert written == TOKEN_ACCOUNTS
+    return load_workbook(streamed)[SHEET_NAME], load_workbook(pandas)[SHEET_NAME], written
+
+
+def test_values_and_widths_match_pandas_export(workbooks):
+    streamed, pandas, written = workbooks
+    assert streamed.max_row == pandas.max_row == FIRST_ROW + written - 1
+    for streamed_row, pandas_row in zip(streamed.iter_rows(), pandas.iter_rows()):
+        assert [displayed(cell.value) for cell in streamed_row] == [cell.value for cell in pandas_row]
+    for letter, dimension in pandas.column_dimensions.items():
+        assert streamed.column_dimensions[letter].width == dimension.width
+
+
+def test_conditional_formatting_covers_every_transaction_row(workbooks):
+    streamed, _, written = workbooks
+    last_row = FIRST_ROW + written - 1
+    rules = {}
+    for formatting in streamed.conditional_formatting:
+        rules[str(formatting.sqref)] = [rule.formula[0] for rule in formatting.rules]
+
+    assert rules == {
+        f"C{FIRST_ROW}:C{last_row}": [f"ROUND($C{FIRST_ROW},1)>ROUND($B{FIRST_ROW},1)"],
+        f"J{FIRST_ROW}:J{last_row}": [f"$J{FIRST_ROW}>3"],
+        f"M{FIRST_ROW}:M{last_row}": [f'ISERROR(SEARCH("m",$M{FIRST_ROW}))'],
+        f"H{FIRST_ROW}:H{last_row}": [f"$H{FIRST_ROW}<0", f"$H{FIRST_ROW}>0"],
+        f"I{FIRST_ROW}:I{last_row}": [f"AND($H{FIRST_ROW}<0,$I{FIRST_ROW}<>-100)",
+                                      f"AND(NOT(AND($H{FIRST_ROW}<0,$I{FIRST_ROW}<>-100)),$I{FIRST_ROW}>0)",
+                                      f"$I{FIRST_ROW}=-100"],
+    }
@@ -0,0 +1,74 @@
+import contextlib
+import csv
+import os
+import sqlite3
+
+import pyarrow as pa
+import pyarrow.parquet
+import pytest
+
+import report_export
+from report_export import SUMMARY_FIELDS, TRANSACTION_FIELDS
+from tests.conftest import NOW, TOKEN_ACCOUNTS, scan
+
+PERIOD = 90
+CASTS = {'string': str, 'float64': float, 'int64': int}
+
+
+def read_back(path: str, export_format: str, fields) -> list:
+    """The file's rows as tuples of Python values, None for nulls"""
+    if export_format == 'csv':
+        with open(path, newline='') as source:
+            reader = csv.reader(source)
+            assert next(reader) == [name for name, _ in fields]
+            return [tuple(CASTS[type_name](value) if value != '' else None
+                          for value, (_, type_name) in zip(row, fields)) for row in reader]
+    if export_format == 'parquet':
+        table = pa.parquet.read_table(path)
+    else:
+        # Arrow IPC files are written uncompressed so they can be memory-mapped.
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    assert table.schema.names == [name for name, _ in fields]
+    return [tuple(row.values()) for row in table.to_pylist()]
+
+
+@pytest.fixture
+def trader(replay, tmp_path):
+    loop, url, wallet = replay
+    trader = loop.run_until_complete(scan(url, wallet, tmp_path))
+    # Windows relative to the synthesized wallet's clock, not today's.
+    trader.period_cutoff = lambda time_period: NOW - int(time_period) * 86400
+    return trader
+
+
+@pytest.mark.parametrize("export_format", report_export.EXPORT_FORMATS)
+def test_report_round_trips(trader, tmp_path, export_format):
+    summary = trader.get_summary(PERIOD)
+    file_name = trader.export_report(summary, PERIOD, str(tmp_path / "report"), export_format)
+
+    with contextlib.closing(sqlite3.connect(tmp_path / "trading_data.db")) as connection:
+        expected = connection.execute(f'''
+            SELECT {', '.join(name for name, _ in TRANSACTION_FIELDS)} FROM pnl_info
+            WHERE wallet_address_id = ? ORDER BY last_trade DESC
+        ''', (trader.wallet_id,)).fetchall()
+    assert len(expected) == TOKEN_ACCOUNTS
+    assert read_back(file_name, export_format, TRANSACTION_FIELDS) == expected
+
+    extension = report_export.FILE_EXTENSIONS[export_format]
+    assert read_back(str(tmp_path / f"report_summary.{extension}"), export_format, SUMMARY_FIELDS) == [
+        tuple(summary[name] for name, _ in SUMMARY_FIELDS)]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.partial')]
+
+
+@pytest.mark.parametrize("export_format", report_export.EXPORT_FORMATS)
+def test_failed_export_leaves_no_file(tmp_path, export_format):
+    row = ('account', 1.0, 2.0, 0.1, 1.0, 2.0, 5.0, 1.0, 100.0, 1, 1, NOW, 60, 30, 'mint', 0)
+
+    def chunks():
+        yield [row]
+        raise RuntimeError("database went away")
+
+    path = str(tmp_path / f"transactions.{export_format}")
+    with pytest.raises(RuntimeError):
+        report_export.export_transactions(path, export_format, chunks())
+    assert os.listdir(tmp_path) == []
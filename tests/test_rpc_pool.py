@@ -0,0 +1,14 @@
+from backend.rpc_pool import RpcPool, endpoint_limits, parse_endpoints
+
+
+def test_parse_endpoints():
+    assert parse_endpoints("https://a.example, https://b.example/?api-key=1|25,https://c.example|") == [
+        "https://a.example", ("https://b.example/?api-key=1", 25.0), ("https://c.example", None)]
+
+
+def test_endpoints_keep_their_own_limit():
+    assert endpoint_limits(["https://a.example", ("https://b.example", 50)], 10) == [
+        ("https://a.example", 10), ("https://b.example", 50)]
+
+    pool = RpcPool.from_urls(["https://a.example", ("https://b.example", 50), ("https://c.example", None)], 10)
+    assert [endpoint.requests_per_second for endpoint in pool.endpoints] == [10, 50, None]
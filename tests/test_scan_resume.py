@@ -0,0 +1,61 @@
+"""A scan killed between two flushes and then resumed must leave the same pnl_info as a scan that never stopped"""
+import contextlib
+import sqlite3
+
+import pytest
+
+from db_writer import BulkWriter
+from tests.conftest import TOKEN_ACCOUNTS, pnl_info, scan
+
+# Three rows per token account, so a flush lands between accounts every few units.
+BATCH_SIZE = 8
+
+
+class ScanKilled(BaseException):
+    """Stands in for the process dying; not an Exception, so no handler in the scanner catches it"""
+
+
+class KilledWriter(BulkWriter):
+    """Commits `flushes` batches, then dies at the next flush with its buffered rows never written"""
+
+    def __init__(self, connection: sqlite3.Connection, flushes: int):
+        super().__init__(connection, BATCH_SIZE)
+        self.flushes = flushes
+
+    def flush(self) -> None:
+        if not self.pending():
+            return
+        if self.flushes == 0:
+            raise ScanKilled()
+        self.flushes -= 1
+        super().flush()
+
+
+@pytest.mark.parametrize("killed_after", [0, 2, 7])
+def test_resumed_scan_matches_clean_scan(replay, tmp_path, killed_after):
+    loop, url, wallet = replay
+    clean, resumed = tmp_path / "clean", tmp_path / "resumed"
+    clean.mkdir()
+    resumed.mkdir()
+
+    loop.run_until_complete(scan(url, wallet, clean))
+    expected = pnl_info(clean)
+    assert len(expected) == TOKEN_ACCOUNTS
+
+    def killed_writer():
+        return KilledWriter(sqlite3.connect("trading_data.db"), killed_after)
+
+    with pytest.raises(ScanKilled):
+        loop.run_until_complete(scan(url, wallet, resumed, db_writer=killed_writer))
+    committed = pnl_info(resumed)
+    assert len(committed) < TOKEN_ACCOUNTS
+
+    with contextlib.closing(sqlite3.connect(resumed / "trading_data.db")) as connection:
+        # Every committed pnl_info row came with its cursor and done journal row, and nothing else is done.
+        cursors = connection.execute("SELECT wallet_token_account FROM token_accounts").fetchall()
+        done = connection.execute("SELECT token_account FROM scan_journal WHERE status = 'done'").fetchall()
+        assert sorted(cursors) == sorted(done) == sorted((row[1],) for row in committed)
+
+    trader = loop.run_until_complete(scan(url, wallet, resumed))
+    assert trader.journal.resumed
+    assert pnl_info(resumed) == expected
@@ -0,0 +1,96 @@
+import contextlib
+import sqlite3
+
+from rpc_replay import Fixtures
+from signature_index import SignatureIndex
+from tests.benchmark_scanner import synthesize_wallet
+from tests.conftest import NOW, pnl_info, replayed, scan
+
+CAPACITY = 1000
+
+
+def index(path) -> SignatureIndex:
+    return SignatureIndex(str(path), capacity=CAPACITY)
+
+
+def test_pending_signers_are_found_before_they_are_written(tmp_path):
+    signatures = index(tmp_path / "cache.db")
+    signatures.add_many([("sig-1", "alice"), ("sig-2", "bob")])
+    assert signatures.signers(["sig-1", "sig-2", "sig-3"]) == {"sig-1": "alice", "sig-2": "bob"}
+    assert signatures.foreign(["sig-1", "sig-2"], "alice") == {"sig-2"}
+    signatures.close()
+
+    with contextlib.closing(sqlite3.connect(tmp_path / "cache.db")) as connection:
+        assert sorted(connection.execute("SELECT signature, signer FROM transaction_signers")) == [
+            ("sig-1", "alice"), ("sig-2", "bob")]
+
+
+def test_saved_filter_is_loaded_and_caught_up(tmp_path):
+    path = tmp_path / "cache.db"
+    first = index(path)
+    first.add_many((f"first-{number}", "alice") for number in range(300))
+    first.close()
+
+    second = index(path)
+    assert second.last_rowid == 300
+    assert [bytes(generation.bits) for generation in second.filter.generations] == [
+        bytes(generation.bits) for generation in first.filter.generations]
+    # Indexed by another process after the snapshot was saved, and never saved into it.
+    second.add_many((f"second-{number}", "bob") for number in range(50))
+    second.write_pending()
+    second.connection.close()
+
+    third = index(path)
+    assert third.last_rowid == 350
+    assert all(f"first-{number}" in third.filter for number in range(300))
+    assert all(f"second-{number}" in third.filter for number in range(50))
+    assert third.signers(["second-7", "first-9", "unknown"]) == {"second-7": "bob", "first-9": "alice"}
+    third.close()
+
+
+def test_snapshot_of_another_size_is_rebuilt(tmp_path):
+    path = tmp_path / "cache.db"
+    first = index(path)
+    first.add_many((f"sig-{number}", "alice") for number in range(100))
+    first.close()
+
+    resized = SignatureIndex(str(path), capacity=CAPACITY * 2)
+    assert all(f"sig-{number}" in resized.filter for number in range(100))
+    resized.close()
+
+
+def shared_transactions(first: Fixtures, second: Fixtures) -> Fixtures:
+    """second's fixtures, with first's signatures also listed under second's token accounts, as for a copy-trader"""
+    rpc = {}
+    for fixtures in (first, second):
+        for method, calls in fixtures.rpc.items():
+            rpc.setdefault(method, {}).update(calls)
+    first_lists = [call["result"] for call in first.rpc["getSignaturesForAddress"].values()]
+    for number, (key, call) in enumerate(second.rpc["getSignaturesForAddress"].items()):
+        listed = call["result"] + first_lists[number % len(first_lists)]
+        rpc["getSignaturesForAddress"][key] = {"result": sorted(listed, key=lambda entry: -entry["blockTime"])}
+    return Fixtures(rpc, {**first.http, **second.http}, {**first.accounts, **second.accounts},
+                    {**first.pairs, **second.pairs})
+
+
+def test_transactions_signed_by_another_wallet_are_skipped(monkeypatch, tmp_path):
+    first, second = synthesize_wallet(20, seed=1, now=NOW), synthesize_wallet(20, seed=2, now=NOW)
+    fixtures = shared_transactions(first, second)
+    alone, shared = tmp_path / "alone", tmp_path / "shared"
+    alone.mkdir()
+    shared.mkdir()
+
+    with replayed(monkeypatch, fixtures) as (loop, url):
+        loop.run_until_complete(scan(url, second.meta["wallet"], alone, signature_index=index(alone / "cache.db")))
+
+        # The first wallet is scanned in another process; the second only sees its saved index.
+        first_index = index(shared / "cache.db")
+        loop.run_until_complete(scan(url, first.meta["wallet"], shared, signature_index=first_index))
+        first_index.close()
+        trader = loop.run_until_complete(scan(url, second.meta["wallet"], shared,
+                                              signature_index=index(shared / "cache.db")))
+
+    skipped = trader.metrics.counters.get('transactions.skipped_foreign', 0)
+    assert skipped == sum(len(call["result"]) for call in first.rpc["getSignaturesForAddress"].values())
+    # wallet_address ids differ between the two databases; everything else must not.
+    assert [row[1:] for row in pnl_info(shared) if row[0] == trader.wallet_id] == [row[1:] for row in pnl_info(alone)]
@@ -0,0 +1,68 @@
+"""A streamed token account whose refresh fails is queued again, and given up to the next backfill after that"""
+import asyncio
+
+import pytest
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+import functions
+
+RETRIES = 2
+
+
+@pytest.fixture
+def trader(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(functions, "STREAM_RETRY_DELAYS", (0,) * RETRIES)
+    trader = functions.SolanaTrader(Pubkey.new_unique())
+
+    async def transactions(signatures):
+        return [str(signature) for signature in signatures]
+
+    # Each streamed signature touched one token account named after it.
+    trader.get_transactions_batched = transactions
+    trader.wallet_token_accounts = lambda transaction: {f"account-{transaction}"}
+    yield trader
+    trader.db_writer.close()
+    asyncio.new_event_loop().run_until_complete(trader.solana_client.close())
+
+
+def stream(trader, failures: int, attempts: int) -> tuple:
+    """(signature, refreshed accounts) after queueing one signature and running until `attempts` refreshes"""
+    signature = Signature.new_unique()
+    refreshed = []
+
+    async def refresh(token_account_str):
+        refreshed.append(token_account_str)
+        if len(refreshed) <= failures:
+            raise RuntimeError("node unavailable")
+
+    trader.refresh_token_account = refresh
+
+    async def run():
+        consumer = asyncio.create_task(trader.process_trade_queue())
+        assert trader.queue_signature(signature)
+        while len(refreshed) < attempts:
+            await asyncio.sleep(0.01)
+        await trader.trade_queue.join()
+        consumer.cancel()
+
+    asyncio.new_event_loop().run_until_complete(asyncio.wait_for(run(), 10))
+    return signature, refreshed
+
+
+def test_failed_refresh_is_retried(trader):
+    signature, refreshed = stream(trader, failures=RETRIES, attempts=RETRIES + 1)
+    assert refreshed == [f"account-{signature}"] * (RETRIES + 1)
+    assert trader.metrics.counters['stream.accounts_requeued'] == RETRIES
+    assert not trader.stream_retries
+    assert not trader.queue_signature(signature)
+
+
+def test_exhausted_retries_release_the_signatures(trader):
+    signature, refreshed = stream(trader, failures=RETRIES + 1, attempts=RETRIES + 1)
+    assert len(refreshed) == RETRIES + 1
+    assert trader.metrics.counters['stream.accounts_abandoned'] == 1
+    assert not trader.stream_retries
+    # A reconnect backfill may queue it again.
+    assert trader.queue_signature(signature)
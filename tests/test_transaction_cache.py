@@ -0,0 +1,33 @@
+import contextlib
+import sqlite3
+
+import transaction_cache
+from tests.test_transaction_decoder import render, swap
+from transaction_cache import TransactionCache
+
+
+def test_locked_cache_skips_writes(monkeypatch, tmp_path):
+    path = str(tmp_path / "transaction_cache.db")
+    monkeypatch.setattr(transaction_cache, "TRANSACTION_CACHE_BUSY_SECONDS", 0.05)
+    cache = TransactionCache(path)
+    response, _ = render(swap())
+
+    with contextlib.closing(sqlite3.connect(path, isolation_level=None)) as other:
+        # Another worker process in the middle of its own write.
+        other.execute("BEGIN IMMEDIATE")
+        cache.put("sig-1", response)
+        assert cache.total_bytes == 0
+        other.execute("ROLLBACK")
+
+    assert cache.get("sig-1") is None
+    cache.put("sig-1", response)
+    assert cache.get("sig-1") == response
+    cache.close()
+
+
+def test_connection_waits_for_other_writers(tmp_path):
+    cache = TransactionCache(str(tmp_path / "transaction_cache.db"))
+    timeout = cache.connection.execute("PRAGMA busy_timeout").fetchone()[0]
+    assert timeout == transaction_cache.TRANSACTION_CACHE_BUSY_SECONDS * 1000
+    assert cache.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    cache.close()
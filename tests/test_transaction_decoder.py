@@ -0,0 +1,209 @@
+"""The base64 decode path must yield exactly the information_array the jsonParsed path collects
+
+Each fixture is one v0 transaction, rendered both as the node's base64 response and as its jsonParsed response,
+and both go through SolanaTrader.get_information_array.
+"""
+import base64
+import json
+import struct
+from types import SimpleNamespace
+
+import base58
+import pytest
+from solders.address_lookup_table_account import AddressLookupTableAccount
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.keypair import Keypair
+from solders.message import MessageV0
+from solders.pubkey import Pubkey
+from solders.rpc.responses import GetTransactionResp
+from solders.transaction import VersionedTransaction
+
+import transaction_decoder
+from functions import SolanaTrader
+
+TOKEN_PROGRAM = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+SYSTEM_PROGRAM = "11111111111111111111111111111111"
+SYNC_NATIVE = 17
+
+
+def transfer(source, destination, authority, amount, signers=()):
+    return 3, [source, destination, authority, *signers], b'\x03' + struct.pack('<Q', amount)
+
+
+def transfer_checked(source, mint, destination, authority, amount, decimals, signers=()):
+    return 12, [source, mint, destination, authority, *signers], b'\x0c' + struct.pack('<QB', amount, decimals)
+
+
+def close_account(account, destination, owner, signers=()):
+    return 9, [account, destination, owner, *signers], b'\x09'
+
+
+def sync_native(account):
+    return SYNC_NATIVE, [account], bytes([SYNC_NATIVE])
+
+
+def with_signers(info, accounts, authority_index, owner_field, multisig_field):
+    # How the node renders a single authority vs a multisig and its signers.
+    if len(accounts) > authority_index + 1:
+        return dict(info, **{multisig_field: accounts[authority_index], "signers": accounts[authority_index + 1:]})
+    return dict(info, **{owner_field: accounts[authority_index]})
+
+
+def parsed_instruction(tag, accounts, data):
+    """The jsonParsed rendering of one SPL Token instruction"""
+    if tag == 3:
+        info = with_signers({"source": accounts[0], "destination": accounts[1],
+                             "amount": str(struct.unpack_from('<Q', data, 1)[0])},
+                            accounts, 2, "authority", "multisigAuthority")
+        kind = "transfer"
+    elif tag == 12:
+        amount, decimals = struct.unpack_from('<QB', data, 1)
+        info = with_signers({"source": accounts[0], "mint": accounts[1], "destination": accounts[2],
+                             "tokenAmount": {"uiAmount": amount / 10 ** decimals, "decimals": decimals,
+                                             "amount": str(amount),
+                                             "uiAmountString": transaction_decoder.ui_amount_string(amount, decimals)}},
+                            accounts, 3, "authority", "multisigAuthority")
+        kind = "transferChecked"
+    elif tag == 9:
+        info = with_signers({"account": accounts[0], "destination": accounts[1]},
+                            accounts, 2, "owner", "multisigOwner")
+        kind = "closeAccount"
+    else:
+        info = {"account": accounts[0]}
+        kind = "syncNative"
+    return {"program": "spl-token", "programId": TOKEN_PROGRAM, "parsed": {"type": kind, "info": info},
+            "stackHeight": 2}
+
+
+def render(inner, lookup_addresses=(), system_transfer=False):
+    """(jsonParsed response, base64 response) for one transaction whose inner instructions are `inner`
+
+    Accounts in lookup_addresses are only reachable through an address lookup table, so the base64 path has to
+    resolve them from meta.loadedAddresses.
+    """
+    payer = Keypair()
+    amm = Pubkey.new_unique()
+    accounts = list(dict.fromkeys(str(account) for _, instruction_accounts, _ in inner
+                                  for account in instruction_accounts))
+    static = [Pubkey.from_string(account) for account in accounts if account not in lookup_addresses]
+    table = AddressLookupTableAccount(Pubkey.new_unique(), [Pubkey.from_string(a) for a in lookup_addresses])
+    outer = Instruction(amm, b'\x01', [AccountMeta(account, False, True) for account in static] +
+                        [AccountMeta(Pubkey.from_string(address), False, False) for address in lookup_addresses] +
+                        [AccountMeta(Pubkey.from_string(TOKEN_PROGRAM), False, False),
+                         AccountMeta(Pubkey.from_string(SYSTEM_PROGRAM), False, False)])
+    message = MessageV0.try_compile(payer.pubkey(), [outer], [table] if lookup_addresses else [], Hash.default())
+    transaction = VersionedTransaction(message, [payer])
+
+    writable, readonly = [], []
+    for lookup in message.address_table_lookups:
+        writable += [str(table.addresses[index]) for index in lookup.writable_indexes]
+        readonly += [str(table.addresses[index]) for index in lookup.readonly_indexes]
+    keys = [str(key) for key in message.account_keys] + writable + readonly
+    index = {key: position for position, key in enumerate(keys)}
+
+    compiled, parsed = [], []
+    if system_transfer:
+        # A lamport transfer also has a "destination" but is not a token instruction; both paths skip it.
+        source, destination = keys[0], accounts[0]
+        compiled.append({"programIdIndex": index[SYSTEM_PROGRAM], "accounts": [index[source], index[destination]],
+                         "data": base58.b58encode(struct.pack('<IQ', 2, 1000)).decode(), "stackHeight": 2})
+        parsed.append({"program": "system", "programId": SYSTEM_PROGRAM, "stackHeight": 2,
+                       "parsed": {"type": "transfer",
+                                  "info": {"source": source, "destination": destination, "lamports": 1000}}})
+    for tag, instruction_accounts, data in inner:
+        instruction_accounts = [str(account) for account in instruction_accounts]
+        compiled.append({"programIdIndex": index[TOKEN_PROGRAM],
+                         "accounts": [index[account] for account in instruction_accounts],
+                         "data": base58.b58encode(data).decode(), "stackHeight": 2})
+        parsed.append(parsed_instruction(tag, instruction_accounts, data))
+
+    meta = {"err": None, "status": {"Ok": None}, "fee": 5000, "preBalances": [0] * len(keys),
+            "postBalances": [0] * len(keys), "logMessages": [], "preTokenBalances": [], "postTokenBalances": [],
+            "rewards": [], "loadedAddresses": {"writable": writable, "readonly": readonly},
+            "computeUnitsConsumed": 1000}
+    base64_result = {"slot": 5, "blockTime": 1_700_000_000, "version": 0,
+                     "meta": dict(meta, innerInstructions=[{"index": 0, "instructions": compiled}]),
+                     "transaction": [base64.b64encode(bytes(transaction)).decode(), "base64"]}
+    static_count = len(message.account_keys)
+    account_keys = [{"pubkey": key, "writable": True, "signer": position == 0,
+                     "source": "transaction" if position < static_count else "lookupTable"}
+                    for position, key in enumerate(keys)]
+    parsed_result = {"slot": 5, "blockTime": 1_700_000_000, "version": 0,
+                     "meta": dict(meta, innerInstructions=[{"index": 0, "instructions": parsed}]),
+                     "transaction": {"signatures": [str(transaction.signatures[0])],
+                                     "message": {"accountKeys": account_keys,
+                                                 "recentBlockhash": str(Hash.default()),
+                                                 "instructions": [], "addressTableLookups": [
+                                                     {"accountKey": str(lookup.account_key),
+                                                      "writableIndexes": list(lookup.writable_indexes),
+                                                      "readonlyIndexes": list(lookup.readonly_indexes)}
+                                                     for lookup in message.address_table_lookups]}}}
+    return response(parsed_result), response(base64_result)
+
+
+def response(result) -> GetTransactionResp:
+    return GetTransactionResp.from_json(json.dumps({"jsonrpc": "2.0", "id": 0, "result": result}))
+
+
+def information_array(transaction, encoding):
+    return SolanaTrader.get_information_array(SimpleNamespace(transaction_encoding=encoding), transaction)
+
+
+def unique(count):
+    return [str(Pubkey.new_unique()) for _ in range(count)]
+
+
+def swap():
+    wallet_sol, wallet_token, sol_vault, token_vault, pool_authority, mint = unique(6)
+    return [transfer(wallet_sol, sol_vault, wallet_token, 10 ** 9),
+            transfer_checked(token_vault, mint, wallet_token, pool_authority, 123_456_700, 6)]
+
+
+def multisig():
+    source, destination, mint, multisig_account, signer_a, signer_b, owner = unique(7)
+    return [transfer(source, destination, multisig_account, 42, signers=(signer_a, signer_b)),
+            transfer_checked(source, mint, destination, multisig_account, 5, 0, signers=(signer_a,)),
+            close_account(source, owner, multisig_account, signers=(signer_a, signer_b))]
+
+
+def close_and_sync():
+    account, destination, owner, wrapped = unique(4)
+    return [sync_native(wrapped), close_account(account, destination, owner)]
+
+
+CASES = {
+    "transfer and transferChecked": (swap, {}),
+    "multisig authorities": (multisig, {}),
+    "closeAccount next to an instruction without destination": (close_and_sync, {}),
+    "system transfer is not a token transfer": (swap, {"system_transfer": True}),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_information_array_matches_json_parsed(name):
+    build, options = CASES[name]
+    parsed, raw = render(build(), **options)
+    expected = information_array(parsed, "jsonParsed")
+    assert expected
+    assert information_array(raw, "base64") == expected
+
+
+def test_accounts_loaded_from_lookup_tables():
+    inner = swap()
+    # Vault and pool accounts typically come from the pool's lookup table rather than the static keys.
+    table_accounts = tuple(inner[0][1][1:2]) + tuple(inner[1][1][:2])
+    parsed, raw = render(inner, lookup_addresses=table_accounts)
+    assert raw.value.transaction.meta.loaded_addresses.writable or raw.value.transaction.meta.loaded_addresses.readonly
+    assert information_array(raw, "base64") == information_array(parsed, "jsonParsed")
+
+
+def test_signer_matches_json_parsed():
+    parsed, raw = render(swap())
+    assert transaction_decoder.account_signer(raw) == parsed.value.transaction.transaction.message.account_keys[0].pubkey
+
+
+@pytest.mark.parametrize("decimals, amount, expected", [(0, 7, "7"), (6, 123_456_700, "123.4567"), (9, 5, "0.000000005"),
+                                                        (6, 1_000_000, "1")])
+def test_ui_amount_string(decimals, amount, expected):
+    assert transaction_decoder.ui_amount_string(amount, decimals) == expected
@@ -0,0 +1,120 @@
+import math
+import random
+import sqlite3
+
+import pytest
+
+from db_schema import migrate
+from wallet_ranking import DEFAULT_SCORE_WEIGHTS, WalletRanker
+
+# wallet -> 30-day (win rate, balance change, token accounts); None win rate is a window without trades.
+WALLETS = {
+    'alpha': (80.0, 10.0, 5),
+    'bravo': (80.0, 20.0, 5),
+    'charlie': (90.0, -5.0, 12),
+    'delta': (60.0, 30.0, 2),
+    'echo': (None, None, 0),
+    'foxtrot': (80.0, 10.0, 5),
+}
+
+
+def seeded(wallets: dict) -> WalletRanker:
+    connection = sqlite3.connect(":memory:")
+    migrate(connection)
+    for wallet, (win_rate, balance_change, token_accounts) in wallets.items():
+        wallet_id = connection.execute("INSERT INTO wallet_address (wallet_address) VALUES (?)", (wallet,)).lastrowid
+        connection.execute("INSERT INTO winning_wallets (wallet_address_id, win_rate_30, balance_change_30, "
+                           "token_accounts_30) VALUES (?, ?, ?, ?)",
+                           (wallet_id, win_rate, balance_change, token_accounts))
+    connection.commit()
+    # There are no daily buckets behind these rows, so an initial refresh would reset them.
+    return WalletRanker(connection, expire=False)
+
+
+@pytest.fixture
+def ranker():
+    return seeded(WALLETS)
+
+
+def ranked(rows):
+    return [row['wallet_address'] for row in rows]
+
+
+@pytest.mark.parametrize("order_by, expected", [
+    ('win_rate', ['charlie', 'bravo', 'alpha', 'foxtrot', 'delta']),
+    ('balance_change', ['delta', 'bravo', 'alpha', 'foxtrot', 'charlie']),
+    ('token_accounts', ['charlie', 'bravo', 'alpha', 'foxtrot', 'delta']),
+])
+def test_order_by_with_ties(ranker, order_by, expected):
+    # alpha and foxtrot tie on every metric, so wallet id decides; echo has no trades in the window.
+    assert ranked(ranker.top_wallets(k=10, order_by=order_by)) == expected
+
+
+@pytest.mark.parametrize("filters, expected", [
+    ({'min_trades': 5}, ['charlie', 'bravo', 'alpha', 'foxtrot']),
+    ({'min_win_rate': 85}, ['charlie']),
+    ({'balance_change_above': 0}, ['bravo', 'alpha', 'foxtrot', 'delta']),
+    ({'min_trades': 5, 'balance_change_above': 15}, ['bravo']),
+    ({'min_trades': 100}, []),
+])
+def test_filters(ranker, filters, expected):
+    assert ranked(ranker.top_wallets(k=10, **filters)) == expected
+    assert sorted(ranked(ranker.top_scored(k=10, **filters))) == sorted(expected)
+
+
+def test_k(ranker):
+    assert ranked(ranker.top_wallets(k=2)) == ['charlie', 'bravo']
+    assert ranker.top_wallets(k=2)[0] == {'wallet_address': 'charlie', 'win_rate': 90.0, 'balance_change': -5.0,
+                                          'token_accounts': 12}
+    assert len(ranker.top_wallets(k=1000)) == len(ranker.top_scored(k=1000)) == 5
+    assert ranker.top_scored(k=0) == []
+
+
+def test_unknown_window_or_metric(ranker):
+    with pytest.raises(ValueError):
+        ranker.top_wallets(period=31)
+    with pytest.raises(ValueError):
+        ranker.top_wallets(order_by='score')
+    with pytest.raises(ValueError):
+        ranker.top_scored(weights={'score': 1.0})
+
+
+def brute_force(wallets: dict, k: int, weights: dict, min_trades: int = 0, balance_change_above=None):
+    """top_scored worked out one wallet at a time: z-score every metric, weight, sum, sort"""
+    candidates = [(wallet_id, wallet, win_rate, balance_change or 0.0, token_accounts)
+                  for wallet_id, (wallet, (win_rate, balance_change, token_accounts)) in enumerate(wallets.items(), 1)
+                  if win_rate is not None and token_accounts >= min_trades
+                  and (balance_change_above is None or (balance_change or 0.0) > balance_change_above)]
+    columns = {'win_rate': [row[2] for row in candidates], 'balance_change': [row[3] for row in candidates],
+               'token_accounts': [math.log1p(row[4]) for row in candidates]}
+    scores = [0.0] * len(candidates)
+    for metric, weight in weights.items():
+        values = columns[metric]
+        mean = sum(values) / len(values)
+        spread = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+        if weight and spread > 0:
+            scores = [score + weight * (value - mean) / spread for score, value in zip(scores, values)]
+    order = sorted(range(len(candidates)), key=lambda position: (-scores[position], candidates[position][0]))
+    return [(candidates[position][1], scores[position]) for position in order[:k]]
+
+
+def test_top_scored_ties_follow_wallet_id(ranker):
+    scored = [(row['wallet_address'], row['score']) for row in ranker.top_scored(k=10)]
+    expected = brute_force(WALLETS, 10, DEFAULT_SCORE_WEIGHTS)
+    assert [wallet for wallet, _ in scored] == [wallet for wallet, _ in expected]
+    assert [score for _, score in scored] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize("weights, filters", [
+    (DEFAULT_SCORE_WEIGHTS, {}),
+    ({'win_rate': 2.0, 'balance_change': 0.5}, {'min_trades': 10}),
+    ({'token_accounts': 1.0}, {'balance_change_above': 0}),
+])
+def test_top_scored_matches_brute_force(weights, filters):
+    rng = random.Random(7)
+    wallets = {f"wallet-{number}": (rng.uniform(0, 100), rng.uniform(-50, 50), rng.randint(1, 200))
+               for number in range(300)}
+    scored = seeded(wallets).top_scored(k=25, weights=weights, **filters)
+    expected = brute_force(wallets, 25, weights, **filters)
+    assert [row['wallet_address'] for row in scored] == [wallet for wallet, _ in expected]
+    assert [row['score'] for row in scored] == pytest.approx([score for _, score in expected])
@@ -0,0 +1,46 @@
+import contextlib
+import sqlite3
+
+from tests.conftest import scan
+from wallet_ranking import WalletRanker
+from wallet_rollups import WINNING_WALLET_PERIODS, refresh_winning_wallets
+
+
+def winning_wallets(workdir):
+    with contextlib.closing(sqlite3.connect(workdir / "trading_data.db")) as connection:
+        return connection.execute("SELECT * FROM winning_wallets ORDER BY wallet_address_id").fetchall()
+
+
+def test_reports_leave_winning_wallets_to_the_rollup(replay, tmp_path):
+    loop, url, wallet = replay
+    scanned, reported = tmp_path / "scanned", tmp_path / "reported"
+    scanned.mkdir()
+    reported.mkdir()
+
+    loop.run_until_complete(scan(url, wallet, scanned))
+    loop.run_until_complete(scan(url, wallet, reported, report_periods=WINNING_WALLET_PERIODS))
+    assert winning_wallets(reported) == winning_wallets(scanned)
+
+    # What the writer left is exactly what a full recompute from the daily buckets gives.
+    with contextlib.closing(sqlite3.connect(reported / "trading_data.db")) as connection:
+        before = connection.execute("SELECT * FROM winning_wallets ORDER BY wallet_address_id").fetchall()
+        with connection:
+            refresh_winning_wallets(connection)
+        assert connection.execute("SELECT * FROM winning_wallets ORDER BY wallet_address_id").fetchall() == before
+
+
+def test_ranker_expires_wallets_no_flush_touched(replay, tmp_path):
+    loop, url, wallet = replay
+    loop.run_until_complete(scan(url, wallet, tmp_path))
+    expected = winning_wallets(tmp_path)
+
+    with contextlib.closing(sqlite3.connect(tmp_path / "trading_data.db")) as connection:
+        # A wallet tracked earlier whose trades have all aged out since, and which no scan has flushed again.
+        connection.execute("INSERT INTO wallet_address (wallet_address) VALUES ('idle')")
+        idle = connection.execute("SELECT id FROM wallet_address WHERE wallet_address = 'idle'").fetchone()[0]
+        stale = [idle] + [75.0, 12.5, 4] * len(WINNING_WALLET_PERIODS)
+        connection.execute(f"INSERT INTO winning_wallets VALUES ({', '.join('?' * len(stale))})", stale)
+        connection.commit()
+
+        WalletRanker(connection)
+        assert winning_wallets(tmp_path) == sorted(expected + [(idle,) + (None, None, 0) * len(WINNING_WALLET_PERIODS)])
@@ -0,0 +1,151 @@
+import logging
+import sqlite3
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from solders.rpc.responses import GetTransactionResp
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_CACHE_PATH = "transaction_cache.db"
+TRANSACTION_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Eviction trims the cache to this fraction of the cap so it does not run on every insert.
+EVICTION_TARGET_RATIO = 0.9
+# SQLite limits the number of host parameters per statement.
+SQL_PARAMETER_CHUNK = 500
+# How long a write waits for another process's transaction on the shared cache before giving up.
+TRANSACTION_CACHE_BUSY_SECONDS = 30.0
+
+
+class TransactionCache:
+    """On-disk, zlib-compressed cache of finalized getTransaction responses keyed by signature
+
+    Batch workers share one cache file. A write that still finds it locked after the busy timeout is skipped:
+    the caller already holds the responses, so losing a cache write only costs a refetch later.
+    """
+
+    def __init__(self, path: str = TRANSACTION_CACHE_PATH, max_bytes: int = TRANSACTION_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=TRANSACTION_CACHE_BUSY_SECONDS)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        # Caches written before responses were keyed by encoding are simply discarded.
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(transactions)')}
+        if columns and 'encoding' not in columns:
+            self.connection.execute('DROP TABLE transactions')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS transactions (
+                signature TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access INTEGER NOT NULL,
+                PRIMARY KEY (signature, encoding)
+            ) WITHOUT ROWID
+        ''')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS idx_transactions_last_access ON transactions(last_access)')
+        self.connection.commit()
+        self.total_bytes = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM transactions').fetchone()[0]
+
+    def get_many(self, signatures: Iterable, encoding: str = "jsonParsed") -> Dict[str, GetTransactionResp]:
+        """Return cached responses for the given signatures, keyed by signature string"""
+        keys = [str(signature) for signature in signatures]
+        found: Dict[str, GetTransactionResp] = {}
+
+        for start in range(0, len(keys), SQL_PARAMETER_CHUNK):
+            chunk = keys[start:start + SQL_PARAMETER_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.connection.execute(
+                f'SELECT signature, payload FROM transactions WHERE encoding = ? AND signature IN ({placeholders})',
+                [encoding, *chunk])
+            for signature, payload in rows:
+                try:
+                    found[signature] = GetTransactionResp.from_json(zlib.decompress(payload).decode())
+                except Exception as e:
+                    logger.error(f"Dropping unreadable cached transaction {signature}: {e}")
+
+        if found:
+            now = int(time.time())
+            try:
+                with self.connection:
+                    self.connection.executemany(
+                        'UPDATE transactions SET last_access = ? WHERE signature = ? AND encoding = ?',
+                        [(now, signature, encoding) for signature in found])
+            except sqlite3.OperationalError as e:
+                logger.warning(f"Could not touch {len(found)} cached transactions in {self.path}: {e}")
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, signature, encoding: str = "jsonParsed") -> Optional[GetTransactionResp]:
+        """Return the cached response for one signature, if any"""
+        return self.get_many([signature], encoding).get(str(signature))
+
+    def put_many(self, items: Iterable[Tuple[object, GetTransactionResp]], encoding: str = "jsonParsed") -> None:
+        """Store finalized responses; empty (not found) responses are never cached"""
+        now = int(time.time())
+        rows: List[Tuple[str, str, bytes, int, int]] = []
+        for signature, response in items:
+            if response is None or response.value is None:
+                continue
+            payload = zlib.compress(response.to_json().encode())
+            rows.append((str(signature), encoding, payload, len(payload), now))
+
+        if not rows:
+            return
+
+        keys = [row[0] for row in rows]
+        replaced = 0
+        for start in range(0, len(keys), SQL_PARAMETER_CHUNK):
+            chunk = keys[start:start + SQL_PARAMETER_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            replaced += self.connection.execute(
+                f'SELECT COALESCE(SUM(size), 0) FROM transactions WHERE encoding = ? AND signature IN ({placeholders})',
+                [encoding, *chunk]).fetchone()[0]
+
+        try:
+            with self.connection:
+                self.connection.executemany('INSERT OR REPLACE INTO transactions (signature, encoding, payload, size, '
+                                            'last_access) VALUES (?, ?, ?, ?, ?)', rows)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not cache {len(rows)} transactions in {self.path}: {e}")
+            return
+        self.total_bytes += sum(row[3] for row in rows) - replaced
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def put(self, signature, response: GetTransactionResp, encoding: str = "jsonParsed") -> None:
+        """Store one finalized response"""
+        self.put_many([(signature, response)], encoding)
+
+    def evict(self) -> None:
+        """Drop least recently used entries until the cache is under its size target"""
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        cursor = self.connection.execute('SELECT signature, encoding, size FROM transactions ORDER BY last_access ASC')
+        evicted: List[Tuple[str, str]] = []
+        freed = 0
+        for signature, encoding, size in cursor:
+            if self.total_bytes - freed <= target:
+                break
+            evicted.append((signature, encoding))
+            freed += size
+        cursor.close()
+
+        try:
+            with self.connection:
+                self.connection.executemany('DELETE FROM transactions WHERE signature = ? AND encoding = ?', evicted)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Could not evict cached transactions from {self.path}: {e}")
+            return
+        self.total_bytes -= freed
+        logger.info(f"Evicted {len(evicted)} cached transactions ({freed} bytes)")
+
+    def close(self) -> None:
+        """Close the cache database"""
+        self.connection.close()
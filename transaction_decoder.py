@@ -0,0 +1,98 @@
+import struct
+from typing import List, Optional
+
+import base58
+from solders.pubkey import Pubkey
+from spl.token.constants import TOKEN_PROGRAM_ID
+
+# SPL Token instruction tags whose jsonParsed form carries a "destination" field.
+TRANSFER = 3
+CLOSE_ACCOUNT = 9
+TRANSFER_CHECKED = 12
+
+
+def resolve_account_keys(transaction) -> List[Pubkey]:
+    """Static message keys followed by the writable and readonly keys loaded from lookup tables"""
+    value = transaction.value
+    account_keys = list(value.transaction.transaction.message.account_keys)
+    loaded_addresses = value.transaction.meta.loaded_addresses
+    if loaded_addresses is not None:
+        account_keys.extend(Pubkey.from_string(str(key)) for key in loaded_addresses.writable)
+        account_keys.extend(Pubkey.from_string(str(key)) for key in loaded_addresses.readonly)
+    return account_keys
+
+
+def account_signer(transaction) -> Pubkey:
+    """Fee payer of a base64-decoded transaction"""
+    return transaction.value.transaction.transaction.message.account_keys[0]
+
+
+def ui_amount_string(amount: int, decimals: int) -> str:
+    """Trimmed decimal string, as the RPC node renders uiAmountString"""
+    if decimals == 0:
+        return str(amount)
+    padded = str(amount).rjust(decimals + 1, "0")
+    return f"{padded[:-decimals]}.{padded[-decimals:]}".rstrip("0").rstrip(".")
+
+
+def add_signers(info: dict, accounts: List[str], last_nonsigner_index: int, owner_field: str,
+                multisig_field: str) -> dict:
+    """Mirror the node's single-owner vs multisig rendering of the authority accounts"""
+    if len(accounts) > last_nonsigner_index + 1:
+        info[multisig_field] = accounts[last_nonsigner_index]
+        info["signers"] = accounts[last_nonsigner_index + 1:]
+    else:
+        info[owner_field] = accounts[last_nonsigner_index]
+    return info
+
+
+def decode_token_instruction(data: bytes, accounts: List[str]) -> Optional[dict]:
+    """Decode transfer, transferChecked and closeAccount into the jsonParsed "info" dict"""
+    if not data:
+        return None
+
+    tag = data[0]
+    if tag == TRANSFER and len(data) >= 9 and len(accounts) >= 3:
+        amount, = struct.unpack_from("<Q", data, 1)
+        info = {"source": accounts[0], "destination": accounts[1], "amount": str(amount)}
+        return add_signers(info, accounts, 2, "authority", "multisigAuthority")
+
+    if tag == TRANSFER_CHECKED and len(data) >= 10 and len(accounts) >= 4:
+        amount, decimals = struct.unpack_from("<QB", data, 1)
+        info = {
+            "source": accounts[0],
+            "mint": accounts[1],
+            "destination": accounts[2],
+            "tokenAmount": {
+                "uiAmount": amount / 10 ** decimals,
+                "decimals": decimals,
+                "amount": str(amount),
+                "uiAmountString": ui_amount_string(amount, decimals),
+            },
+        }
+        return add_signers(info, accounts, 3, "authority", "multisigAuthority")
+
+    if tag == CLOSE_ACCOUNT and len(accounts) >= 3:
+        info = {"account": accounts[0], "destination": accounts[1]}
+        return add_signers(info, accounts, 2, "owner", "multisigOwner")
+
+    return None
+
+
+def decode_information_array(transaction) -> list:
+    """Build the same information_array the jsonParsed path collects, from a base64 transaction"""
+    inner_instructions = transaction.value.transaction.meta.inner_instructions
+    if not inner_instructions:
+        return []
+
+    account_keys = resolve_account_keys(transaction)
+    information_array = []
+    for ui_inner_instructions in inner_instructions:
+        for instruction in ui_inner_instructions.instructions:
+            if account_keys[instruction.program_id_index] != TOKEN_PROGRAM_ID:
+                continue
+            accounts = [str(account_keys[index]) for index in instruction.accounts]
+            info = decode_token_instruction(base58.b58decode(instruction.data), accounts)
+            if info is not None:
+                information_array.append(info)
+    return information_array
@@ -0,0 +1,169 @@
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from wallet_rollups import WINNING_WALLET_PERIODS, refresh_winning_wallets
+
+logger = logging.getLogger(__name__)
+
+# Columns of winning_wallets that exist once per window, e.g. win_rate_30.
+RANKING_METRICS = ('win_rate', 'balance_change', 'token_accounts')
+DEFAULT_SCORE_WEIGHTS = {'win_rate': 1.0, 'balance_change': 1.0, 'token_accounts': 0.25}
+# Ties on the ranked metric are broken by these, in the order of the window's (metric, ...) index, then by wallet id.
+TIE_BREAKS = {'win_rate': ('token_accounts', 'balance_change'), 'balance_change': ('token_accounts', 'win_rate'),
+              'token_accounts': ('win_rate', 'balance_change')}
+
+
+@dataclass
+class WalletColumns:
+    """One window of winning_wallets as parallel arrays, for vectorized scoring"""
+    period: int
+    wallet_ids: np.ndarray
+    win_rate: np.ndarray
+    balance_change: np.ndarray
+    token_accounts: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.wallet_ids)
+
+
+def period_columns(period: int) -> Dict[str, str]:
+    if int(period) not in WINNING_WALLET_PERIODS:
+        raise ValueError(f"No winning_wallets window for {period} days; expected one of {WINNING_WALLET_PERIODS}")
+    return {metric: f"{metric}_{int(period)}" for metric in RANKING_METRICS}
+
+
+class WalletRanker:
+    """Top-K queries over the winning_wallets rollups of every tracked wallet"""
+
+    def __init__(self, connection: sqlite3.Connection, expire: bool = True):
+        """expire=False skips the initial refresh(), for callers that just ran one"""
+        self.connection = connection
+        self.columns: Dict[int, WalletColumns] = {}
+        # Flushes only refresh the wallets they wrote, so windows of wallets not scanned lately may be stale.
+        if expire:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Expire aged-out trades from every wallet's windows and drop the cached column snapshots"""
+        with self.connection:
+            refresh_winning_wallets(self.connection)
+        self.columns = {}
+
+    def top_wallets(self, period: int = 30, k: int = 50, order_by: str = 'win_rate', min_trades: int = 0,
+                    min_win_rate: Optional[float] = None,
+                    balance_change_above: Optional[float] = None) -> List[dict]:
+        """Best k wallets by one rollup metric, e.g. 30-day win rate with at least N trades and positive balance change
+
+        Walks the (metric, ...) index of the window in descending order and stops after k matches.
+        """
+        columns = period_columns(period)
+        if order_by not in columns:
+            raise ValueError(f"order_by must be one of {RANKING_METRICS}")
+
+        conditions = [f"ww.{columns['win_rate']} IS NOT NULL", f"ww.{columns['token_accounts']} >= ?"]
+        params: list = [min_trades]
+        if min_win_rate is not None:
+            conditions.append(f"ww.{columns['win_rate']} >= ?")
+            params.append(min_win_rate)
+        if balance_change_above is not None:
+            conditions.append(f"ww.{columns['balance_change']} > ?")
+            params.append(balance_change_above)
+
+        rows = self.connection.execute(f'''
+            SELECT w.wallet_address, ww.{columns['win_rate']}, ww.{columns['balance_change']},
+                   ww.{columns['token_accounts']}
+            FROM winning_wallets ww
+            JOIN wallet_address w ON w.id = ww.wallet_address_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {', '.join(f"ww.{columns[metric]} DESC" for metric in (order_by, *TIE_BREAKS[order_by]))},
+                     ww.wallet_address_id
+            LIMIT ?
+        ''', params + [k])
+
+        return [{'wallet_address': wallet_address, 'win_rate': win_rate, 'balance_change': balance_change,
+                 'token_accounts': token_accounts}
+                for wallet_address, win_rate, balance_change, token_accounts in rows]
+
+    def load_columns(self, period: int) -> WalletColumns:
+        """Columnar snapshot of one window, cached until refresh()"""
+        period = int(period)
+        if period in self.columns:
+            return self.columns[period]
+
+        columns = period_columns(period)
+        rows = self.connection.execute(f'''
+            SELECT wallet_address_id, {columns['win_rate']}, {columns['balance_change']}, {columns['token_accounts']}
+            FROM winning_wallets
+            WHERE {columns['win_rate']} IS NOT NULL
+        ''').fetchall()
+        wallet_ids, win_rate, balance_change, token_accounts = (list(column) for column in zip(*rows)) if rows \
+            else ([], [], [], [])
+
+        snapshot = WalletColumns(
+            period=period,
+            wallet_ids=np.asarray(wallet_ids, dtype=np.int64),
+            win_rate=np.asarray(win_rate, dtype=np.float64),
+            # No spend in the window leaves balance_change NULL; treat it as flat.
+            balance_change=np.nan_to_num(np.asarray(balance_change, dtype=np.float64)),
+            token_accounts=np.asarray(token_accounts, dtype=np.int64),
+        )
+        self.columns[period] = snapshot
+        return snapshot
+
+    def top_scored(self, period: int = 30, k: int = 50, weights: Optional[Dict[str, float]] = None,
+                   min_trades: int = 0, min_win_rate: Optional[float] = None,
+                   balance_change_above: Optional[float] = None) -> List[dict]:
+        """Best k wallets by a weighted blend of standardized metrics, scored over the whole window at once"""
+        weights = DEFAULT_SCORE_WEIGHTS if weights is None else weights
+        unknown = set(weights) - set(RANKING_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown ranking metrics: {', '.join(sorted(unknown))}")
+
+        snapshot = self.load_columns(period)
+        mask = snapshot.token_accounts >= min_trades
+        if min_win_rate is not None:
+            mask &= snapshot.win_rate >= min_win_rate
+        if balance_change_above is not None:
+            mask &= snapshot.balance_change > balance_change_above
+        candidates = np.flatnonzero(mask)
+        if not len(candidates) or k <= 0:
+            return []
+
+        metrics = {
+            'win_rate': snapshot.win_rate[candidates],
+            'balance_change': snapshot.balance_change[candidates],
+            # Trade counts are heavy-tailed; log keeps one very active wallet from swamping the blend.
+            'token_accounts': np.log1p(snapshot.token_accounts[candidates]),
+        }
+        scores = np.zeros(len(candidates))
+        for metric, weight in weights.items():
+            values = metrics[metric]
+            spread = values.std()
+            if weight and spread > 0:
+                scores += weight * (values - values.mean()) / spread
+
+        # Partial selection of the k best, then an exact sort of just those; equal scores go by wallet id.
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.lexsort((snapshot.wallet_ids[candidates[best]], -scores[best]))]
+
+        picked = candidates[best]
+        wallet_ids = snapshot.wallet_ids[picked].tolist()
+        addresses = self.wallet_addresses(wallet_ids)
+        return [{'wallet_address': addresses.get(wallet_id), 'win_rate': float(snapshot.win_rate[index]),
+                 'balance_change': float(snapshot.balance_change[index]),
+                 'token_accounts': int(snapshot.token_accounts[index]), 'score': float(scores[position])}
+                for wallet_id, index, position in zip(wallet_ids, picked, best)]
+
+    def wallet_addresses(self, wallet_ids: List[int]) -> Dict[int, str]:
+        if not wallet_ids:
+            return {}
+        placeholders = ','.join('?' * len(wallet_ids))
+        return dict(self.connection.execute(
+            f'SELECT id, wallet_address FROM wallet_address WHERE id IN ({placeholders})', wallet_ids))
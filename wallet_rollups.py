@@ -0,0 +1,89 @@
+import contextlib
+import logging
+import sqlite3
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Windows that have win_rate_N / balance_change_N / token_accounts_N columns in winning_wallets.
+WINNING_WALLET_PERIODS = (7, 14, 30, 60, 90)
+SECONDS_PER_DAY = 86400
+# SQLite limits the number of host parameters per statement.
+SQL_PARAMETER_CHUNK = 500
+
+
+def window_start_day(time_period: int, now: int) -> int:
+    """First pnl_daily bucket inside a window; buckets are whole UTC days, so windows are day-aligned"""
+    return (now - time_period * SECONDS_PER_DAY) // SECONDS_PER_DAY
+
+
+def prune_buckets(connection: sqlite3.Connection, now: Optional[int] = None) -> int:
+    """Drop buckets that have aged out of the longest window"""
+    now = int(time.time()) if now is None else now
+    cursor = connection.execute('DELETE FROM pnl_daily WHERE day < ?',
+                                (window_start_day(max(WINNING_WALLET_PERIODS), now),))
+    return cursor.rowcount
+
+
+def refresh_winning_wallets(connection: sqlite3.Connection, wallet_ids: Optional[Iterable[int]] = None,
+                            now: Optional[int] = None) -> None:
+    """Recompute every winning_wallets window from the daily buckets; all tracked wallets when wallet_ids is None
+
+    Runs in the caller's transaction. A wallet reads at most one bucket per day of the longest window, so this
+    stays cheap however many pnl_info rows it has, and rows that aged out of a window are dropped from it here.
+    """
+    now = int(time.time()) if now is None else now
+    prune_buckets(connection, now)
+
+    columns = []
+    aggregates = []
+    params = []
+    for time_period in WINNING_WALLET_PERIODS:
+        start_day = window_start_day(time_period, now)
+        columns += [f"win_rate_{time_period}", f"balance_change_{time_period}", f"token_accounts_{time_period}"]
+        aggregates.append('''
+            SUM(CASE WHEN d.day >= ? THEN d.wins END) * 100.0 / NULLIF(SUM(CASE WHEN d.day >= ? THEN d.trades END), 0),
+            (SUM(CASE WHEN d.day >= ? THEN d.earned_sol END)
+              / NULLIF(SUM(CASE WHEN d.day >= ? THEN d.spent_sol END), 0) - 1) * 100,
+            COALESCE(SUM(CASE WHEN d.day >= ? THEN d.trades END), 0)''')
+        params += [start_day] * 5
+
+    if wallet_ids is None:
+        chunks = [None]
+    else:
+        wallet_ids = list(dict.fromkeys(wallet_ids))
+        chunks = [wallet_ids[start:start + SQL_PARAMETER_CHUNK]
+                  for start in range(0, len(wallet_ids), SQL_PARAMETER_CHUNK)]
+
+    for chunk in chunks:
+        if chunk is None:
+            wallet_filter = 'TRUE'
+            wallet_params = []
+        else:
+            wallet_filter = f"wallet_address_id IN ({','.join('?' * len(chunk))})"
+            wallet_params = list(chunk)
+
+        # Wallets already in winning_wallets are included so a window that emptied is reset, not left stale.
+        connection.execute(f'''
+            WITH wallets(id) AS (
+                SELECT wallet_address_id FROM pnl_daily WHERE {wallet_filter}
+                UNION
+                SELECT wallet_address_id FROM winning_wallets WHERE {wallet_filter}
+            )
+            INSERT INTO winning_wallets (wallet_address_id, {', '.join(columns)})
+            SELECT w.id, {','.join(aggregates)}
+            FROM wallets w
+            LEFT JOIN pnl_daily d ON d.wallet_address_id = w.id
+            WHERE TRUE
+            GROUP BY w.id
+            ON CONFLICT(wallet_address_id) DO UPDATE SET
+                {', '.join(f"{column} = excluded.{column}" for column in columns)}
+        ''', wallet_params + wallet_params + params)
+
+
+def expire_winning_wallets(database_path: str) -> None:
+    """Refresh every tracked wallet in its own transaction, so trades also age out of wallets no flush touched"""
+    with contextlib.closing(sqlite3.connect(database_path)) as connection:
+        with connection:
+            refresh_winning_wallets(connection)
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from typing import Optional, Sequence
+
+from solana.rpc.commitment import Commitment, Finalized
+from solana.rpc.types import DataSliceOpts, MemcmpOpts
+from solders.pubkey import Pubkey
+from solders.rpc.config import RpcTransactionLogsFilterMentions
+from solders.rpc.responses import LogsNotification, ProgramNotification
+from solders.signature import Signature
+from spl.token.constants import TOKEN_PROGRAM_ID
+
+import config
+from backend.rpc_pool import endpoint_limits
+
+logger = logging.getLogger(__name__)
+
+# Transactions are fetched and cached at finalized commitment, so notifications wait for the same level:
+# a trade reaches pnl_info roughly 15 seconds after it lands instead of racing a not-yet-final fetch.
+STREAM_COMMITMENT: Commitment = Finalized
+SPL_TOKEN_ACCOUNT_SIZE = 165
+# The owner field follows the 32-byte mint in an SPL token account.
+TOKEN_OWNER_OFFSET = 32
+# Seconds to wait before reconnect attempt 1, 2, ...; the last delay repeats.
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+
+
+def websocket_url(http_url: str) -> str:
+    """Websocket endpoint of an RPC node, which serves pubsub on the same host"""
+    if http_url.startswith("https://"):
+        return "wss://" + http_url[len("https://"):]
+    if http_url.startswith("http://"):
+        return "ws://" + http_url[len("http://"):]
+    return http_url
+
+
+class WalletStream:
+    """Keeps one wallet's pnl_info current from websocket notifications instead of periodic full rescans
+
+    logsSubscribe (mentions of the wallet) reports every transaction it signs and programSubscribe on the Token
+    program (owner == wallet) every balance change of its token accounts. Both push into trader.trade_queue,
+    which SolanaTrader.process_trade_queue drains through the regular fetch-and-accumulate path. After each
+    (re)connect the wallet's signatures since the last one seen are backfilled, so a dropped socket loses nothing.
+    """
+
+    def __init__(self, trader, ws_url: Optional[str] = None, commitment: Commitment = STREAM_COMMITMENT,
+                 reconnect_delays: Sequence[float] = RECONNECT_DELAYS):
+        self.trader = trader
+        self.ws_url = ws_url or config.SOLANA_WS_URL or websocket_url(endpoint_limits(config.SOLANA_RPC_URLS)[0][0])
+        self.commitment = commitment
+        self.reconnect_delays = reconnect_delays
+        self.last_signature: Optional[str] = None
+        self.connections = 0
+
+    @property
+    def wallet(self) -> Pubkey:
+        return self.trader.wallet_address
+
+    async def newest_signature(self) -> Optional[str]:
+        response = await self.trader.solana_client.get_signatures_for_address(self.wallet, limit=1)
+        return str(response.value[0].signature) if response.value else None
+
+    async def run(self) -> None:
+        """Catch up with a regular scan, then follow the wallet until cancelled"""
+        # Taken before the catch-up scan, so the first backfill covers trades that land while it runs.
+        self.last_signature = await self.newest_signature()
+        await self.trader.process_transactions()
+
+        consumer = asyncio.create_task(self.trader.process_trade_queue())
+        try:
+            await self.listen()
+        finally:
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+            self.trader.db_writer.flush()
+
+    async def listen(self) -> None:
+        # websockets is only needed in streaming mode, so solana-py's client for it is imported here.
+        from solana.rpc.websocket_api import connect
+
+        attempt = 0
+        while True:
+            try:
+                async with connect(self.ws_url) as websocket:
+                    await self.subscribe(websocket)
+                    self.connections += 1
+                    attempt = 0
+                    if self.connections > 1:
+                        self.trader.metrics.count('stream.reconnects')
+                    logger.info(f"Streaming {self.wallet} from {self.ws_url}")
+                    await self.backfill()
+                    async for messages in websocket:
+                        for message in messages:
+                            self.handle(message)
+                logger.warning(f"Websocket {self.ws_url} closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Websocket {self.ws_url} failed: {e}")
+
+            delay = self.reconnect_delays[min(attempt, len(self.reconnect_delays) - 1)]
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def subscribe(self, websocket) -> None:
+        await websocket.logs_subscribe(RpcTransactionLogsFilterMentions(self.wallet), commitment=self.commitment)
+        # Only the pubkey of a changed account matters, so no account data is sent.
+        await websocket.program_subscribe(TOKEN_PROGRAM_ID, commitment=self.commitment, encoding="base64",
+                                          data_slice=DataSliceOpts(offset=0, length=0),
+                                          filters=[SPL_TOKEN_ACCOUNT_SIZE,
+                                                   MemcmpOpts(offset=TOKEN_OWNER_OFFSET, bytes=str(self.wallet))])
+
+    def handle(self, message) -> None:
+        if isinstance(message, LogsNotification):
+            value = message.result.value
+            self.trader.metrics.count('stream.log_notifications')
+            self.last_signature = str(value.signature)
+            if value.err is None:
+                self.trader.queue_signature(value.signature)
+        elif isinstance(message, ProgramNotification):
+            self.trader.metrics.count('stream.account_notifications')
+            self.trader.queue_token_account(message.result.value.pubkey)
+
+    async def backfill(self) -> int:
+        """Queue the wallet's signatures since the last one seen; returns how many were queued"""
+        if self.last_signature is None:
+            self.last_signature = await self.newest_signature()
+            return 0
+
+        with self.trader.metrics.time('stream.backfill'):
+            statuses = await self.trader.fetch_signatures(str(self.wallet),
+                                                          until=Signature.from_string(self.last_signature))
+        queued = 0
+        for status in reversed(statuses):
+            if status.err is None and self.trader.queue_signature(status.signature):
+                queued += 1
+        if statuses:
+            self.last_signature = str(statuses[0].signature)
+        self.trader.metrics.count('stream.backfilled', queued)
+        if queued:
+            logger.info(f"Backfilled {queued} signatures for {self.wallet}")
+        return queued